@@ -1,10 +1,12 @@
 #!/bin/bash
+set -e
 echo "⚙️ Running Django migrations..."
 python manage.py makemigrations --noinput
 python manage.py migrate --noinput
+python manage.py ensure_partitions
 
 echo "📦 Collecting static files..."
 python manage.py collectstatic --noinput
 
 echo "🚀 Starting Gunicorn..."
-gunicorn goldtrade.wsgi:application --config gunicorn.conf.py
+gunicorn gold_trade.asgi:application --config gunicorn.conf.py
@@ -55,6 +55,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "goldtrade.account.AccountMiddleware",              # lazy request.account
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -75,7 +76,9 @@ WSGI_APPLICATION = "gold_trade.wsgi.application"
 if os.getenv("DATABASE_URL"):
     DATABASES = {
         "default": dj_database_url.config(
-            conn_max_age=600,
+            # gold_trade/asgi.py sets 0: ASGI runs each request on its own
+            # thread, so a kept-alive connection would never be reused.
+            conn_max_age=int(os.getenv("DB_CONN_MAX_AGE", "600")),
             ssl_require=True
         )
     }
@@ -87,6 +90,56 @@ else:
         }
     }
 
+# ============================================================
+# CACHES
+# ============================================================
+# "default" is per-process. "shared" is seen by every gunicorn worker and
+# holds the version tokens that invalidate per-process copies (e.g. the
+# current gold rate). Set REDIS_URL when running on more than one host.
+
+if os.getenv("REDIS_URL"):
+    SHARED_CACHE = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+else:
+    SHARED_CACHE = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("SHARED_CACHE_DIR", "/tmp/hifas_shared_cache"),
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": SHARED_CACHE,
+}
+
+# How long a used idempotency key replays its first outcome (idempotency.py)
+IDEMPOTENCY_TTL = 60 * 60 * 24
+
+# ============================================================
+# TRADE INTAKE (group commit)
+# ============================================================
+# When on, buy/sell POSTs are queued and a committer thread per worker
+# applies them in micro-batches, one DB transaction per batch (intake.py).
+# Useful for the burst right after a rate announcement.
+
+TRADE_INTAKE = os.getenv("TRADE_INTAKE", "False") == "True"
+TRADE_INTAKE_WINDOW_MS = int(os.getenv("TRADE_INTAKE_WINDOW_MS", "10"))
+TRADE_INTAKE_MAX_BATCH = int(os.getenv("TRADE_INTAKE_MAX_BATCH", "200"))
+TRADE_INTAKE_TIMEOUT = 10   # seconds a request waits before giving up
+
+# ============================================================
+# IMAGE PIPELINE
+# ============================================================
+# Uploaded slips, KYC documents and profile pictures are stripped of
+# metadata and given a display copy and a thumbnail after commit, by a
+# pool of threads per worker (images.py).
+# 0 processes them inline, right after the commit.
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
 # ============================================================
 # AUTH & PASSWORDS
 # ============================================================
@@ -0,0 +1,145 @@
+"""
+Request-scoped account state: both wallets with their positions, KYC
+status and profile.
+
+AccountMiddleware sets a lazy `request.account`. The first attribute read
+loads everything with one joined query
+
+    wallet LEFT JOIN position LEFT JOIN auth_user LEFT JOIN goldtrade_kyc
+           LEFT JOIN userprofile
+
+and keeps the result in the per-process cache under the user's shared
+"account:<id>" version token, so later requests reuse it until a wallet,
+KYC or profile row changes. Writers bump the token on commit: the model
+signals (signals.py) and every balance move (ledger.move), which is a
+queryset update and fires no signal.
+"""
+from django.core.cache import caches
+from django.db import transaction as db_tx
+from django.utils.functional import SimpleLazyObject
+
+from .models import Wallet
+from .versions import bump_version, get_version
+
+
+def _version_name(user_id):
+    return f"account:{user_id}"
+
+
+def invalidate(user_id):
+    bump_version(_version_name(user_id))
+
+
+def invalidate_on_commit(user_id):
+    db_tx.on_commit(lambda: invalidate(user_id))
+
+
+def _wallets(user):
+    return list(
+        Wallet.objects.filter(user_id=user.pk)
+        .select_related("position", "user__kyc", "user__userprofile")
+    )
+
+
+def _load(user):
+    wallets = _wallets(user)
+    if len(wallets) < 2:
+        # First visit after signup, or a wallet went missing
+        Wallet.objects.get_or_create(user_id=user.pk, is_demo=False)
+        Wallet.objects.get_or_create(user_id=user.pk, is_demo=True)
+        wallets = _wallets(user)
+
+    owner = wallets[0].user
+    kyc = getattr(owner, "kyc", None)
+    return {
+        "wallets": {wallet.is_demo: wallet for wallet in wallets},
+        "positions": {wallet.is_demo: getattr(wallet, "position", None) for wallet in wallets},
+        "kyc_status": kyc.status if kyc else None,
+        "profile": getattr(owner, "userprofile", None),
+    }
+
+
+class Account:
+    """Read-only view of the signed-in user's wallets, KYC and profile."""
+
+    def __init__(self, request):
+        self._request = request
+        self._state = None
+
+    @property
+    def state(self):
+        if self._state is None:
+            user = self._request.user
+            version = get_version(_version_name(user.pk))
+            key = f"account-state:{user.pk}"
+            cached = caches["default"].get(key)
+            if cached and cached[0] == version:
+                self._state = cached[1]
+            else:
+                # Token read before the DB, as in rates.py: a concurrent
+                # bump can only cause one extra reload, never a stale hit.
+                self._state = _load(user)
+                caches["default"].set(key, (version, self._state), None)
+        return self._state
+
+    def refresh(self):
+        self._state = None
+
+    # -------------------------
+    # Wallets
+    # -------------------------
+    @property
+    def is_demo(self):
+        return self._request.session.get("wallet_mode", "real") == "demo"
+
+    def wallet(self, is_demo):
+        return self.state["wallets"][is_demo]
+
+    @property
+    def real_wallet(self):
+        return self.wallet(False)
+
+    @property
+    def demo_wallet(self):
+        return self.wallet(True)
+
+    @property
+    def selected_wallet(self):
+        return self.wallet(self.is_demo)
+
+    def position(self, is_demo):
+        """The wallet's Position (portfolio.py), or None before its first trade."""
+        return self.state["positions"][is_demo]
+
+    # -------------------------
+    # KYC / profile
+    # -------------------------
+    @property
+    def kyc_status(self):
+        return self.state["kyc_status"]
+
+    @property
+    def kyc_approved(self):
+        return self.kyc_status == "approved"
+
+    @property
+    def profile(self):
+        return self.state["profile"]
+
+    @property
+    def picture_url(self):
+        profile = self.profile
+        return profile.thumbnail_url() if profile else "/static/images/default_profile.png"
+
+
+class AccountMiddleware:
+    """Adds a lazy `request.account` for signed-in users (None otherwise)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.account = SimpleLazyObject(
+            lambda: Account(request) if request.user.is_authenticated else None
+        )
+        return self.get_response(request)
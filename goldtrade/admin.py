@@ -1,19 +1,47 @@
-from django.contrib import admin
-from .models import Wallet, Transaction, GoldRate, BankDeposit
+from django.contrib import admin, messages
+from django.utils.html import format_html
+from .models import (
+    Wallet, Transaction, GoldRate, BankDeposit, DailyStats, LedgerEntry, LimitOrder, MonthlyStatement, Position,
+    QueueCounter, TransactionArchive,
+)
+from . import reviews
+
 
 @admin.register(BankDeposit)
 class BankDepositAdmin(admin.ModelAdmin):
     list_display = ('user', 'amount', 'status', 'reference_no', 'created_at', 'slip_preview')
     list_filter = ('status',)
     search_fields = ('user__username', 'reference_no')
-    readonly_fields = ('slip_preview',)
+    # Status moves only through the actions, which credit the wallet (reviews.py)
+    readonly_fields = ('status', 'slip_preview')
+    actions = ('approve_selected', 'reject_selected')
+
+    @admin.action(description="Approve selected deposits")
+    def approve_selected(self, request, queryset):
+        outcome = reviews.approve_deposits(queryset.values_list('pk', flat=True), request.user)
+        self.message_user(request, f"{len(outcome.settled)} approved, {len(outcome.skipped)} already processed.",
+                          messages.SUCCESS)
+        self._report_truncated(request, outcome)
+
+    @admin.action(description="Reject selected deposits")
+    def reject_selected(self, request, queryset):
+        outcome = reviews.reject_deposits(queryset.values_list('pk', flat=True), request.user)
+        self.message_user(request, f"{len(outcome.settled)} rejected, {len(outcome.skipped)} already processed.",
+                          messages.SUCCESS)
+        self._report_truncated(request, outcome)
 
-    # ✅ Show image preview in admin panel
+    def _report_truncated(self, request, outcome):
+        if outcome.truncated:
+            self.message_user(request, f"{len(outcome.truncated)} not processed: at most {reviews.MAX_BATCH} "
+                                       f"per batch, run the action again.", messages.WARNING)
+
+    # ✅ Show image preview in admin panel (the thumbnail, linking to the slip)
     def slip_preview(self, obj):
         if obj.slip:
-            return f'<img src="{obj.slip.url}" style="height:80px;" />'
+            thumb = obj.slip_thumb or obj.slip
+            return format_html('<a href="{}" target="_blank"><img src="{}" style="height:80px;" loading="lazy" /></a>',
+                               obj.slip.url, thumb.url)
         return "No slip"
-    slip_preview.allow_tags = True
     slip_preview.short_description = "Slip Preview"
 
 
@@ -23,7 +51,81 @@ class GoldRateAdmin(admin.ModelAdmin):
     readonly_fields = ('last_updated',)
 
 
-admin.site.register(Wallet)
+@admin.register(Wallet)
+class WalletAdmin(admin.ModelAdmin):
+    list_display = ('user', 'is_demo', 'cash_balance', 'gold_balance')
+    list_filter = ('is_demo',)
+    search_fields = ('user__username',)
+    # Balances only move through ledger postings
+    readonly_fields = ('cash_balance', 'gold_balance', 'entries_since_checkpoint')
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'kind', 'wallet', 'account', 'asset', 'amount', 'journal')
+    list_filter = ('kind', 'asset', 'account')
+    search_fields = ('wallet__user__username', 'journal')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+
+@admin.register(LimitOrder)
+class LimitOrderAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'wallet', 'side', 'grams', 'limit_price', 'status', 'closed_at')
+    list_filter = ('status', 'side')
+    search_fields = ('wallet__user__username',)
+    # Status changes go through limit_orders.py (book version, settlement)
+    readonly_fields = ('status', 'closed_at', 'transaction')
+
+
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    list_display = ('wallet', 'grams', 'cost_basis', 'realized_pnl', 'trades', 'updated_at')
+    search_fields = ('wallet__user__username',)
+    # Maintained by portfolio.py; use `manage.py rebuild_positions` to correct
+    readonly_fields = ('wallet', 'grams', 'cost_basis', 'realized_pnl', 'trades', 'updated_at')
+
+
+@admin.register(MonthlyStatement)
+class MonthlyStatementAdmin(admin.ModelAdmin):
+    list_display = ('month', 'wallet', 'transactions', 'size', 'built_at')
+    list_filter = ('month',)
+    search_fields = ('wallet__user__username',)
+    # Written by `manage.py build_statements`
+    readonly_fields = ('wallet', 'month', 'file', 'sha256', 'size', 'fingerprint', 'transactions', 'built_at')
+
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    list_display = ('month', 'rows', 'size', 'file', 'created_at')
+    # Written by `manage.py archive_transactions`
+    readonly_fields = ('month', 'file', 'sha256', 'size', 'rows', 'created_at')
+
+
+@admin.register(QueueCounter)
+class QueueCounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'count', 'reconciled_at')
+    # Kept by pending.py; use `manage.py reconcile_pending_counts` to correct
+    readonly_fields = ('name', 'count', 'reconciled_at')
+
+
+@admin.register(DailyStats)
+class DailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'buys', 'buy_value', 'sells', 'sell_value', 'deposits', 'withdrawals', 'new_users')
+    date_hierarchy = 'day'
+    # Kept by rollups.py; use `manage.py rebuild_daily_stats` to correct
+    readonly_fields = (
+        'day', 'buys', 'buy_grams', 'buy_value', 'sells', 'sell_grams', 'sell_value', 'deposits',
+        'deposit_value', 'withdrawals', 'withdrawal_value', 'new_users', 'cash_change', 'gold_change',
+    )
+
+
 admin.site.register(Transaction)
 admin.site.site_header = "Hifas Jewellery Admin Panel 💎"
 admin.site.site_title = "Hifas Jewellery Admin"
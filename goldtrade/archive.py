@@ -0,0 +1,319 @@
+"""
+Cold archive of settled transactions (`manage.py archive_transactions`).
+
+Trades and deposits are final when written and withdrawals once
+reviewed, so settled transactions KEEP_MONTHS old move out of
+goldtrade_transaction into one gzip JSON-lines file per (UTC) month
+under MEDIA_ROOT/archive/transactions/, named by its SHA-256. Pending
+withdrawals stay live until reviewed and are picked up by a later run.
+
+Inside a file the rows are grouped by wallet, oldest first, and each
+wallet's group is its own gzip member; TransactionArchiveSpan records
+where it sits. Reading a wallet's month is then one indexed lookup, one
+seek and one small decompress, never a scan of the file.
+
+Archived rows come back as unsaved Transaction instances, so the history
+pages (ArchivedHistory, via pagination.paginate) and statements
+(Statement.rows) show them exactly like live ones. Ledger entries and
+limit orders lose their link to an archived transaction (SET_NULL); each
+archived row keeps its ledger journal ids instead.
+
+Moving a month is crash-safe: the file is written first, then the
+manifest rows are inserted and the live rows deleted in one database
+transaction. A run killed in between leaves at most an unreferenced file,
+which the next run rewrites under the same name.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db import transaction as db_tx
+from django.db.models import Q
+from django.utils import timezone
+
+from . import partitions
+from .models import LedgerEntry, Transaction, TransactionArchive, TransactionArchiveSpan
+
+KEEP_MONTHS = 12          # months kept live, counting the current one
+CHUNK_SIZE = 2000         # rows per DB fetch and per DELETE
+
+FIELDS = [
+    "id", "wallet_id", "transaction_type", "gold_amount", "price_per_gram", "total_amount",
+    "remarks", "timestamp", "status", "processed_by_id",
+]
+DECIMALS = ("gold_amount", "price_per_gram", "total_amount")
+
+
+def month_start(month):
+    """Aware UTC datetime at the start of `month` (a date)."""
+    return datetime.combine(month, time.min, tzinfo=dt_timezone.utc)
+
+
+# Only a withdrawal awaiting review can still change
+SETTLED = ~Q(transaction_type="WITHDRAW", status="pending")
+
+
+def settled(month):
+    """The month's live settled transactions."""
+    return Transaction.objects.filter(
+        SETTLED,
+        timestamp__gte=month_start(month),
+        timestamp__lt=month_start(partitions.add_months(month, 1)),
+    )
+
+
+def cutoff(keep_months=KEEP_MONTHS):
+    """First month that stays live."""
+    return partitions.add_months(partitions.month_of(timezone.now().astimezone(dt_timezone.utc)), 1 - keep_months)
+
+
+def archivable_months(before):
+    """Months before `before` that still hold settled live transactions."""
+    first = (
+        Transaction.objects.filter(SETTLED, timestamp__lt=month_start(before))
+        .order_by("timestamp").values_list("timestamp", flat=True).first()
+    )
+    months = []
+    if first is not None:
+        month = partitions.month_of(first.astimezone(dt_timezone.utc))
+        while month < before:
+            months.append(month)
+            month = partitions.add_months(month, 1)
+    return months
+
+
+# =========================
+# Writing
+# =========================
+def _encode(row, journals):
+    record = dict(zip(FIELDS, row))
+    for field in DECIMALS:
+        record[field] = str(record[field])
+    record["timestamp"] = record["timestamp"].isoformat()
+    record["journals"] = journals.get(record["id"], [])
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+
+def _journals(since, until):
+    """{transaction id: [journal, ...]} for the month's ledger postings."""
+    journals = defaultdict(list)
+    rows = (
+        LedgerEntry.objects.filter(
+            account="wallet", transaction__timestamp__gte=since, transaction__timestamp__lt=until,
+        )
+        .values_list("transaction_id", "journal").distinct()
+    )
+    for tx_id, journal in rows.iterator(chunk_size=CHUNK_SIZE):
+        journals[tx_id].append(str(journal))
+    return journals
+
+
+def archive_month(month):
+    """
+    Moves the month's settled transactions into an archive file. Returns
+    the TransactionArchive, or None if there was nothing to move.
+    """
+    live = settled(month)
+    journals = _journals(month_start(month), month_start(partitions.add_months(month, 1)))
+
+    directory = os.path.join(settings.MEDIA_ROOT, "archive", "transactions")
+    os.makedirs(directory, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False)
+    digest = hashlib.sha256()
+    ids = array("q")
+    spans = []
+
+    def flush(wallet_id, lines, first_at, last_at):
+        data = gzip.compress(b"".join(lines), mtime=0)
+        spans.append(TransactionArchiveSpan(
+            wallet_id=wallet_id, offset=handle.tell(), length=len(data), rows=len(lines),
+            first_at=first_at, last_at=last_at,
+        ))
+        handle.write(data)
+        digest.update(data)
+
+    try:
+        with handle:
+            current, lines, first_at, last_at = None, [], None, None
+            rows = live.order_by("wallet_id", "timestamp", "id").values_list(*FIELDS)
+            for row in rows.iterator(chunk_size=CHUNK_SIZE):
+                wallet_id, stamp = row[1], row[7]
+                if wallet_id != current:
+                    if lines:
+                        flush(current, lines, first_at, last_at)
+                    current, lines, first_at = wallet_id, [], stamp
+                lines.append(_encode(row, journals))
+                last_at = stamp
+                ids.append(row[0])
+            if lines:
+                flush(current, lines, first_at, last_at)
+        if not ids:
+            os.unlink(handle.name)
+            return None
+
+        sha256 = digest.hexdigest()
+        name = f"archive/transactions/{month:%Y-%m}/{sha256}.jsonl.gz"
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(handle.name, path)
+    except BaseException:
+        if os.path.exists(handle.name):
+            os.unlink(handle.name)
+        raise
+
+    with db_tx.atomic():
+        archive = TransactionArchive.objects.create(
+            month=month, file=name, sha256=sha256, size=os.path.getsize(path), rows=len(ids),
+        )
+        for span in spans:
+            span.archive = archive
+        TransactionArchiveSpan.objects.bulk_create(spans, batch_size=1000)
+        # Only the rows just written: anything settled since stays live for the next run
+        for start in range(0, len(ids), CHUNK_SIZE):
+            live.filter(id__in=ids[start:start + CHUNK_SIZE].tolist()).delete()
+    return archive
+
+
+def drop_empty_partitions(before):
+    """
+    On a partitioned goldtrade_transaction, detaches (concurrently) and
+    drops the months before `before` that archiving has emptied. Returns
+    the names dropped.
+    """
+    quote = connection.ops.quote_name
+    dropped = partitions.detach(connection, before, tables=["goldtrade_transaction"], empty=True)
+    with connection.cursor() as cursor:
+        for name in dropped:
+            cursor.execute(f"DROP TABLE {quote(name)}")
+    return dropped
+
+
+# =========================
+# Reading
+# =========================
+def _decode(line):
+    record = json.loads(line)
+    record.pop("journals", None)
+    for field in DECIMALS:
+        record[field] = Decimal(record[field])
+    record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+    return Transaction(**record)
+
+
+def read_span(span):
+    """The span's transactions, oldest first, as unsaved Transaction instances."""
+    with open(os.path.join(settings.MEDIA_ROOT, span.archive.file.name), "rb") as handle:
+        handle.seek(span.offset)
+        data = gzip.decompress(handle.read(span.length))
+    return [_decode(line) for line in data.splitlines()]
+
+
+def spans(wallet_ids, since=None, until=None, newest_first=True):
+    """Spans of `wallet_ids` overlapping [since, until), by last_at (or first_at, oldest first)."""
+    queryset = TransactionArchiveSpan.objects.filter(wallet_id__in=wallet_ids).select_related("archive")
+    if since is not None:
+        queryset = queryset.filter(last_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(first_at__lt=until)
+    if newest_first:
+        return queryset.order_by("-last_at", "-id")
+    return queryset.order_by("first_at", "id")
+
+
+def transactions(wallet_id, since, until):
+    """The wallet's archived transactions in [since, until), oldest first."""
+    for span in spans([wallet_id], since, until, newest_first=False):
+        for tx in read_span(span):
+            if since <= tx.timestamp < until:
+                yield tx
+
+
+def trades(wallet_ids=None):
+    """(wallet_id, id, type, gold, total) of every archived BUY/SELL, for portfolio.replay()."""
+    queryset = TransactionArchiveSpan.objects.select_related("archive").order_by("archive_id", "offset")
+    if wallet_ids is not None:
+        queryset = queryset.filter(wallet_id__in=wallet_ids)
+    for span in queryset.iterator(chunk_size=CHUNK_SIZE):
+        for tx in read_span(span):
+            if tx.transaction_type in ("BUY", "SELL"):
+                yield tx.wallet_id, tx.id, tx.transaction_type, tx.gold_amount, tx.total_amount
+
+
+class ArchivedHistory:
+    """
+    Archived transactions of `wallet_ids` matching filter_history()'s
+    filters (plus a fixed `transaction_type`), for pagination.paginate().
+    Spans are read newest first and only as far as the page needs.
+    """
+
+    def __init__(self, wallet_ids, filters, transaction_type=None):
+        self.wallet_ids = wallet_ids  # a list or a values_list() queryset
+        self.status = filters.get("status")
+        self.transaction_type = filters.get("type", transaction_type)
+        self.since, self.until = _bounds(filters)
+
+    def _match(self, tx):
+        return (
+            (self.status is None or tx.status == self.status)
+            and (self.transaction_type is None or tx.transaction_type == self.transaction_type)
+            and (self.since is None or tx.timestamp >= self.since)
+            and (self.until is None or tx.timestamp < self.until)
+        )
+
+    def older(self, cursor, limit, floor=None):
+        """
+        Up to `limit` rows before `cursor` ((timestamp, id) or None) and
+        after `floor` (same, optional), newest first.
+        """
+        since, until = self.since, self.until
+        if cursor and (until is None or cursor[0] < until):
+            until = cursor[0] + timedelta(microseconds=1)
+        if floor and (since is None or floor[0] > since):
+            since = floor[0]
+        found = []
+        for span in spans(self.wallet_ids, since, until):
+            # Spans are ordered by last_at: once `limit` rows are newer than
+            # everything left, the rest cannot make the page
+            if len(found) >= limit and span.last_at < found[limit - 1].timestamp:
+                break
+            found.extend(
+                tx for tx in read_span(span)
+                if self._match(tx)
+                and (cursor is None or (tx.timestamp, tx.pk) < cursor)
+                and (floor is None or (tx.timestamp, tx.pk) > floor)
+            )
+            found.sort(key=lambda tx: (tx.timestamp, tx.pk), reverse=True)
+        return found[:limit]
+
+    def newer(self, cursor, limit):
+        """Up to `limit` rows after `cursor`, oldest first."""
+        since = cursor[0] if self.since is None or cursor[0] > self.since else self.since
+        found = []
+        for span in spans(self.wallet_ids, since, self.until, newest_first=False):
+            if len(found) >= limit and span.first_at > found[limit - 1].timestamp:
+                break
+            found.extend(tx for tx in read_span(span) if self._match(tx) and (tx.timestamp, tx.pk) > cursor)
+            found.sort(key=lambda tx: (tx.timestamp, tx.pk))
+        return found[:limit]
+
+
+def _bounds(filters):
+    """
+    Aware datetimes for filter_history()'s ?from / ?to (local days,
+    inclusive); it only lets through days whose bounds fit in a datetime.
+    """
+    since = until = None
+    if filters.get("from"):
+        since = timezone.make_aware(datetime.combine(date.fromisoformat(filters["from"]), time.min))
+    if filters.get("to"):
+        next_day = date.fromisoformat(filters["to"]) + timedelta(days=1)
+        until = timezone.make_aware(datetime.combine(next_day, time.min))
+    return since, until
@@ -0,0 +1,260 @@
+"""
+OHLC candle rollups for GoldRate.
+
+Every new GoldRate is folded into its minute, hour and day candle (see
+signals.py), so chart queries read a bounded number of pre-aggregated rows
+instead of the raw, ever-growing rate table. `history()` serves the
+gold_price_history endpoint and downsamples with LTTB when a range holds
+more candles than the chart needs.
+
+Minute candles are only kept for MINUTE_RETENTION (charts use them for
+ranges up to a day), so the rollup stays bounded however long the rate
+history grows.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction as db_tx
+from django.utils import timezone
+
+from .models import GoldRate, GoldRateCandle
+
+RESOLUTIONS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+HISTORY_RANGES = {
+    "1d": timedelta(days=1),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+    "1y": timedelta(days=365),
+    "all": None,
+}
+
+MINUTE_RETENTION = timedelta(days=31)
+# Longest window served per resolution: an explicit ?resolution=minute on
+# a long range reads at most a day of minute candles (1,440 rows)
+MAX_SPAN = {
+    "minute": timedelta(days=1),
+    "hour": timedelta(days=90),
+    "day": None,
+}
+
+DEFAULT_MAX_POINTS = 300
+MAX_POINTS_LIMIT = 2000
+
+
+def bucket_start(at, resolution):
+    """Floors `at` to the start of its candle, in the site timezone."""
+    local = at.astimezone(timezone.get_default_timezone())
+    if resolution == "minute":
+        return local.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _fresh_candle(at, buy_rate, sell_rate):
+    return {
+        "buy_open": buy_rate, "buy_high": buy_rate, "buy_low": buy_rate, "buy_close": buy_rate,
+        "sell_open": sell_rate, "sell_high": sell_rate, "sell_low": sell_rate, "sell_close": sell_rate,
+        "opened_at": at,
+        "closed_at": at,
+        "samples": 1,
+    }
+
+
+def absorb(candle, at, buy_rate, sell_rate):
+    """Folds one rate sample into a candle (in memory)."""
+    if at < candle.opened_at:
+        candle.opened_at, candle.buy_open, candle.sell_open = at, buy_rate, sell_rate
+    if at >= candle.closed_at:
+        candle.closed_at, candle.buy_close, candle.sell_close = at, buy_rate, sell_rate
+    candle.buy_high = max(candle.buy_high, buy_rate)
+    candle.buy_low = min(candle.buy_low, buy_rate)
+    candle.sell_high = max(candle.sell_high, sell_rate)
+    candle.sell_low = min(candle.sell_low, sell_rate)
+    candle.samples += 1
+
+
+# =========================
+# Incremental maintenance
+# =========================
+def record_rate(rate):
+    """
+    Folds one GoldRate into its minute/hour/day candles.
+    Three small upserts, independent of how many rates already exist.
+    """
+    buy_rate = Decimal(str(rate.buy_rate))
+    sell_rate = Decimal(str(rate.sell_rate))
+    at = rate.last_updated
+
+    with db_tx.atomic():
+        GoldRateCandle.objects.filter(
+            resolution="minute", bucket_start__lt=timezone.now() - MINUTE_RETENTION
+        ).delete()
+        for resolution in RESOLUTIONS:
+            candle, created = GoldRateCandle.objects.select_for_update().get_or_create(
+                resolution=resolution,
+                bucket_start=bucket_start(at, resolution),
+                defaults=_fresh_candle(at, buy_rate, sell_rate),
+            )
+            if not created:
+                absorb(candle, at, buy_rate, sell_rate)
+                candle.save()
+
+
+def rebuild_candles(since=None, until=None, rate_model=GoldRate, candle_model=GoldRateCandle):
+    """
+    Recomputes every candle touching [since, until] from the raw rates.
+    Used after bulk imports (which bypass signals) and by the backfill
+    migration, which passes its historical models in.
+    Returns the number of candles written.
+    """
+    rates = rate_model.objects.all()
+    candles = candle_model.objects.all()
+    # Day buckets are the widest, so aligning to them covers every
+    # minute/hour bucket inside the window as well.
+    if since is not None:
+        lo = bucket_start(since, "day")
+        rates = rates.filter(last_updated__gte=lo)
+        candles = candles.filter(bucket_start__gte=lo)
+    if until is not None:
+        hi = bucket_start(until, "day") + RESOLUTIONS["day"]
+        rates = rates.filter(last_updated__lt=hi)
+        candles = candles.filter(bucket_start__lt=hi)
+
+    # One ordered pass feeds all three resolutions; only the open
+    # bucket of each is held in memory.
+    open_buckets = {resolution: None for resolution in RESOLUTIONS}
+    pending = []
+    written = 0
+    minute_cutoff = timezone.now() - MINUTE_RETENTION
+
+    with db_tx.atomic():
+        candles.delete()
+        rows = rates.order_by("last_updated").values_list("last_updated", "buy_rate", "sell_rate")
+        for at, buy_rate, sell_rate in rows.iterator(chunk_size=5000):
+            for resolution in RESOLUTIONS:
+                if resolution == "minute" and at < minute_cutoff:
+                    continue
+                start = bucket_start(at, resolution)
+                current = open_buckets[resolution]
+                if current is not None and current.bucket_start == start:
+                    absorb(current, at, buy_rate, sell_rate)
+                    continue
+                if current is not None:
+                    pending.append(current)
+                open_buckets[resolution] = candle_model(
+                    resolution=resolution,
+                    bucket_start=start,
+                    **_fresh_candle(at, buy_rate, sell_rate),
+                )
+            if len(pending) >= 2000:
+                candle_model.objects.bulk_create(pending)
+                written += len(pending)
+                pending = []
+
+        pending.extend(c for c in open_buckets.values() if c is not None)
+        candle_model.objects.bulk_create(pending, batch_size=2000)
+        written += len(pending)
+
+    return written
+
+
+# =========================
+# Chart series
+# =========================
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of the `threshold` points that best keep the
+    visual shape of (x, y). Both arrays must be sorted by x.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0] = 0
+    a = 0
+
+    for i in range(threshold - 2):
+        # average of the next bucket is the third triangle corner
+        nxt_lo = int((i + 1) * every) + 1
+        nxt_hi = min(int((i + 2) * every) + 1, n)
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+
+    picked[-1] = n - 1
+    return picked
+
+
+def pick_resolution(span):
+    if span is None:
+        return "day"
+    if span <= timedelta(days=1):
+        return "minute"
+    if span <= timedelta(days=31):
+        return "hour"
+    return "day"
+
+
+def window(range_key="30d", resolution="auto"):
+    """
+    Returns (resolution, since) for a chart range; `since` is the first
+    bucket shown (None for "all"). It only moves when a new bucket starts.
+    Ranges longer than the resolution's MAX_SPAN are cut to it.
+    """
+    span = HISTORY_RANGES[range_key]
+    if resolution not in RESOLUTIONS:
+        resolution = pick_resolution(span)
+    limit = MAX_SPAN[resolution]
+    if limit is not None and (span is None or span > limit):
+        span = limit
+    if span is None:
+        return resolution, None
+    return resolution, bucket_start(timezone.now() - span, resolution)
+
+
+def history(range_key="30d", resolution="auto", max_points=DEFAULT_MAX_POINTS):
+    """
+    Returns the chart series for a range, at most `max_points` long.
+    Points are candle closes; buy and sell share one set of timestamps.
+    """
+    resolution, since = window(range_key, resolution)
+
+    qs = GoldRateCandle.objects.filter(resolution=resolution)
+    if since is not None:
+        qs = qs.filter(bucket_start__gte=since)
+    rows = list(
+        qs.order_by("bucket_start").values_list("closed_at", "buy_close", "sell_close")
+    )
+
+    if len(rows) > max_points:
+        x = np.array([r[0].timestamp() for r in rows])
+        # Pick points on the mid price so both lines keep their shape
+        y = np.array([(float(r[1]) + float(r[2])) / 2 for r in rows])
+        rows = [rows[i] for i in lttb(x, y, max_points)]
+
+    return {
+        "range": range_key,
+        "resolution": resolution,
+        "timestamps": [r[0].isoformat() for r in rows],
+        "buy_rates": [float(r[1]) for r in rows],
+        "sell_rates": [float(r[2]) for r in rows],
+    }
@@ -0,0 +1,99 @@
+"""
+Claims on the staff review queues, so reviewers working the same queue
+at once each get different items.
+
+"Claim next" takes the oldest pending items nobody holds:
+
+    SELECT id FROM ... WHERE status = 'pending'
+      AND (claimed_until IS NULL OR claimed_until <= now)
+    ORDER BY created, id LIMIT n FOR UPDATE SKIP LOCKED
+
+and stamps claimed_by / claimed_until (a LEASE from now) on them in the
+same transaction. Rows another reviewer is claiming or settling right
+now are skipped rather than waited for; once that claim commits,
+PostgreSQL rechecks the changed row against the WHERE clause and leaves
+it out. A lease that runs out (the reviewer walked away) frees the item
+for the next claim; "Renew" (a POST) extends one's own.
+
+While a lease runs, reviews.py and the KYC views settle the item only
+for its holder. Settling clears the claim. Claims are plain UPDATEs, so
+they fire no model signals (search index, queue counters).
+"""
+from datetime import timedelta
+
+from django.db import transaction as db_tx
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import KYC, BankDeposit, Transaction
+
+LEASE = timedelta(minutes=10)
+BATCH = 10  # items per "claim next" on the deposit / withdrawal lists
+
+# queue -> (model, submitted-at field)
+QUEUES = {
+    "deposits": (BankDeposit, "created_at"),
+    "withdrawals": (Transaction, "timestamp"),
+    "kyc": (KYC, "submitted_at"),
+}
+CLEARED = {"claimed_by": None, "claimed_until": None}
+
+
+def pending(queue):
+    model, _field = QUEUES[queue]
+    queryset = model.objects.filter(status="pending")
+    if queue == "withdrawals":
+        queryset = queryset.filter(transaction_type="WITHDRAW")
+    return queryset
+
+
+def free(at=None):
+    """Rows without a running lease."""
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lte=at or timezone.now())
+
+
+def open_to(staff, at=None):
+    """Rows `staff` may settle: free, or leased to them."""
+    return free(at) | Q(claimed_by=staff)
+
+
+def held_by(staff, at=None):
+    """Rows leased to `staff`."""
+    return Q(claimed_by=staff, claimed_until__gt=at or timezone.now())
+
+
+def claim_next(queue, staff, count=BATCH):
+    """Claims up to `count` of the oldest free pending items. Returns their ids."""
+    model, field = QUEUES[queue]
+    now = timezone.now()
+    with db_tx.atomic():
+        ids = list(
+            pending(queue).filter(free(now)).order_by(field, "pk")
+            .select_for_update(skip_locked=True).values_list("pk", flat=True)[:count]
+        )
+        if ids:
+            model.objects.filter(pk__in=ids).update(claimed_by=staff, claimed_until=now + LEASE)
+    return ids
+
+
+def renew(queue, staff):
+    """Extends `staff`'s running leases on the queue. Returns how many."""
+    now = timezone.now()
+    return pending(queue).filter(held_by(staff, now)).update(claimed_until=now + LEASE)
+
+
+def release(queue, staff, ids=None):
+    """Hands back `staff`'s claims on the queue (all, or `ids`)."""
+    claimed = pending(queue).filter(claimed_by=staff)
+    if ids is not None:
+        claimed = claimed.filter(pk__in=ids)
+    return claimed.update(**CLEARED)
+
+
+def holder(item, staff, at=None):
+    """The other reviewer whose lease covers `item`, or None."""
+    if item.status != "pending" or item.claimed_by_id in (None, staff.pk):
+        return None
+    if item.claimed_until is None or item.claimed_until <= (at or timezone.now()):
+        return None
+    return item.claimed_by
@@ -1,4 +1,4 @@
-from .models import BankDeposit, Transaction
+from .pending import pending_counts as queue_counts
 
 def pending_counts(request):
     if not request.user.is_authenticated:
@@ -7,10 +7,10 @@ def pending_counts(request):
     if not request.user.is_staff:
         return {}
 
-    deposit_count = BankDeposit.objects.filter(status="pending").count()
-    withdraw_count = Transaction.objects.filter(transaction_type="WITHDRAW", status="pending").count()
+    counts = queue_counts()
 
     return {
-        "pending_deposits_count": deposit_count,
-        "pending_withdrawals_count": withdraw_count,
+        "pending_deposits_count": counts["deposits"],
+        "pending_withdrawals_count": counts["withdrawals"],
+        "pending_kyc_count": counts["kyc"],
     }
@@ -0,0 +1,103 @@
+"""
+Server-Sent Events push channel (rates + staff queue counts).
+
+Under ASGI every worker runs a single Broadcaster: one loop that watches
+the shared version tokens once a second and, only when one moves, loads
+the new payload once and wakes every connected stream. An idle browser
+therefore costs one open connection and no queries.
+
+The web service serves the ASGI app (build.sh, gunicorn.conf.py), so
+streams are held open on the same port as every other page; the workers
+share the version tokens through the "shared" cache (REDIS_URL, or
+SHARED_CACHE_DIR on one host). Under WSGI (e.g. runserver) a stream would
+pin a thread, so there the view answers with the current snapshot and a
+`retry` hint and EventSource reconnects on its own, which degrades to
+polling.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
+from .pending import pending_counts, pending_version
+from .rates import current_rate, rates_payload
+
+POLL_INTERVAL = 1.0      # seconds between version checks (per worker)
+KEEPALIVE = 15.0         # seconds between comment pings on idle streams
+RETRY_MS = 10000         # reconnect delay advertised to browsers
+
+
+def format_event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+
+def snapshot(include_pending):
+    """Current state as a list of SSE frames (WSGI fallback)."""
+    frames = [f"retry: {RETRY_MS}\n\n", format_event("rates", rates_payload())]
+    if include_pending:
+        frames.append(format_event("pending", pending_counts()))
+    return frames
+
+
+class Broadcaster:
+    def __init__(self):
+        self._loop = None
+        self._task = None
+        self._changed = None
+        self._listeners = 0
+        # name -> (version, payload); payload None until first load
+        self.state = {"rates": (None, None), "pending": (None, None)}
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._task = None
+            self._changed = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def _refresh(self, name, version_func, load_func):
+        version = await sync_to_async(version_func, thread_sensitive=False)()
+        if version == self.state[name][0]:
+            return False
+        payload = await sync_to_async(load_func)()
+        self.state[name] = (version, payload)
+        return True
+
+    async def _run(self):
+        while self._listeners:
+            try:
+                changed = await self._refresh("rates", current_rate.version, rates_payload)
+                changed |= await self._refresh("pending", pending_version, pending_counts)
+            except Exception:
+                # A cache/DB hiccup must not kill the loop for every stream
+                changed = False
+            if changed:
+                fired, self._changed = self._changed, asyncio.Event()
+                fired.set()
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def stream(self, include_pending):
+        """Yields SSE frames for one client until it disconnects."""
+        self._listeners += 1
+        self._bind()
+        sent = {}
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while True:
+                for name, (version, payload) in self.state.items():
+                    if name == "pending" and not include_pending:
+                        continue
+                    if payload is not None and sent.get(name) != version:
+                        sent[name] = version
+                        yield format_event(name, payload)
+                try:
+                    await asyncio.wait_for(self._changed.wait(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            self._listeners -= 1
+
+
+broadcaster = Broadcaster()
@@ -1,4 +1,5 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.forms import PasswordChangeForm
@@ -45,3 +46,19 @@ class ProfileUpdateForm(forms.ModelForm):
         model = UserProfile
         fields = ["full_name", "phone", "dob", "address", "nic_passport", "bio"]
 
+
+class IdListField(forms.Field):
+    """Row ids posted as repeated values (checkboxes), as sorted distinct ints."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return sorted({int(pk) for pk in value or []})
+        except (TypeError, ValueError):
+            raise ValidationError("Invalid selection.", code="invalid")
+
+
+class BulkReviewForm(forms.Form):
+    """The staff bulk approve / reject buttons (reviews.py)."""
+    ids = IdListField()
+    action = forms.ChoiceField(choices=[("approve", "Approve"), ("reject", "Reject")])
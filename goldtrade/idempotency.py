@@ -0,0 +1,166 @@
+"""
+Idempotency keys for money-moving POSTs.
+
+Forms carry a one-time key ({% idempotency_field %}); API clients send an
+`Idempotency-Key` header. The first POST with a key claims it with a
+unique INSERT into IdempotencyKey — one statement, before the view
+touches any wallet row, and atomic on every worker and host — and stores
+a compact copy of its outcome (status, redirect, flash messages) when it
+finishes. A double click or a retry with the same key then gets that
+outcome back instead of running the trade again. A duplicate that arrives
+while the first is still running is answered at once (409, or a redirect
+back for forms) rather than held. Keys expire after IDEMPOTENCY_TTL.
+
+Requests without a key behave exactly as before.
+"""
+import hashlib
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError
+from django.db import transaction as db_tx
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+FIELD = "idempotency_key"
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+
+IN_FLIGHT = "in-flight"
+CLAIM_TIMEOUT = timedelta(minutes=5)  # an unfinished claim this old was lost with its worker
+MAX_STORED_BODY = 16384   # bytes; bigger bodies are not replayed
+PURGE_EVERY = 1000        # claims between sweeps of expired keys
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def _hashed(request, key):
+    # Scoped to the user and the endpoint, so keys cannot collide across them
+    raw = f"{request.user.pk}:{request.path}:{key}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def _claim(key):
+    """
+    Claims `key`. Returns None when this request now holds it, else what
+    the earlier request left: its outcome (a dict) or IN_FLIGHT.
+    """
+    now = timezone.now()
+    for _attempt in range(2):
+        try:
+            with db_tx.atomic():
+                row = IdempotencyKey.objects.create(key=key, claimed_at=now)
+        except IntegrityError:
+            row = IdempotencyKey.objects.filter(key=key).first()
+            if row is None:
+                continue  # the earlier attempt failed and let go meanwhile
+        else:
+            if row.pk % PURGE_EVERY == 0:
+                purge(now)
+            return None
+
+        expired = row.claimed_at <= now - timedelta(seconds=settings.IDEMPOTENCY_TTL)
+        lost = row.outcome is None and row.claimed_at <= now - CLAIM_TIMEOUT
+        if not (expired or lost):
+            return row.outcome or IN_FLIGHT
+        # Take the key over, unless a concurrent retry just did
+        if IdempotencyKey.objects.filter(pk=row.pk, claimed_at=row.claimed_at).update(
+            claimed_at=now, outcome=None
+        ):
+            return None
+        return IN_FLIGHT
+    return IN_FLIGHT
+
+
+def purge(now=None):
+    """Deletes expired keys. Returns how many."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.IDEMPOTENCY_TTL)
+    return IdempotencyKey.objects.filter(claimed_at__lt=cutoff).delete()[0]
+
+
+def _outcome(response, flashed):
+    """What a replay needs, or None if the response should not be kept."""
+    if response.status_code >= 500 or response.streaming:
+        return None
+    body = ""
+    if len(response.content) <= MAX_STORED_BODY:
+        try:
+            body = response.content.decode(response.charset)
+        except UnicodeDecodeError:
+            pass  # not text: replayed without a body, like an oversized one
+    return {
+        "status": response.status_code,
+        "content_type": response.get("Content-Type"),
+        "location": response.get("Location"),
+        "body": body,
+        "messages": [(m.level, str(m.message), m.extra_tags) for m in flashed],
+    }
+
+
+def _replay(request, outcome):
+    for level, message, extra_tags in outcome["messages"]:
+        messages.add_message(request, level, message, extra_tags=extra_tags)
+    response = HttpResponse(
+        outcome["body"], status=outcome["status"], content_type=outcome["content_type"]
+    )
+    if outcome["location"]:
+        response["Location"] = outcome["location"]
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _flashed(storage):
+    # Iterating marks the messages as shown; leave that to the response
+    used = storage.used
+    flashed = list(storage)
+    storage.used = used
+    return flashed
+
+
+def idempotent(view):
+    """
+    Decorator for POST views (after login_required). Runs the view at most
+    once per idempotency key; duplicates replay the first outcome.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = None
+        if request.method == "POST":
+            key = request.META.get(HEADER) or request.POST.get(FIELD)
+        if not key:
+            return view(request, *args, **kwargs)
+
+        key = _hashed(request, key)
+        earlier = _claim(key)
+        if isinstance(earlier, dict):
+            return _replay(request, earlier)
+        if earlier == IN_FLIGHT:
+            if HEADER in request.META:
+                return HttpResponse("This request is still being processed.", status=409)
+            messages.info(request, "Your previous request is still being processed.")
+            return redirect(request.path)
+
+        storage = messages.get_messages(request)
+        # Messages flashed by this view are the ones to replay
+        already_flashed = len(_flashed(storage))
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(key=key).delete()
+            raise
+
+        outcome = _outcome(response, _flashed(storage)[already_flashed:])
+        if outcome is None:
+            IdempotencyKey.objects.filter(key=key).delete()
+        else:
+            IdempotencyKey.objects.filter(key=key).update(outcome=outcome)
+        return response
+
+    return wrapper
@@ -0,0 +1,248 @@
+"""
+Image pipeline for bank slips, KYC documents and profile pictures.
+
+Uploads are saved as sent; once the row commits, a post_save signal
+(signals.py) hands them to this process's worker pool
+(settings.IMAGE_WORKERS threads). For each new image a worker
+
+  * applies the EXIF orientation, then drops all metadata (GPS, device)
+    from a copy that replaces the upload, at most ORIGINAL_MAX_SIDE
+    pixels on the long side (enough to read a document at full size):
+    JPEGs are re-saved at ORIGINAL_QUALITY, everything else as lossless
+    PNG. An upload without metadata is kept byte for byte;
+  * writes a display copy under display/, WebP (JPEG where Pillow lacks
+    WebP) and at most MAX_SIDE pixels on the long side, which pages show
+    in place of the original;
+  * writes a THUMB_SIDE thumbnail under thumbs/ for list pages and the
+    admin.
+
+The row moves to the new files with one conditional UPDATE (only while
+it still points at the upload that was processed, so a newer upload
+wins), which fires no signals. An image Pillow cannot read stays as
+uploaded and is logged. `manage.py process_images` catches up uploads
+from before the pipeline or lost to a restart, and reports how much disk
+the originals and the derived copies take.
+
+The media disk (1 GB on Render) also holds the transaction archives
+(archive.py) and the month-end statement PDFs (statements.py). Nothing
+expires any of them: archives are the only copy of old history, and a
+statement PDF is written per wallet and month. Watch the disk as they
+grow; `process_images` prints the size of each part.
+"""
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from PIL import Image, ImageOps, features
+
+from . import account
+from .models import KYC, BankDeposit, UserProfile
+
+logger = logging.getLogger(__name__)
+
+MAX_SIDE = 1600        # px, long side of the display copy
+THUMB_SIDE = 320       # px, long side of the thumbnail
+ORIGINAL_MAX_SIDE = 2560  # px, long side of a re-saved original
+ORIGINAL_QUALITY = 85  # JPEG originals, re-saved without metadata
+QUALITY = 80
+THUMB_QUALITY = 70
+
+FORMAT, EXT = ("WEBP", ".webp") if features.check("webp") else ("JPEG", ".jpg")
+
+# model -> {image field: (display copy field, thumbnail field)}
+IMAGES = {
+    BankDeposit: {"slip": ("slip_display", "slip_thumb")},
+    KYC: {
+        "nic_front": ("nic_front_display", "nic_front_thumb"),
+        "nic_back": ("nic_back_display", "nic_back_thumb"),
+        "selfie": ("selfie_display", "selfie_thumb"),
+    },
+    UserProfile: {"profile_picture": ("picture_display", "picture_thumb")},
+}
+
+
+def _derived(name, folder):
+    directory, base = posixpath.split(name)
+    return posixpath.join(directory, folder, posixpath.splitext(base)[0] + EXT)
+
+
+def display_name(name):
+    """Where the display copy of the stored image `name` goes."""
+    return _derived(name, "display")
+
+
+def thumb_name(name):
+    """Where the thumbnail of the stored image `name` goes."""
+    return _derived(name, "thumbs")
+
+
+def stale(instance):
+    """Image fields of `instance` whose display copy or thumbnail is missing or belongs to an older image."""
+    found = []
+    for field, (display, thumb) in IMAGES.get(type(instance), {}).items():
+        image = getattr(instance, field)
+        if image and (
+            getattr(instance, display).name != display_name(image.name)
+            or getattr(instance, thumb).name != thumb_name(image.name)
+        ):
+            found.append(field)
+    return found
+
+
+# =========================
+# Processing
+# =========================
+def _bounded(image, side):
+    copy = image.copy()
+    copy.thumbnail((side, side), Image.LANCZOS)
+    keep_alpha = FORMAT == "WEBP" and (copy.mode in ("RGBA", "LA", "PA") or "transparency" in copy.info)
+    copy = copy.convert("RGBA" if keep_alpha else "RGB")
+    copy.info = {}  # no EXIF, ICC or comments in the output
+    return copy
+
+
+def _encode(image, quality):
+    buffer = BytesIO()
+    image.save(buffer, FORMAT, quality=quality)
+    return ContentFile(buffer.getvalue())
+
+
+# Image.info keys that describe the encoding, not the picture's subject
+HARMLESS_INFO = {
+    "adobe", "adobe_transform", "aspect", "background", "compression", "dpi", "duration", "gamma",
+    "icc_profile", "interlace", "jfif", "jfif_density", "jfif_unit", "jfif_version", "loop", "progression",
+    "progressive", "srgb", "transparency",
+}
+
+
+def _original(image, info, source_format):
+    """
+    Copy of `image` (already upright) without metadata, at most
+    ORIGINAL_MAX_SIDE px: (extension, file). None when the upload's `info`
+    holds nothing to strip (the EXIF orientation lives in it too): it
+    stays byte for byte.
+    """
+    if set(info) <= HARMLESS_INFO:
+        return None
+    options = {}
+    if image.info.get("icc_profile"):
+        options["icc_profile"] = image.info["icc_profile"]  # colour, not personal data
+    alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    copy = image.copy()
+    copy.thumbnail((ORIGINAL_MAX_SIDE, ORIGINAL_MAX_SIDE), Image.LANCZOS)
+    if source_format in ("JPEG", "MPO"):
+        copy = copy if copy.mode in ("RGB", "L", "CMYK") else copy.convert("RGB")
+        ext, format_, options["quality"] = ".jpg", "JPEG", ORIGINAL_QUALITY
+    else:
+        copy = copy.convert("RGBA" if alpha else "RGB")
+        ext, format_ = ".png", "PNG"
+    copy.info = {}
+    buffer = BytesIO()
+    copy.save(buffer, format_, **options)
+    return ext, ContentFile(buffer.getvalue())
+
+
+def _replace(storage, name, content):
+    # Derived names must match display_name() / thumb_name() exactly
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, content)
+
+
+def process_field(instance, field):
+    """
+    Replaces one upload of `instance` with its clean original and writes
+    its display copy and thumbnail. Returns (upload bytes, original
+    bytes, display copy + thumbnail bytes), or None if it was left as it is.
+    """
+    model = type(instance)
+    display_field, thumb_field = IMAGES[model][field]
+    image_file = getattr(instance, field)
+    storage, source = image_file.storage, image_file.name
+    old_files = {getattr(instance, display_field).name, getattr(instance, thumb_field).name} - {""}
+    try:
+        before = storage.size(source)
+        with storage.open(source, "rb") as handle:
+            image = Image.open(handle)
+            source_format, info = image.format, dict(image.info)
+            image = ImageOps.exif_transpose(image)
+            original = _original(image, info, source_format)
+            display, thumb = _bounded(image, MAX_SIDE), _bounded(image, THUMB_SIDE)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning("Image %s of %s #%s left as uploaded: %s", source, model.__name__, instance.pk, exc)
+        return None
+
+    name = source
+    if original is not None:
+        ext, content = original
+        name = storage.save(posixpath.splitext(source)[0] + ext, content)
+    display_saved = _replace(storage, display_name(name), _encode(display, QUALITY))
+    thumb_saved = _replace(storage, thumb_name(name), _encode(thumb, THUMB_QUALITY))
+    written = (display_saved, thumb_saved) if name == source else (name, display_saved, thumb_saved)
+
+    updated = model.objects.filter(pk=instance.pk, **{field: source}).update(
+        **{field: name, display_field: display_saved, thumb_field: thumb_saved}
+    )
+    if not updated:
+        # Replaced (or removed) meanwhile: the newer upload gets its own run
+        for written_name in written:
+            storage.delete(written_name)
+        return None
+    if name != source:
+        storage.delete(source)  # the clean original replaces it
+    for old in old_files - set(written):
+        storage.delete(old)
+    setattr(instance, field, name)
+    setattr(instance, display_field, display_saved)
+    setattr(instance, thumb_field, thumb_saved)
+    if model is UserProfile:
+        account.invalidate(instance.user_id)  # request.account caches the picture URL
+    return before, storage.size(name), storage.size(display_saved) + storage.size(thumb_saved)
+
+
+def process(model, pk, fields=None):
+    """Processes the stale images (of `fields`, default all) of one row."""
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return []
+    return [process_field(instance, field) for field in stale(instance) if fields is None or field in fields]
+
+
+# =========================
+# Worker pool
+# =========================
+def _run(model, pk, fields):
+    close_old_connections()
+    try:
+        process(model, pk, fields)
+    except Exception:
+        logger.exception("Image processing failed for %s #%s", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+class ImagePipeline:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, model, pk, fields=None):
+        if settings.IMAGE_WORKERS <= 0:
+            return _run(model, pk, fields)
+        self._pool().submit(_run, model, pk, fields)
+
+    def _pool(self):
+        # Created lazily so the threads live in the worker process, as in intake.py
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(settings.IMAGE_WORKERS, thread_name_prefix="images")
+        return self._executor
+
+
+pipeline = ImagePipeline()
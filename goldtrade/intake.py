@@ -0,0 +1,186 @@
+"""
+Group-commit intake for buy/sell orders (settings.TRADE_INTAKE).
+
+Right after a new rate is posted, many customers trade at once and each
+POST would pay for its own BEGIN/COMMIT (and fsync). With the intake on,
+the views hand their order to a per-worker committer thread instead: it
+waits up to TRADE_INTAKE_WINDOW_MS after the first order for more to
+arrive, but no longer than it takes every trade in flight in this worker
+to be queued (a lone trade commits straight away), then applies the whole
+batch in one transaction:
+
+  * guarded balance UPDATEs (ledger.move) in wallet-id order, so two
+    workers committing overlapping batches cannot deadlock;
+  * one bulk INSERT for the Transaction rows and one for the ledger legs.
+
+Every caller still gets its own outcome: its Transaction, or the
+InsufficientFunds raised for its order alone. Batching only pays off when
+requests are served concurrently; under ASGI (gunicorn.conf.py) Django runs
+every sync request on its own thread, so a worker can gather as many orders
+as it has trades in flight.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db import transaction as db_tx
+
+from . import ledger, portfolio, wallet_ops
+from .ledger import InsufficientFunds
+from .models import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _movement(kind, grams, total):
+    """(cash, gold) change for the wallet, as in wallet_ops.buy / sell."""
+    return (-total, grams) if kind == "BUY" else (total, -grams)
+
+
+class _Order:
+    __slots__ = ("wallet", "kind", "grams", "price", "total", "future")
+
+    def __init__(self, wallet, kind, grams, price, total):
+        self.wallet = wallet
+        self.kind = kind
+        self.grams = grams
+        self.price = price
+        self.total = total
+        self.future = Future()
+
+
+class TradeIntake:
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        # Callers inside submit(); once all of their orders are in the
+        # batch nobody else can join it, so it commits without waiting
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    def submit(self, wallet, kind, grams, price, total):
+        """Queues one order and blocks until its batch has committed."""
+        order = _Order(wallet, kind, grams, price, total)
+        self._ensure_committer()
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            self._queue.put(order)
+            try:
+                return order.future.result(timeout=settings.TRADE_INTAKE_TIMEOUT)
+            except FutureTimeout:
+                # Only give up if the committer has not picked the order yet;
+                # otherwise it is being written and the outcome is imminent.
+                if order.future.cancel():
+                    raise
+                return order.future.result()
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+    def _ensure_committer(self):
+        # Started lazily so it lives in the worker process, not the master
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run, name="trade-intake", daemon=True
+                    )
+                    self._thread.start()
+
+    # -------------------------
+    # Committer thread
+    # -------------------------
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            close_old_connections()
+            counts = {id(order.wallet): (order.wallet, order.wallet.entries_since_checkpoint) for order in batch}
+            try:
+                self._commit(batch)
+            except Exception:
+                logger.exception("Trade batch of %d failed; applying one by one", len(batch))
+                # ledger.move counted the rolled-back legs on the callers' wallets
+                for wallet, count in counts.values():
+                    wallet.entries_since_checkpoint = count
+                self._commit_each(batch)
+            finally:
+                close_old_connections()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + settings.TRADE_INTAKE_WINDOW_MS / 1000
+        while len(batch) < min(settings.TRADE_INTAKE_MAX_BATCH, self._in_flight):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Drops orders whose caller timed out; the rest can no longer be cancelled
+        return [order for order in batch if order.future.set_running_or_notify_cancel()]
+
+    def _commit(self, batch):
+        # Stable sort: orders for the same wallet keep their arrival order
+        batch = sorted(batch, key=lambda order: order.wallet.pk)
+        accepted, refused = [], []
+        with db_tx.atomic():
+            for order in batch:
+                try:
+                    ledger.move(order.wallet, *_movement(order.kind, order.grams, order.total))
+                except InsufficientFunds as exc:
+                    refused.append((order, exc))
+                else:
+                    accepted.append(order)
+
+            txs = Transaction.objects.bulk_create([
+                Transaction(
+                    wallet=order.wallet,
+                    transaction_type=order.kind,
+                    gold_amount=order.grams,
+                    price_per_gram=order.price,
+                    total_amount=order.total,
+                )
+                for order in accepted
+            ])
+            ledger.record_many([
+                (order.wallet, order.kind, *_movement(order.kind, order.grams, order.total), "house", tx)
+                for order, tx in zip(accepted, txs)
+            ])
+            portfolio.record_trades(
+                [(order.wallet, order.kind, order.grams, order.total) for order in accepted]
+            )
+
+        for order, tx in zip(accepted, txs):
+            order.future.set_result(tx)
+        for order, exc in refused:
+            order.future.set_exception(exc)
+
+    def _commit_each(self, batch):
+        for order in batch:
+            apply = wallet_ops.buy if order.kind == "BUY" else wallet_ops.sell
+            try:
+                order.future.set_result(apply(order.wallet, order.grams, order.price, order.total))
+            except Exception as exc:
+                order.future.set_exception(exc)
+
+
+trade_intake = TradeIntake()
+
+
+def buy(wallet, grams, price, amount):
+    """wallet_ops.buy through the group-commit queue."""
+    return trade_intake.submit(wallet, "BUY", grams, price, amount)
+
+
+def sell(wallet, grams, price, total):
+    """wallet_ops.sell through the group-commit queue."""
+    return trade_intake.submit(wallet, "SELL", grams, price, total)
@@ -0,0 +1,211 @@
+"""
+Append-only, double-entry wallet ledger.
+
+Every balance change is a posting: a wallet leg plus an opposite leg on a
+house account, grouped by a journal id, so the legs of each asset sum to
+zero. Wallet.cash_balance / gold_balance stay as the materialized balance
+for hot reads and are moved in the same transaction as the legs.
+
+Balances move with a single guarded UPDATE (move()); the legs are written
+right after it in the same transaction (record()).
+
+Every CHECKPOINT_EVERY wallet entries a LedgerCheckpoint records the
+balance, so the balance at any moment is the checkpoint before it plus
+the few entries after it — O(delta), never a replay of the full history.
+
+Movements on real wallets also feed the daily staff rollup (rollups.py).
+"""
+import uuid
+from decimal import Decimal
+
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import account, rollups
+from .models import LedgerCheckpoint, LedgerEntry, Wallet
+
+CHECKPOINT_EVERY = 100
+
+ZERO = Decimal("0")
+
+
+def _legs(journal, wallet, kind, counter, transaction, at, cash, gold):
+    legs = []
+    for asset, amount in (("CASH", cash), ("GOLD", gold)):
+        if not amount:
+            continue
+        common = {
+            "journal": journal, "asset": asset, "kind": kind,
+            "transaction": transaction, "created_at": at,
+            "transaction_at": transaction.timestamp if transaction else None,
+        }
+        legs.append(LedgerEntry(wallet=wallet, account="wallet", amount=amount, **common))
+        legs.append(LedgerEntry(wallet=None, account=counter, amount=-amount, **common))
+    return legs
+
+
+class InsufficientFunds(Exception):
+    """A guarded debit matched no row: the balance would go negative."""
+
+
+def move(wallet, cash=ZERO, gold=ZERO):
+    """
+    Moves the materialized balances with one conditional UPDATE:
+
+        UPDATE wallet SET cash_balance = cash_balance + :cash, ...
+        WHERE id = :id AND cash_balance >= -:cash  (for debits)
+
+    The statement is both the balance check and the row lock, so nothing
+    is read back into Python first. Raises InsufficientFunds when a debit
+    would overdraw. Call inside an atomic block, before record().
+    """
+    cash, gold = Decimal(cash), Decimal(gold)
+    guard = {"pk": wallet.pk}
+    if cash < 0:
+        guard["cash_balance__gte"] = -cash
+    if gold < 0:
+        guard["gold_balance__gte"] = -gold
+    entries = bool(cash) + bool(gold)
+    updated = Wallet.objects.filter(**guard).update(
+        cash_balance=F("cash_balance") + cash,
+        gold_balance=F("gold_balance") + gold,
+        entries_since_checkpoint=F("entries_since_checkpoint") + entries,
+    )
+    if not updated:
+        raise InsufficientFunds(wallet.pk)
+    wallet.entries_since_checkpoint += entries
+    account.invalidate_on_commit(wallet.user_id)
+
+
+def record(wallet, kind, cash=ZERO, gold=ZERO, counter="house", transaction=None):
+    """
+    Writes the ledger legs for a movement already applied by move().
+    Must run after move() in the same transaction, so entry ids for a
+    wallet follow the order in which its row lock was taken.
+    """
+    legs = _legs(
+        uuid.uuid4(), wallet, kind, counter, transaction, timezone.now(),
+        Decimal(cash), Decimal(gold),
+    )
+    if legs:
+        LedgerEntry.objects.bulk_create(legs)
+        _maybe_checkpoint(wallet)
+        rollups.record([(wallet, kind, cash, gold)])
+    return legs
+
+
+def record_many(postings):
+    """
+    record() for many movements at once: one INSERT for every leg, then
+    the checkpoint check per wallet. `postings` is a list of
+    (wallet, kind, cash, gold, counter, transaction) already applied by
+    move() in this transaction, in the order they were moved.
+    """
+    at = timezone.now()
+    legs, wallets = [], {}
+    for wallet, kind, cash, gold, counter, transaction in postings:
+        legs += _legs(uuid.uuid4(), wallet, kind, counter, transaction, at, Decimal(cash), Decimal(gold))
+        wallets[wallet.pk] = wallet
+    if legs:
+        LedgerEntry.objects.bulk_create(legs)
+        for wallet in wallets.values():
+            _maybe_checkpoint(wallet)
+        rollups.record([(wallet, kind, cash, gold) for wallet, kind, cash, gold, *_ in postings])
+    return legs
+
+
+def post(wallet, kind, cash=ZERO, gold=ZERO, counter="house", transaction=None):
+    """
+    Posts a balanced movement of `cash` / `gold` (signed, from the
+    wallet's point of view): move() then record(). Call inside an atomic
+    block; raises InsufficientFunds instead of overdrawing.
+    """
+    move(wallet, cash, gold)
+    return record(wallet, kind, cash, gold, counter, transaction)
+
+
+def record_opening(wallet):
+    """
+    Books a wallet's initial balances (e.g. the demo grant) as OPENING
+    entries without moving them again. Used when a wallet is created with
+    non-zero balances and by the backfill migration.
+    """
+    legs = _legs(
+        uuid.uuid4(), wallet, "OPENING", "opening", None, timezone.now(),
+        Decimal(wallet.cash_balance), Decimal(wallet.gold_balance),
+    )
+    if legs:
+        LedgerEntry.objects.bulk_create(legs)
+        Wallet.objects.filter(pk=wallet.pk).update(
+            entries_since_checkpoint=F("entries_since_checkpoint") + len(legs) // 2
+        )
+        wallet.entries_since_checkpoint += len(legs) // 2
+        _maybe_checkpoint(wallet)
+        rollups.record([(wallet, "OPENING", wallet.cash_balance, wallet.gold_balance)])
+    return legs
+
+
+def _maybe_checkpoint(wallet):
+    # `wallet.entries_since_checkpoint` is the caller's copy plus what this
+    # request added; it can lag concurrent writers, which only delays a
+    # checkpoint to a later posting. The conditional reset decides for real.
+    if wallet.entries_since_checkpoint < CHECKPOINT_EVERY:
+        return None
+    due = Wallet.objects.filter(
+        pk=wallet.pk, entries_since_checkpoint__gte=CHECKPOINT_EVERY
+    ).update(entries_since_checkpoint=0)
+    wallet.entries_since_checkpoint = 0
+    if not due:
+        return None
+    current = Wallet.objects.values("cash_balance", "gold_balance").get(pk=wallet.pk)
+    last = wallet.ledger_entries.order_by("-id").values("id", "created_at").first()
+    return LedgerCheckpoint.objects.create(
+        wallet_id=wallet.pk,
+        entry_id=last["id"],
+        cash_balance=current["cash_balance"],
+        gold_balance=current["gold_balance"],
+        created_at=last["created_at"],
+    )
+
+
+# =========================
+# Reads
+# =========================
+def balance_at(wallet, at=None):
+    """
+    Returns {"cash": Decimal, "gold": Decimal} for the wallet as of `at`
+    (default: now) from the nearest checkpoint plus the entries after it.
+    """
+    checkpoints = wallet.ledger_checkpoints.order_by("-entry_id")
+    entries = wallet.ledger_entries.all()
+    if at is not None:
+        checkpoints = checkpoints.filter(created_at__lte=at)
+        entries = entries.filter(created_at__lte=at)
+
+    checkpoint = checkpoints.first()
+    balance = {"cash": ZERO, "gold": ZERO}
+    if checkpoint:
+        balance = {"cash": checkpoint.cash_balance, "gold": checkpoint.gold_balance}
+        entries = entries.filter(id__gt=checkpoint.entry_id)
+
+    for row in entries.values("asset").annotate(total=Sum("amount")):
+        balance["cash" if row["asset"] == "CASH" else "gold"] += row["total"]
+    return {
+        "cash": balance["cash"].quantize(Decimal("0.01")),
+        "gold": balance["gold"].quantize(Decimal("0.0001")),
+    }
+
+
+def verify(wallets=None):
+    """
+    Compares materialized balances with the ledger.
+    Yields (wallet, ledger_balance) for every wallet that disagrees.
+    """
+    wallets = Wallet.objects.all() if wallets is None else wallets
+    for wallet in wallets.iterator():
+        ledger_balance = balance_at(wallet)
+        if (
+            ledger_balance["cash"] != wallet.cash_balance
+            or ledger_balance["gold"] != wallet.gold_balance
+        ):
+            yield wallet, ledger_balance
@@ -0,0 +1,263 @@
+"""
+Limit order engine.
+
+Open orders are indexed twice, both sorted by limit price:
+
+  * in the DB, by a partial index on (side, limit_price) WHERE open;
+  * in process memory, by an OrderBook: two sorted lists of
+    (limit_price, id). A BUY crosses when the sell rate falls to its limit
+    or below, so crossing BUYs are always a suffix of the list; a SELL
+    crosses when the buy rate reaches its limit, so crossing SELLs are a
+    prefix. bisect finds the cut, so a rate update costs O(log n) plus
+    the orders that actually cross, whatever the size of the book.
+
+The book is topped up from the DB only when the shared "limit-orders"
+version moved (an order was placed or cancelled somewhere), and then only
+with recently created orders. Orders closed by another worker stay in the
+book until they come up as candidates; the guarded claim below drops them.
+
+Crossing orders are settled in batches of SETTLE_BATCH, in wallet-id
+order, with the same guarded balance UPDATEs as market trades. An order
+the wallet cannot cover is marked failed; nothing is reserved up front.
+
+Settlement runs on a per-process settler thread, not in the staff
+request that posted the rate: on_new_rate() only queues the rate once it
+has committed, and rates are evaluated one at a time in posting order.
+At interpreter exit the queue is drained for up to FLUSH_TIMEOUT seconds.
+"""
+import atexit
+import bisect
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+from decimal import ROUND_DOWN, ROUND_UP, Decimal
+
+from django.db import close_old_connections
+from django.db import transaction as db_tx
+from django.utils import timezone
+
+from . import ledger, portfolio
+from .ledger import InsufficientFunds
+from .models import LimitOrder, Transaction
+from .versions import bump_version, get_version
+
+logger = logging.getLogger(__name__)
+
+ORDERS_VERSION = "limit-orders"
+SETTLE_BATCH = 500
+FLUSH_TIMEOUT = 30.0   # seconds allowed at exit
+
+# Re-read orders created this long before the last sync, so one whose
+# transaction committed after a later id was seen is not missed.
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class OrderBook:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buys = []     # (limit_price, id), ascending
+        self.sells = []    # (limit_price, id), ascending
+        self._known = set()
+        self._version = None
+        self._synced_at = None
+
+    def refresh(self):
+        version = get_version(ORDERS_VERSION)
+        if self._synced_at is not None and version == self._version:
+            return
+        started = timezone.now()
+        orders = LimitOrder.objects.filter(status="open")
+        if self._synced_at is not None:
+            orders = orders.filter(created_at__gte=self._synced_at - SYNC_OVERLAP)
+        for pk, side, price in orders.values_list("id", "side", "limit_price").iterator():
+            self.add(pk, side, price)
+        self._version, self._synced_at = version, started
+
+    def add(self, pk, side, price):
+        if pk not in self._known:
+            self._known.add(pk)
+            bisect.insort(self.buys if side == "BUY" else self.sells, (price, pk))
+
+    def take_crossing(self, buy_rate, sell_rate):
+        """Removes and returns the ids of every order the rates cross."""
+        cut = bisect.bisect_left(self.buys, (sell_rate,))
+        crossing = [pk for _, pk in self.buys[cut:]]
+        del self.buys[cut:]
+
+        cut = bisect.bisect_right(self.sells, (buy_rate, float("inf")))
+        crossing += [pk for _, pk in self.sells[:cut]]
+        del self.sells[:cut]
+
+        self._known.difference_update(crossing)
+        return crossing
+
+
+book = OrderBook()
+
+
+# =========================
+# Placing / cancelling
+# =========================
+def place(wallet, side, grams, limit_price):
+    order = LimitOrder.objects.create(
+        wallet=wallet, side=side, grams=grams, limit_price=limit_price
+    )
+    db_tx.on_commit(lambda: bump_version(ORDERS_VERSION))
+    return order
+
+
+def cancel(order):
+    """Returns False if the order was no longer open."""
+    cancelled = LimitOrder.objects.filter(pk=order.pk, status="open").update(
+        status="cancelled", closed_at=timezone.now()
+    )
+    if cancelled:
+        db_tx.on_commit(lambda: bump_version(ORDERS_VERSION))
+    return bool(cancelled)
+
+
+# =========================
+# Evaluation
+# =========================
+def evaluate(rate):
+    """
+    Fills every open order that `rate` crosses. Returns the number filled.
+    Runs after the GoldRate commit (see signals.py).
+    """
+    buy_rate, sell_rate = Decimal(rate.buy_rate), Decimal(rate.sell_rate)
+    with book.lock:
+        book.refresh()
+        crossing = book.take_crossing(buy_rate, sell_rate)
+
+    filled = 0
+    for start in range(0, len(crossing), SETTLE_BATCH):
+        chunk = crossing[start:start + SETTLE_BATCH]
+        try:
+            filled += _settle(chunk, buy_rate, sell_rate)
+        except Exception:
+            logger.exception("Settling %d limit orders failed", len(chunk))
+            # Put them back so the next rate update retries them
+            with book.lock:
+                for pk, side, price in LimitOrder.objects.filter(
+                    id__in=chunk, status="open"
+                ).values_list("id", "side", "limit_price"):
+                    book.add(pk, side, price)
+    return filled
+
+
+def _settle(ids, buy_rate, sell_rate):
+    orders = sorted(
+        LimitOrder.objects.filter(id__in=ids, status="open").select_related("wallet"),
+        key=lambda order: (order.wallet_id, order.id),
+    )
+    now = timezone.now()
+    accepted = []
+    with db_tx.atomic():
+        for order in orders:
+            # Claim first: another worker may be settling the same order
+            if not LimitOrder.objects.filter(pk=order.pk, status="open").update(
+                status="filled", closed_at=now
+            ):
+                continue
+            if order.side == "BUY":
+                price = sell_rate
+                total = (order.grams * price).quantize(Decimal("0.01"), rounding=ROUND_UP)
+                cash, gold = -total, order.grams
+            else:
+                price = buy_rate
+                total = (order.grams * price).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+                cash, gold = total, -order.grams
+            try:
+                ledger.move(order.wallet, cash, gold)
+            except InsufficientFunds:
+                LimitOrder.objects.filter(pk=order.pk).update(status="failed")
+                continue
+            accepted.append((order, price, total, cash, gold))
+
+        txs = Transaction.objects.bulk_create([
+            Transaction(
+                wallet=order.wallet,
+                transaction_type=order.side,
+                gold_amount=order.grams,
+                price_per_gram=price,
+                total_amount=total,
+                remarks=f"Limit order #{order.pk}",
+            )
+            for order, price, total, _, _ in accepted
+        ])
+        ledger.record_many([
+            (order.wallet, order.side, cash, gold, "house", tx)
+            for (order, _, _, cash, gold), tx in zip(accepted, txs)
+        ])
+        portfolio.record_trades(
+            [(order.wallet, order.side, order.grams, total) for order, _, total, _, _ in accepted]
+        )
+        for (order, *_), tx in zip(accepted, txs):
+            order.transaction, order.transaction_at = tx, tx.timestamp
+        LimitOrder.objects.bulk_update([order for order, *_ in accepted], ["transaction", "transaction_at"])
+    return len(accepted)
+
+
+# =========================
+# Settler thread
+# =========================
+def _fill(rate):
+    try:
+        filled = evaluate(rate)
+    except Exception:
+        logger.exception("Limit order evaluation failed for rate %s", rate.pk)
+        return
+    if filled:
+        logger.info("Filled %d limit orders at buy %s / sell %s", filled, rate.buy_rate, rate.sell_rate)
+
+
+class Settler:
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def put(self, rate):
+        self._idle.clear()
+        self._ensure_thread()
+        self._queue.put(rate)
+
+    def _ensure_thread(self):
+        # Started lazily so it lives in the worker process, as in intake.py
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="limit-orders", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            rate = self._queue.get()
+            close_old_connections()
+            try:
+                _fill(rate)
+            finally:
+                close_old_connections()
+            if self._queue.empty():
+                self._idle.set()
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Waits until every rate queued so far has been evaluated."""
+        deadline = time.monotonic() + timeout
+        while not self._idle.wait(0.05):
+            if time.monotonic() > deadline or self._thread is None or not self._thread.is_alive():
+                return False
+        return True
+
+
+settler = Settler()
+atexit.register(settler.flush)
+
+
+def on_new_rate(rate):
+    """on_commit hook: hands the rate to the settler, off the request path."""
+    settler.put(rate)
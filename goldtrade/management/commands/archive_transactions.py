@@ -0,0 +1,52 @@
+"""
+Moves settled transactions out of the live table into compressed
+monthly archive files (see goldtrade/archive.py).
+
+    python manage.py archive_transactions                  # older than 12 months
+    python manage.py archive_transactions --keep-months 24
+    python manage.py archive_transactions --dry-run
+
+Run it monthly from cron. Each month is moved in its own transaction, so
+an interrupted run loses nothing and the next one carries on. On a
+partitioned PostgreSQL table the months it empties are detached and
+dropped; elsewhere the freed space is reused by new rows.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from goldtrade import archive
+
+
+class Command(BaseCommand):
+    help = "Archive settled transactions older than --keep-months to gzip JSONL files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months", type=int, default=archive.KEEP_MONTHS,
+            help="months kept live, counting the current one",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="list the months, move nothing")
+
+    def handle(self, *args, **opts):
+        if opts["keep_months"] < 1:
+            raise CommandError("--keep-months must be at least 1.")
+        before = archive.cutoff(opts["keep_months"])
+        months = archive.archivable_months(before)
+        if not months:
+            self.stdout.write(f"Nothing settled before {before:%Y-%m}.")
+            return
+
+        moved = 0
+        for month in months:
+            if opts["dry_run"]:
+                self.stdout.write(f"{month:%Y-%m}: {archive.settled(month).count()} transactions")
+                continue
+            result = archive.archive_month(month)
+            if result is not None:
+                moved += result.rows
+                self.stdout.write(f"{month:%Y-%m}: {result.rows} transactions, {result.size} bytes -> {result.file.name}")
+        if opts["dry_run"]:
+            return
+
+        for name in archive.drop_empty_partitions(before):
+            self.stdout.write(f"dropped {name}")
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} transactions from before {before:%Y-%m}."))
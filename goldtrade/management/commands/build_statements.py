@@ -0,0 +1,98 @@
+"""
+Pre-generates a month's PDF statement for every real wallet.
+
+    python manage.py build_statements                  # last month
+    python manage.py build_statements --month 2026-09 --workers 8
+    python manage.py build_statements --user alice --force
+
+Wallets are split into shards and rendered in a process pool, so the
+month-end run never touches the web workers. Each PDF is written to
+MEDIA_ROOT/statements/<YYYY-MM>/<sha256>.pdf and recorded as a
+MonthlyStatement; downloading one is a plain file serve.
+
+Safe to re-run: a wallet is skipped when the fingerprint of its month
+(balances and transactions) matches the stored statement and the file
+is still there, so a stopped run resumes and a repeated run only
+rebuilds wallets that changed. --force rebuilds them all.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from goldtrade import statements
+from goldtrade.models import LedgerEntry, Wallet
+
+
+def _month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"--month must look like 2026-09, not {value!r}.")
+
+
+def _build_shard(wallet_ids, month, force):
+    # Runs in a worker process; Django opens a fresh connection on first use
+    return statements.build_monthly(wallet_ids, month, force)
+
+
+class Command(BaseCommand):
+    help = "Build and store monthly PDF statements in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", help="YYYY-MM (default: last month)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="worker processes")
+        parser.add_argument("--shard-size", type=int, default=200, help="wallets per task")
+        parser.add_argument("--user", help="only this username")
+        parser.add_argument("--force", action="store_true", help="rebuild even if nothing changed")
+
+    def handle(self, *args, **opts):
+        if opts["month"]:
+            month = _month(opts["month"])
+        else:
+            month = statements.month_range(timezone.localdate().replace(day=1) - timedelta(days=1))[0]
+        if month >= timezone.localdate().replace(day=1):
+            raise CommandError("Only finished months can be built.")
+
+        # Wallets with any ledger activity before the month ended
+        _start, end = statements.month_range(month)
+        until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        wallets = Wallet.objects.filter(is_demo=False).filter(
+            Exists(LedgerEntry.objects.filter(wallet=OuterRef("pk"), created_at__lt=until))
+        )
+        if opts["user"]:
+            wallets = wallets.filter(user__username=opts["user"])
+        wallet_ids = list(wallets.order_by("pk").values_list("pk", flat=True))
+        size = max(opts["shard_size"], 1)
+        shards = [wallet_ids[i:i + size] for i in range(0, len(wallet_ids), size)]
+        self.stdout.write(f"{month:%Y-%m}: {len(wallet_ids)} wallets in {len(shards)} shards")
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        built = skipped = 0
+        failed = []
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=max(opts["workers"], 1), mp_context=context) as pool:
+            futures = {pool.submit(_build_shard, shard, month, opts["force"]): shard for shard in shards}
+            for done, future in enumerate(as_completed(futures), 1):
+                shard = futures[future]
+                try:
+                    shard_built, shard_skipped = future.result()
+                except Exception as exc:
+                    failed.append(shard)
+                    self.stdout.write(self.style.ERROR(
+                        f"shard {shard[0]}–{shard[-1]} failed: {exc!r} (re-run to resume)"
+                    ))
+                    continue
+                built += shard_built
+                skipped += shard_skipped
+                self.stdout.write(f"[{done}/{len(shards)}] built {built}, unchanged {skipped}")
+
+        if failed:
+            raise CommandError(f"{len(failed)} of {len(shards)} shards failed; built {built}, unchanged {skipped}.")
+        self.stdout.write(self.style.SUCCESS(f"Built {built} statements, {skipped} unchanged."))
@@ -0,0 +1,52 @@
+"""
+Keeps the monthly partitions of goldtrade_transaction and
+goldtrade_goldrate (PostgreSQL; see goldtrade/partitions.py).
+
+    python manage.py ensure_partitions                     # next 3 months
+    python manage.py ensure_partitions --ahead 6
+    python manage.py ensure_partitions --detach-before 2025-01
+
+It runs on every deploy (build.sh) and daily as the `hifas-partitions`
+cron job (render.yaml): a row whose month has no partition cannot be
+inserted. --detach-before takes older months out of
+the tables without blocking them; the detached tables keep their
+<table>_pYYYYMM names until archived or dropped.
+
+On SQLite there is nothing to do and it exits successfully.
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from goldtrade import partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions and optionally detach old ones (PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=partitions.AHEAD, help="future months to keep ready")
+        parser.add_argument("--detach-before", help="YYYY-MM: detach every earlier month")
+
+    def handle(self, *args, **opts):
+        if not partitions.supported(connection):
+            self.stdout.write(f"{connection.vendor}: tables are not partitioned, nothing to do.")
+            return
+
+        detach_before = None
+        if opts["detach_before"]:
+            try:
+                detach_before = datetime.strptime(opts["detach_before"], "%Y-%m").date()
+            except ValueError:
+                raise CommandError(f"--detach-before must look like 2025-01, not {opts['detach_before']!r}.")
+
+        with connection.cursor() as cursor:
+            # Wait briefly for the parent's lock rather than queue behind a long query
+            cursor.execute("SET lock_timeout = '5s'")
+        for name in partitions.ensure(connection, max(opts["ahead"], 0)):
+            self.stdout.write(f"created {name}")
+        if detach_before:
+            for name in partitions.detach(connection, detach_before):
+                self.stdout.write(f"detached {name}")
+        self.stdout.write(self.style.SUCCESS("Partitions are up to date."))
@@ -0,0 +1,200 @@
+"""
+Bulk-import historical gold rates from CSV or XLSX.
+
+    python manage.py import_gold_rates rates.csv
+    python manage.py import_gold_rates rates.xlsx --timestamp-column date \\
+        --buy-column buy --sell-column sell --timezone Asia/Colombo
+
+The file is streamed in chunks; each chunk is validated and de-duplicated
+on its timestamp (within the file and against existing rows), then written
+with bulk_create in its own transaction. Source timestamps are kept; on
+PostgreSQL any month partition the chunk needs is created first
+(partitions.ensure_range).
+Candles for the imported span are rebuilt at the end, since bulk_create
+does not fire the GoldRate signals.
+"""
+import time
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_tx
+
+from goldtrade import partitions
+from goldtrade.candles import rebuild_candles
+from goldtrade.models import GoldRate
+from goldtrade.rates import current_rate
+
+# GoldRate rates are DecimalField(max_digits=10, decimal_places=2)
+MAX_RATE = 10 ** 8
+
+
+class Command(BaseCommand):
+    help = "Bulk-import historical gold rates (CSV/XLSX) keeping source timestamps."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file")
+        parser.add_argument("--format", choices=["csv", "xlsx"], help="defaults to the file extension")
+        parser.add_argument("--timestamp-column", default="last_updated")
+        parser.add_argument("--buy-column", default="buy_rate")
+        parser.add_argument("--sell-column", default="sell_rate")
+        parser.add_argument(
+            "--timezone",
+            default=settings.TIME_ZONE,
+            help="zone for timestamps without an offset (default: TIME_ZONE)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=50000, help="rows read per chunk")
+        parser.add_argument("--batch-size", type=int, default=5000, help="rows per INSERT")
+        parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+
+    def handle(self, *args, **opts):
+        path = Path(opts["path"])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+
+        fmt = opts["format"] or path.suffix.lower().lstrip(".")
+        if fmt not in {"csv", "xlsx"}:
+            raise CommandError("Use a .csv or .xlsx file, or pass --format.")
+
+        self.columns = {
+            opts["timestamp_column"]: "at",
+            opts["buy_column"]: "buy",
+            opts["sell_column"]: "sell",
+        }
+        self.zone = opts["timezone"]
+
+        chunks = self._csv_chunks(path, opts) if fmt == "csv" else self._xlsx_chunks(path, opts)
+
+        seen = set()      # timestamps (ns) already taken by this import
+        read = written = rejected = duplicates = 0
+        first = last = None
+        started = time.perf_counter()
+
+        for frame in chunks:
+            read += len(frame)
+            frame, bad = self._validate(frame)
+            rejected += bad
+
+            # dedupe: inside the chunk, against earlier chunks, against the DB
+            before = len(frame)
+            frame = frame.drop_duplicates("at", keep="last")
+            keys = frame["at"].astype("int64")
+            frame = frame[~keys.isin(seen)]
+            if not frame.empty:
+                existing = set(
+                    GoldRate.objects.filter(
+                        last_updated__gte=frame["at"].min().to_pydatetime(),
+                        last_updated__lte=frame["at"].max().to_pydatetime(),
+                    ).values_list("last_updated", flat=True)
+                )
+                if existing:
+                    frame = frame[~frame["at"].isin(pd.to_datetime(list(existing), utc=True))]
+            duplicates += before - len(frame)
+            if frame.empty:
+                continue
+
+            seen.update(frame["at"].astype("int64").tolist())
+            lo, hi = frame["at"].min().to_pydatetime(), frame["at"].max().to_pydatetime()
+            first = lo if first is None else min(first, lo)
+            last = hi if last is None else max(last, hi)
+
+            if not opts["dry_run"]:
+                rows = [
+                    GoldRate(last_updated=at.to_pydatetime(), buy_rate=Decimal(buy), sell_rate=Decimal(sell))
+                    for at, buy, sell in zip(
+                        frame["at"], frame["buy"].map("{:.2f}".format), frame["sell"].map("{:.2f}".format)
+                    )
+                ]
+                # History can predate the oldest month partition (PostgreSQL)
+                for name in partitions.ensure_range(connection, lo, hi, tables=["goldtrade_goldrate"]):
+                    self.stdout.write(f"  created {name}")
+                with db_tx.atomic():
+                    GoldRate.objects.bulk_create(rows, batch_size=opts["batch_size"])
+            written += len(frame)
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {read:,} read, {written:,} imported ({written / elapsed:,.0f} rows/s)")
+
+        elapsed = time.perf_counter() - started
+
+        if written and not opts["dry_run"]:
+            candles = rebuild_candles(first, last)
+            current_rate.invalidate()
+            self.stdout.write(f"Rebuilt {candles:,} candles for {first:%Y-%m-%d} – {last:%Y-%m-%d}.")
+
+        verb = "Validated" if opts["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {written:,} of {read:,} rows in {elapsed:.1f}s "
+            f"({written / max(elapsed, 1e-9):,.0f} rows/s); "
+            f"{rejected:,} invalid, {duplicates:,} duplicate timestamps skipped."
+        ))
+
+    # -------------------------
+    # Readers (yield DataFrames)
+    # -------------------------
+    def _csv_chunks(self, path, opts):
+        try:
+            reader = pd.read_csv(
+                path,
+                usecols=list(self.columns),
+                dtype=str,
+                chunksize=opts["chunk_size"],
+            )
+            for frame in reader:
+                yield frame.rename(columns=self.columns)
+        except ValueError as exc:
+            raise CommandError(f"Cannot read {path.name}: {exc}")
+
+    def _xlsx_chunks(self, path, opts):
+        from openpyxl import load_workbook
+
+        book = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = book.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+            missing = [c for c in self.columns if c not in header]
+            if missing:
+                raise CommandError(f"Missing column(s) in {path.name}: {', '.join(missing)}")
+            index = [header.index(c) for c in self.columns]
+            names = list(self.columns.values())
+
+            while True:
+                block = list(islice(rows, opts["chunk_size"]))
+                if not block:
+                    break
+                yield pd.DataFrame([[row[i] for i in index] for row in block], columns=names)
+        finally:
+            book.close()
+
+    # -------------------------
+    # Validation
+    # -------------------------
+    def _validate(self, frame):
+        """
+        Parses timestamps (naive ones in --timezone) to UTC and rates to
+        floats; drops unparseable, non-positive or missing values.
+        Returns (clean frame, number of rejected rows).
+        """
+        at = pd.to_datetime(frame["at"], errors="coerce", format="mixed")
+        if at.dtype == object:
+            # mixed UTC offsets in one column: normalise through UTC
+            at = pd.to_datetime(frame["at"], errors="coerce", format="mixed", utc=True)
+        elif at.dt.tz is None:
+            at = at.dt.tz_localize(self.zone, ambiguous="NaT", nonexistent="NaT")
+        frame = frame.assign(
+            at=at.dt.tz_convert("UTC"),
+            # Rounded to cents before the range check, so the value checked is
+            # the one stored (99999999.999 would otherwise become 100000000.00)
+            buy=pd.to_numeric(frame["buy"], errors="coerce").round(2),
+            sell=pd.to_numeric(frame["sell"], errors="coerce").round(2),
+        )
+        ok = (
+            frame["at"].notna()
+            & frame["buy"].between(0, MAX_RATE, inclusive="neither")
+            & frame["sell"].between(0, MAX_RATE, inclusive="neither")
+        )
+        return frame[ok], int((~ok).sum())
@@ -0,0 +1,78 @@
+"""
+Strips metadata from the uploaded images the pipeline has not processed
+yet and writes their display copies and thumbnails (see
+goldtrade/images.py): uploads from before it, ones from before display
+copies existed, or ones lost when a worker restarted before its pool got
+to them.
+
+    python manage.py process_images
+    python manage.py process_images --dry-run
+
+Runs in this process, one image at a time; safe to rerun. It reports the
+size change honestly: a re-saved original can be larger than the upload,
+and the display copy and thumbnail come on top. It then prints what each
+part of MEDIA_ROOT takes, since uploads share the disk with transaction
+archives and statement PDFs (see goldtrade/images.py).
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from goldtrade import images
+
+# MEDIA_ROOT folders that are not uploads: archive.py, statements.py
+OTHER_PARTS = {"archive": "transaction archives", "statements": "statement PDFs"}
+
+
+def _megabytes(path):
+    total = 0
+    for directory, _dirs, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return total / 2**20
+
+
+class Command(BaseCommand):
+    help = "Clean unprocessed slips, KYC documents and profile pictures; write display copies and thumbnails."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only count the images to process.")
+
+    def handle(self, *args, **opts):
+        done = skipped = uploads = originals = derived = 0
+        for model in images.IMAGES:
+            for instance in model.objects.iterator(chunk_size=500):
+                for field in images.stale(instance):
+                    if opts["dry_run"]:
+                        done += 1
+                        continue
+                    result = images.process_field(instance, field)
+                    if result is None:
+                        skipped += 1
+                        continue
+                    done += 1
+                    uploads += result[0]
+                    originals += result[1]
+                    derived += result[2]
+        if opts["dry_run"]:
+            self.stdout.write(f"{done} image(s) to process.")
+        else:
+            growth = (originals + derived - uploads) / 2**20
+            self.stdout.write(self.style.SUCCESS(
+                f"Processed {done} image(s), {skipped} left as uploaded: "
+                f"originals {uploads / 2**20:.1f} MB -> {originals / 2**20:.1f} MB, "
+                f"plus {derived / 2**20:.1f} MB of display copies and thumbnails "
+                f"({growth:+.1f} MB on disk)."
+            ))
+        self._report_disk()
+
+    def _report_disk(self):
+        root = settings.MEDIA_ROOT
+        if not os.path.isdir(root):
+            return
+        parts = {label: _megabytes(os.path.join(root, folder)) for folder, label in OTHER_PARTS.items()}
+        total = _megabytes(root)
+        listing = ", ".join(f"{label} {size:.1f} MB" for label, size in parts.items())
+        self.stdout.write(
+            f"MEDIA_ROOT holds {total:.1f} MB: images {total - sum(parts.values()):.1f} MB, {listing}."
+        )
@@ -0,0 +1,59 @@
+"""
+Recomputes the staff reporting rollup (DailyStats) from the ledger.
+
+    python manage.py rebuild_daily_stats
+    python manage.py rebuild_daily_stats --since 2026-09-01
+    python manage.py rebuild_daily_stats --verify
+
+--verify only compares the stored days with the recomputed ones and
+exits non-zero when any day disagrees, so it can run from cron/CI.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from goldtrade import rollups
+from goldtrade.models import DailyStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or --verify) the daily staff statistics from the ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="first day to rebuild, YYYY-MM-DD (default: all)")
+        parser.add_argument("--verify", action="store_true", help="compare only, write nothing")
+
+    def handle(self, *args, **opts):
+        since = None
+        if opts["since"]:
+            since = parse_date(opts["since"])
+            if since is None:
+                raise CommandError(f"--since must look like 2026-09-01, not {opts['since']!r}.")
+
+        if not opts["verify"]:
+            written = rollups.rebuild(since)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} days."))
+            return
+
+        expected = rollups.recompute(since)
+        stored = DailyStats.objects.all()
+        if since is not None:
+            stored = stored.filter(day__gte=since)
+        stored = {row.day: row for row in stored}
+
+        mismatches = 0
+        for day in sorted(set(stored) | set(expected)):
+            row = stored.get(day) or DailyStats(day=day)
+            values = expected.get(day, {})
+            wrong = [
+                f"{field} {getattr(row, field)} != {values.get(field, 0)}"
+                for field in rollups.STAT_FIELDS
+                if getattr(row, field) != values.get(field, 0)
+            ]
+            if wrong:
+                mismatches += 1
+                self.stdout.write(self.style.ERROR(f"{day}: {', '.join(wrong)}"))
+
+        checked = len(set(stored) | set(expected))
+        if mismatches:
+            raise CommandError(f"{mismatches} of {checked} days disagree with the ledger.")
+        self.stdout.write(self.style.SUCCESS(f"All {checked} days match the ledger."))
@@ -0,0 +1,74 @@
+"""
+Recomputes every wallet's average-cost position from its BUY/SELL history.
+
+    python manage.py rebuild_positions
+    python manage.py rebuild_positions --verify
+    python manage.py rebuild_positions --user alice
+
+--verify only compares the stored positions with the replay and exits
+non-zero when any wallet disagrees, so it can run from cron/CI.
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_tx
+
+from goldtrade import portfolio
+from goldtrade.models import Position, Wallet
+
+GRAMS_TOLERANCE = Decimal("0.0001")
+# The incremental path rounds each sell's released cost to 4 places
+CASH_TOLERANCE = Decimal("0.01")
+PER_TRADE_TOLERANCE = Decimal("0.00005")
+
+NO_TRADES = {"grams": Decimal("0"), "cost_basis": Decimal("0"), "realized_pnl": Decimal("0"), "trades": 0}
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or --verify) wallet positions from the trade history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="only this username")
+        parser.add_argument("--verify", action="store_true", help="compare only, write nothing")
+
+    def handle(self, *args, **opts):
+        wallet_ids = None
+        if opts["user"]:
+            wallet_ids = list(
+                Wallet.objects.filter(user__username=opts["user"]).values_list("id", flat=True)
+            )
+
+        if not opts["verify"]:
+            with db_tx.atomic():
+                written = portfolio.rebuild(wallet_ids)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} positions."))
+            return
+
+        replayed = portfolio.replay(wallet_ids)
+        stored = Position.objects.select_related("wallet__user")
+        if wallet_ids is not None:
+            stored = stored.filter(wallet_id__in=wallet_ids)
+        stored = {position.wallet_id: position for position in stored}
+
+        mismatches = 0
+        for wallet_id in set(stored) | set(replayed):
+            expected = replayed.get(wallet_id, NO_TRADES)
+            position = stored.get(wallet_id) or Position(wallet_id=wallet_id)
+            tolerance = CASH_TOLERANCE + PER_TRADE_TOLERANCE * expected["trades"]
+            if (
+                position.trades != expected["trades"]
+                or abs(position.grams - expected["grams"]) > GRAMS_TOLERANCE
+                or abs(position.cost_basis - expected["cost_basis"]) > tolerance
+                or abs(position.realized_pnl - expected["realized_pnl"]) > tolerance
+            ):
+                mismatches += 1
+                self.stdout.write(self.style.ERROR(
+                    f"{position.wallet}: stored grams={position.grams} cost={position.cost_basis} "
+                    f"realized={position.realized_pnl} | replay grams={expected['grams']} "
+                    f"cost={expected['cost_basis']} realized={expected['realized_pnl']}"
+                ))
+
+        checked = len(set(stored) | set(replayed))
+        if mismatches:
+            raise CommandError(f"{mismatches} of {checked} positions disagree with the trade history.")
+        self.stdout.write(self.style.SUCCESS(f"All {checked} positions match the trade history."))
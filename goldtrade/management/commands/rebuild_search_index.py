@@ -0,0 +1,30 @@
+"""
+Rewrites the staff search documents (SearchDocument, see
+goldtrade/search.py) from the deposits, withdrawals and KYC submissions.
+
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --user alice
+
+The signals keep the documents current; run this after bulk imports or
+any change made without model saves.
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from goldtrade import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the staff search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="only this username")
+
+    def handle(self, *args, **opts):
+        user_ids = None
+        if opts["user"]:
+            user_ids = list(User.objects.filter(username=opts["user"]).values_list("id", flat=True))
+            if not user_ids:
+                raise CommandError(f"No user {opts['user']!r}.")
+        written = search.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} documents."))
@@ -0,0 +1,23 @@
+"""
+Recounts the staff review queues and corrects their counters
+(QueueCounter, see goldtrade/pending.py).
+
+    python manage.py reconcile_pending_counts
+
+The `hifas-queue-counts` cron job (render.yaml) runs it every 10
+minutes; it prints each counter it had to correct. A correction means some path changed a status without going
+through a model save or pending.adjust().
+"""
+from django.core.management.base import BaseCommand
+
+from goldtrade import pending
+
+
+class Command(BaseCommand):
+    help = "Recount pending deposits, withdrawals and KYC submissions and fix the queue counters."
+
+    def handle(self, *args, **opts):
+        corrected = pending.reconcile()
+        for queue, (stored, actual) in sorted(corrected.items()):
+            self.stdout.write(self.style.WARNING(f"{queue}: counter was {stored}, {actual} pending"))
+        self.stdout.write(self.style.SUCCESS(f"Queue counters reconciled ({len(corrected)} corrected)."))
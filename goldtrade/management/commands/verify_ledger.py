@@ -0,0 +1,37 @@
+"""
+Checks every wallet's materialized balance against the ledger.
+
+    python manage.py verify_ledger
+    python manage.py verify_ledger --user alice
+
+Exits non-zero when any wallet disagrees, so it can run from cron/CI.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from goldtrade import ledger
+from goldtrade.models import Wallet
+
+
+class Command(BaseCommand):
+    help = "Verify Wallet balances against ledger checkpoints + entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="only this username")
+
+    def handle(self, *args, **opts):
+        wallets = Wallet.objects.select_related("user").order_by("id")
+        if opts["user"]:
+            wallets = wallets.filter(user__username=opts["user"])
+
+        checked = wallets.count()
+        mismatches = 0
+        for wallet, expected in ledger.verify(wallets):
+            mismatches += 1
+            self.stdout.write(self.style.ERROR(
+                f"{wallet}: wallet cash={wallet.cash_balance} gold={wallet.gold_balance} | "
+                f"ledger cash={expected['cash']} gold={expected['gold']}"
+            ))
+
+        if mismatches:
+            raise CommandError(f"{mismatches} of {checked} wallets disagree with the ledger.")
+        self.stdout.write(self.style.SUCCESS(f"All {checked} wallets match the ledger."))
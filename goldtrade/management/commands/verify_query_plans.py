@@ -0,0 +1,228 @@
+"""
+EXPLAINs every hot query and fails if any of them reads a whole table.
+
+    python manage.py verify_query_plans
+    python manage.py verify_query_plans --rows 500000 --verbose
+    python manage.py verify_query_plans --existing
+
+By default it seeds a large synthetic dataset (users, wallets,
+transactions, deposits, KYC, rates, limit orders, ledger legs), runs
+ANALYZE so the planner sees realistic statistics, EXPLAINs each query and
+then rolls everything back. --existing skips the seeding and checks the
+plans against the data already in the database.
+
+Works on SQLite ("SCAN <table>" without an index) and PostgreSQL ("Seq
+Scan on <table>"). Exits non-zero on any full scan, so it can run in CI
+after migrations.
+"""
+import random
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_tx
+from django.utils import timezone
+
+from goldtrade.models import KYC, BankDeposit, GoldRate, LedgerEntry, LimitOrder, Position, Transaction, Wallet
+from users.models import EmailVerification
+
+
+class _Rollback(Exception):
+    pass
+
+
+SMALL_PARTITION = 1000  # rows; the planner rightly reads these in full
+
+
+def _full_scans(plan):
+    """Tables the plan reads in full, for the current database."""
+    scans = []
+    for line in plan.splitlines():
+        if connection.vendor == "sqlite":
+            # "SCAN t" reads the table; "SCAN t USING [COVERING] INDEX i" walks an index
+            if " SCAN " in f" {line} " and "INDEX" not in line:
+                scans.append(line.split("SCAN", 1)[1].split()[0])
+        elif "Seq Scan on" in line:
+            scans.append(line.split("Seq Scan on", 1)[1].split()[0])
+    if scans and connection.vendor == "postgresql":
+        # Monthly partitions (partitions.py) that are empty or nearly so
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname FROM pg_class WHERE relname = ANY(%s) AND relispartition AND reltuples < %s",
+                [scans, SMALL_PARTITION],
+            )
+            small = {name for (name,) in cursor.fetchall()}
+        scans = [name for name in scans if name not in small]
+    return scans
+
+
+def hot_queries(user, wallet, token):
+    """(name, queryset) for each query on a request or polling path."""
+    page = 26  # pagination.PAGE_SIZE + 1
+    return [
+        ("current rate", GoldRate.objects.order_by("-last_updated")[:1]),
+        ("account state", Wallet.objects.filter(user=user).select_related("position", "user__kyc")),
+        ("dashboard recent activity", Transaction.objects.filter(wallet=wallet).order_by("-timestamp")[:5]),
+        ("transaction history page",
+         Transaction.objects.filter(wallet=wallet).order_by("-timestamp", "-pk")[:page]),
+        ("transaction history by type",
+         Transaction.objects.filter(wallet=wallet, transaction_type="BUY").order_by("-timestamp", "-pk")[:page]),
+        ("pending withdrawal count", Transaction.objects.filter(transaction_type="WITHDRAW", status="pending")),
+        ("wallet pending withdrawal",
+         Transaction.objects.filter(wallet=wallet, transaction_type="WITHDRAW", status="pending")[:1]),
+        ("my withdrawals",
+         Transaction.objects.filter(wallet=wallet, transaction_type="WITHDRAW").order_by("-timestamp", "-pk")[:page]),
+        ("staff withdrawals",
+         Transaction.objects.filter(transaction_type="WITHDRAW").order_by("-timestamp", "-pk")[:page]),
+        ("staff withdrawals by status",
+         Transaction.objects.filter(transaction_type="WITHDRAW", status="pending")
+         .order_by("-timestamp", "-pk")[:page]),
+        ("pending deposit count", BankDeposit.objects.filter(status="pending")),
+        ("my deposits", BankDeposit.objects.filter(user=user).order_by("-created_at", "-pk")[:page]),
+        ("staff deposits", BankDeposit.objects.order_by("-created_at", "-pk")[:page]),
+        ("staff deposits by status",
+         BankDeposit.objects.filter(status="pending").order_by("-created_at", "-pk")[:page]),
+        ("KYC review queue", KYC.objects.filter(status="pending").order_by("-submitted_at")[:50]),
+        ("email verification", EmailVerification.objects.filter(token=token)),
+        ("crossing buy limit orders",
+         LimitOrder.objects.filter(status="open", side="BUY", limit_price__gte=Decimal("20000"))
+         .values_list("id", "limit_price")),
+        ("open limit orders sync",
+         LimitOrder.objects.filter(status="open", created_at__gte=timezone.now() - timedelta(minutes=1))),
+        ("my limit orders", LimitOrder.objects.filter(wallet=wallet).order_by("-created_at")[:50]),
+        ("latest ledger entry", LedgerEntry.objects.filter(wallet=wallet).order_by("-id")[:1]),
+    ]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot queries on a seeded dataset and fail on full table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000, help="transactions to seed")
+        parser.add_argument("--existing", action="store_true", help="use the current data, seed nothing")
+        parser.add_argument("--verbose", action="store_true", help="print every plan")
+
+    def handle(self, *args, **opts):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            raise CommandError(f"Plan checks support SQLite and PostgreSQL, not {connection.vendor}.")
+
+        failures = []
+        try:
+            with db_tx.atomic():
+                if opts["existing"]:
+                    sample = self._sample()
+                else:
+                    sample = self._seed(opts["rows"])
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+                failures = self._check(sample, opts["verbose"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries use a full table scan: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
+
+    def _check(self, sample, verbose):
+        failures = []
+        for name, queryset in hot_queries(*sample):
+            plan = queryset.explain()
+            scans = _full_scans(plan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: full scan of {', '.join(scans)}"))
+            else:
+                self.stdout.write(f"{name}: ok")
+            if verbose or scans:
+                self.stdout.write(f"    {plan.replace(chr(10), chr(10) + '    ')}")
+        return failures
+
+    def _sample(self):
+        wallet = Wallet.objects.select_related("user").order_by("-pk").first()
+        if wallet is None:
+            raise CommandError("No wallets to sample; run without --existing to seed data.")
+        return wallet.user, wallet, uuid.uuid4().hex
+
+    # -------------------------
+    # Synthetic dataset
+    # -------------------------
+    def _seed(self, rows):
+        rng = random.Random(15)
+        now = timezone.now()
+        batch = 5000
+        self.stdout.write(f"Seeding {rows} transactions…")
+
+        run = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create(
+            [User(username=f"plan-{run}-{i}") for i in range(max(rows // 50, 10))], batch_size=batch
+        )
+        wallets = Wallet.objects.bulk_create(
+            [Wallet(user=user, is_demo=is_demo) for user in users for is_demo in (False, True)],
+            batch_size=batch,
+        )
+        Position.objects.bulk_create(
+            [Position(wallet=wallet, grams=1, cost_basis=20000) for wallet in wallets[::2]], batch_size=batch
+        )
+        KYC.objects.bulk_create(
+            [
+                KYC(user=user, full_name="Plan", dob="1990-01-01", nic_number="1", address="-", phone="0",
+                    status="pending" if rng.random() < 0.05 else "approved")
+                for user in users
+            ],
+            batch_size=batch,
+        )
+        EmailVerification.objects.bulk_create(
+            [EmailVerification(user=user, token=uuid.uuid4().hex) for user in users], batch_size=batch
+        )
+        GoldRate.objects.bulk_create(
+            [
+                GoldRate(buy_rate=20000, sell_rate=21000, last_updated=now - timedelta(minutes=i))
+                for i in range(max(rows // 10, 10))
+            ],
+            batch_size=batch,
+        )
+        BankDeposit.objects.bulk_create(
+            [
+                BankDeposit(user=rng.choice(users), amount=1000, reference_no=f"P{i}", slip="plan.png",
+                            status="pending" if rng.random() < 0.02 else "approved")
+                for i in range(max(rows // 10, 10))
+            ],
+            batch_size=batch,
+        )
+
+        # At most one pending withdrawal per wallet (uniq_pending_withdrawal)
+        pending = set(rng.sample(range(len(wallets)), max(len(wallets) // 100, 1)))
+        kinds = ["BUY"] * 45 + ["SELL"] * 45 + ["DEPOSIT"] * 5 + ["WITHDRAW"] * 5
+        txs = [
+            Transaction(wallet=wallets[rng.randrange(len(wallets))], transaction_type=rng.choice(kinds),
+                        total_amount=1000, status="approved")
+            for _ in range(rows)
+        ]
+        txs += [
+            Transaction(wallet=wallets[i], transaction_type="WITHDRAW", total_amount=1000, status="pending")
+            for i in pending
+        ]
+        Transaction.objects.bulk_create(txs, batch_size=batch)
+
+        LimitOrder.objects.bulk_create(
+            [
+                LimitOrder(wallet=rng.choice(wallets), side=rng.choice(["BUY", "SELL"]), grams=1,
+                           limit_price=rng.randint(15000, 25000),
+                           status="open" if rng.random() < 0.1 else "filled")
+                for _ in range(max(rows // 20, 10))
+            ],
+            batch_size=batch,
+        )
+        LedgerEntry.objects.bulk_create(
+            [
+                LedgerEntry(journal=uuid.uuid4(), wallet=rng.choice(wallets), asset="CASH", amount=1,
+                            kind="BUY")
+                for _ in range(rows)
+            ],
+            batch_size=batch,
+        )
+        return users[-1], wallets[-2], uuid.uuid4().hex
@@ -6,10 +6,16 @@ class Migration(migrations.Migration):
         ('goldtrade', '0011_auto_20251121_1359'),
     ]
 
+    # 0010 already creates the column, so on a fresh database adding it
+    # again fails; databases migrated past here have it either way.
     operations = [
-        migrations.AddField(
-            model_name='kyc',
-            name='rejection_reason',
-            field=models.TextField(blank=True, null=True),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='kyc',
+                    name='rejection_reason',
+                    field=models.TextField(blank=True, null=True),
+                ),
+            ],
         ),
     ]
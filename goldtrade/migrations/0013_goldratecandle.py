@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:30
+
+from django.db import migrations, models
+
+
+def backfill_candles(apps, schema_editor):
+    from goldtrade.candles import rebuild_candles
+
+    rebuild_candles(
+        rate_model=apps.get_model("goldtrade", "GoldRate"),
+        candle_model=apps.get_model("goldtrade", "GoldRateCandle"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0012_add_rejection_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoldRateCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('buy_open', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('buy_high', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('buy_low', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('buy_close', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('sell_open', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('sell_high', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('sell_low', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('sell_close', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('opened_at', models.DateTimeField()),
+                ('closed_at', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'bucket_start'), name='uniq_candle_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_candles, migrations.RunPython.noop),
+    ]
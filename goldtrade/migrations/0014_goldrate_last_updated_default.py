@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0013_goldratecandle'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='goldrate',
+            name='last_updated',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
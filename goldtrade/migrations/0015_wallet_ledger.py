@@ -0,0 +1,82 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def book_opening_balances(apps, schema_editor):
+    """One OPENING posting + checkpoint per wallet for today's balances."""
+    import uuid
+
+    from django.utils import timezone
+
+    Wallet = apps.get_model("goldtrade", "Wallet")
+    LedgerEntry = apps.get_model("goldtrade", "LedgerEntry")
+    LedgerCheckpoint = apps.get_model("goldtrade", "LedgerCheckpoint")
+
+    now = timezone.now()
+    for wallet in Wallet.objects.iterator():
+        journal = uuid.uuid4()
+        last = None
+        for asset, amount in (("CASH", wallet.cash_balance), ("GOLD", wallet.gold_balance)):
+            if not amount:
+                continue
+            common = {"journal": journal, "asset": asset, "kind": "OPENING", "created_at": now}
+            last = LedgerEntry.objects.create(wallet=wallet, account="wallet", amount=amount, **common)
+            LedgerEntry.objects.create(wallet=None, account="opening", amount=-amount, **common)
+        if last:
+            LedgerCheckpoint.objects.create(
+                wallet=wallet,
+                entry_id=last.id,
+                cash_balance=wallet.cash_balance,
+                gold_balance=wallet.gold_balance,
+                created_at=now,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0014_goldrate_last_updated_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='entries_since_checkpoint',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.BigIntegerField()),
+                ('cash_balance', models.DecimalField(decimal_places=4, max_digits=16)),
+                ('gold_balance', models.DecimalField(decimal_places=4, max_digits=16)),
+                ('created_at', models.DateTimeField()),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to='goldtrade.wallet')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'entry_id'), name='uniq_checkpoint_entry')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journal', models.UUIDField(db_index=True)),
+                ('account', models.CharField(default='wallet', max_length=20)),
+                ('asset', models.CharField(choices=[('CASH', 'Cash (LKR)'), ('GOLD', 'Gold (g)')], max_length=4)),
+                ('amount', models.DecimalField(decimal_places=4, max_digits=16)),
+                ('kind', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='goldtrade.transaction')),
+                ('wallet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='goldtrade.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', 'id'], name='ledger_wallet_id_idx')],
+            },
+        ),
+        migrations.RunPython(book_opening_balances, migrations.RunPython.noop),
+    ]
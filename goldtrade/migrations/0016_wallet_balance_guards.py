@@ -0,0 +1,84 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+SUPERSEDED = "Rejected automatically: a newer withdrawal request for this wallet is pending."
+
+
+def reject_duplicate_pending_withdrawals(apps, schema_editor):
+    # The old exists() guard did not hold on SQLite, so a wallet may have
+    # several pending requests and the partial unique index cannot be
+    # built. Keep the newest one per wallet; the older ones never moved
+    # money (a withdrawal is only debited on approval), so rejecting them
+    # is safe and the customer can ask again.
+    Transaction = apps.get_model("goldtrade", "Transaction")
+    pending = Transaction.objects.filter(transaction_type="WITHDRAW", status="pending")
+    by_wallet = {}
+    for wallet_id, tx_id in pending.order_by("wallet_id", "id").values_list("wallet_id", "id"):
+        by_wallet.setdefault(wallet_id, []).append(tx_id)
+    for wallet_id, ids in sorted(by_wallet.items()):
+        if len(ids) < 2:
+            continue
+        pending.filter(id__in=ids[:-1]).update(status="rejected", remarks=SUPERSEDED)
+        print(f"\n  wallet {wallet_id}: kept pending withdrawal {ids[-1]}, rejected {ids[:-1]}")
+
+
+def zero_negative_balances(apps, schema_editor):
+    # A balance can only have gone negative through the old unguarded
+    # read-modify-write. The CHECK constraints below would fail on such a
+    # row, so book the difference against the house account as an ADJUST
+    # posting (wallet leg + house leg, like ledger.record writes) and report
+    # it for staff to follow up.
+    import uuid
+
+    from django.db.models import F, Q
+    from django.utils import timezone
+
+    Wallet = apps.get_model("goldtrade", "Wallet")
+    LedgerEntry = apps.get_model("goldtrade", "LedgerEntry")
+
+    now = timezone.now()
+    for wallet in Wallet.objects.filter(Q(cash_balance__lt=0) | Q(gold_balance__lt=0)).order_by("id"):
+        journal = uuid.uuid4()
+        fixed = []
+        for asset, field in (("CASH", "cash_balance"), ("GOLD", "gold_balance")):
+            balance = getattr(wallet, field)
+            if balance >= 0:
+                continue
+            common = {"journal": journal, "asset": asset, "kind": "ADJUST", "created_at": now}
+            LedgerEntry.objects.create(wallet=wallet, account="wallet", amount=-balance, **common)
+            LedgerEntry.objects.create(wallet=None, account="house", amount=balance, **common)
+            fixed.append(f"{field} {balance} -> 0")
+        Wallet.objects.filter(pk=wallet.pk).update(
+            cash_balance=F("cash_balance") if wallet.cash_balance >= 0 else 0,
+            gold_balance=F("gold_balance") if wallet.gold_balance >= 0 else 0,
+            entries_since_checkpoint=F("entries_since_checkpoint") + 1,
+        )
+        print(f"\n  wallet {wallet.pk} (user {wallet.user_id}): {', '.join(fixed)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0015_wallet_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(reject_duplicate_pending_withdrawals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending'), ('transaction_type', 'WITHDRAW')), fields=('wallet',), name='uniq_pending_withdrawal'),
+        ),
+        migrations.RunPython(zero_negative_balances, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wallet',
+            constraint=models.CheckConstraint(condition=models.Q(('cash_balance__gte', 0)), name='wallet_cash_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='wallet',
+            constraint=models.CheckConstraint(condition=models.Q(('gold_balance__gte', 0)), name='wallet_gold_non_negative'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_positions(apps, schema_editor):
+    from goldtrade.portfolio import rebuild
+
+    rebuild(
+        transaction_model=apps.get_model("goldtrade", "Transaction"),
+        position_model=apps.get_model("goldtrade", "Position"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0018_transaction_wallet_recent_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grams', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('cost_basis', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('realized_pnl', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('trades', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('wallet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='position', to='goldtrade.wallet')),
+            ],
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+    ]
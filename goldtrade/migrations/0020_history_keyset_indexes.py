@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0019_position'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankdeposit',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='deposit_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bankdeposit',
+            index=models.Index(fields=['-created_at', '-id'], name='deposit_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bankdeposit',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='deposit_status_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'transaction_type', '-timestamp', '-id'], name='tx_wallet_type_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('transaction_type', 'WITHDRAW')), fields=['-timestamp', '-id'], name='tx_withdraw_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('transaction_type', 'WITHDRAW')), fields=['status', '-timestamp', '-id'], name='tx_withdraw_status_idx'),
+        ),
+    ]
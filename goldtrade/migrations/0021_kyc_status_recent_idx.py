@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0020_history_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kyc',
+            index=models.Index(fields=['status', '-submitted_at'], name='kyc_status_recent_idx'),
+        ),
+    ]
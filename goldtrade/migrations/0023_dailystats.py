@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_daily_stats(apps, schema_editor):
+    from goldtrade.rollups import rebuild
+
+    rebuild(
+        entry_model=apps.get_model("goldtrade", "LedgerEntry"),
+        user_model=apps.get_model(settings.AUTH_USER_MODEL),
+        stats_model=apps.get_model("goldtrade", "DailyStats"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0022_monthlystatement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('buys', models.PositiveIntegerField(default=0)),
+                ('buy_grams', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('buy_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('sells', models.PositiveIntegerField(default=0)),
+                ('sell_grams', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('sell_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('deposits', models.PositiveIntegerField(default=0)),
+                ('deposit_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('withdrawals', models.PositiveIntegerField(default=0)),
+                ('withdrawal_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('new_users', models.PositiveIntegerField(default=0)),
+                ('cash_change', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('gold_change', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name_plural': 'daily stats',
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Monthly range partitions for goldtrade_transaction and goldtrade_goldrate
+# on PostgreSQL; see goldtrade/partitions.py. SQLite is left unchanged.
+#
+# The rows are copied with one INSERT ... SELECT while the tables are
+# locked, so on a large database run this migration in a maintenance window.
+
+from django.db import migrations
+
+
+def partition_tables(apps, schema_editor):
+    from goldtrade import partitions
+
+    connection = schema_editor.connection
+    if not partitions.supported(connection):
+        return
+    partitions.convert(connection, "goldtrade_transaction", replaced={"uniq_pending_withdrawal"})
+    partitions.install_pending_withdrawal_guard(connection)
+    partitions.convert(connection, "goldtrade_goldrate")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0023_dailystats'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables),
+    ]
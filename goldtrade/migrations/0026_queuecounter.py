@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+def count_pending(apps, schema_editor):
+    from goldtrade.pending import reconcile
+
+    reconcile(
+        deposit_model=apps.get_model("goldtrade", "BankDeposit"),
+        transaction_model=apps.get_model("goldtrade", "Transaction"),
+        kyc_model=apps.get_model("goldtrade", "KYC"),
+        counter_model=apps.get_model("goldtrade", "QueueCounter"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0025_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(count_pending, migrations.RunPython.noop),
+    ]
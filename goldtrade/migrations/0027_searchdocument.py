@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+def install_text_index(apps, schema_editor):
+    from goldtrade.search import install
+
+    install(schema_editor)
+
+
+def uninstall_text_index(apps, schema_editor):
+    from goldtrade.search import uninstall
+
+    uninstall(schema_editor)
+
+
+def backfill_search(apps, schema_editor):
+    from goldtrade.search import rebuild
+
+    rebuild(
+        deposit_model=apps.get_model("goldtrade", "BankDeposit"),
+        transaction_model=apps.get_model("goldtrade", "Transaction"),
+        kyc_model=apps.get_model("goldtrade", "KYC"),
+        document_model=apps.get_model("goldtrade", "SearchDocument"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0026_queuecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('kyc', 'KYC')], max_length=12)),
+                ('object_id', models.BigIntegerField()),
+                ('user_id', models.IntegerField(db_index=True)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='uniq_search_document')],
+            },
+        ),
+        migrations.RunPython(install_text_index, uninstall_text_index),
+        migrations.RunPython(backfill_search, migrations.RunPython.noop),
+    ]
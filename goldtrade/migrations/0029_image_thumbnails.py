@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0028_review_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankdeposit',
+            name='slip_thumb',
+            field=models.ImageField(blank=True, editable=False, upload_to='bank_slips/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='kyc',
+            name='nic_back_thumb',
+            field=models.ImageField(blank=True, editable=False, upload_to='kyc/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='kyc',
+            name='nic_front_thumb',
+            field=models.ImageField(blank=True, editable=False, upload_to='kyc/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='kyc',
+            name='selfie_thumb',
+            field=models.ImageField(blank=True, editable=False, upload_to='kyc/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='picture_thumb',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profiles/thumbs/'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0029_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('outcome', models.JSONField(blank=True, null=True)),
+                ('claimed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
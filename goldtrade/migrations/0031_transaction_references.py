@@ -0,0 +1,44 @@
+# Links from ledger entries and limit orders to a transaction also carry
+# its timestamp, so that on PostgreSQL, where goldtrade_transaction is
+# partitioned and keyed on (id, timestamp) since 0024, the foreign keys
+# can exist again (partitions.reference_transactions). On SQLite the
+# regular foreign keys stay and the new column is only filled in.
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from goldtrade import partitions
+
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table in partitions.REFERENCING:
+            cursor.execute(
+                f"UPDATE {quote(table)} SET transaction_at = ("
+                f"SELECT t.timestamp FROM goldtrade_transaction t WHERE t.id = {quote(table)}.transaction_id"
+                f") WHERE transaction_id IS NOT NULL"
+            )
+    if partitions.supported(connection):
+        partitions.reference_transactions(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0030_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='transaction_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='limitorder',
+            name='transaction_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goldtrade', '0031_transaction_references'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankdeposit',
+            name='slip_display',
+            field=models.ImageField(blank=True, editable=False, upload_to='bank_slips/display/'),
+        ),
+        migrations.AddField(
+            model_name='kyc',
+            name='nic_back_display',
+            field=models.ImageField(blank=True, editable=False, upload_to='kyc/display/'),
+        ),
+        migrations.AddField(
+            model_name='kyc',
+            name='nic_front_display',
+            field=models.ImageField(blank=True, editable=False, upload_to='kyc/display/'),
+        ),
+        migrations.AddField(
+            model_name='kyc',
+            name='selfie_display',
+            field=models.ImageField(blank=True, editable=False, upload_to='kyc/display/'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='picture_display',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profiles/display/'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 from django.db.models.signals import post_save
+from django.utils import timezone
 import uuid
 import os
 
@@ -26,6 +27,9 @@ class UserProfile(models.Model):
         blank=True,
         null=True
     )
+    # Written by the image pipeline (images.py)
+    picture_display = models.ImageField(upload_to="profiles/display/", blank=True, null=True, editable=False)
+    picture_thumb = models.ImageField(upload_to="profiles/thumbs/", blank=True, null=True, editable=False)
 
     # Personal info
     full_name = models.CharField(max_length=150, blank=True)
@@ -41,10 +45,17 @@ class UserProfile(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def picture_url(self):
+        if self.picture_display:
+            return self.picture_display.url
         if self.profile_picture:
             return self.profile_picture.url
         return "/static/images/default_profile.png"
 
+    def thumbnail_url(self):
+        if self.picture_thumb:
+            return self.picture_thumb.url
+        return self.picture_url()
+
     def __str__(self):
         return f"Profile of {self.user.username}"
 
@@ -64,12 +75,18 @@ def create_or_update_profile(sender, instance, created, **kwargs):
 class Wallet(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="wallets")
     is_demo = models.BooleanField(default=False, db_index=True)
+    # Materialized balances for hot reads; the ledger is the source of
+    # truth (see ledger.py) and every change goes through it.
     cash_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     gold_balance = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    entries_since_checkpoint = models.PositiveIntegerField(default=0)
 
     class Meta:
         constraints = [
-            models.UniqueConstraint(fields=["user", "is_demo"], name="uniq_user_demo_flag")
+            models.UniqueConstraint(fields=["user", "is_demo"], name="uniq_user_demo_flag"),
+            # Backstop for the guarded UPDATEs in ledger.move()
+            models.CheckConstraint(condition=models.Q(cash_balance__gte=0), name="wallet_cash_non_negative"),
+            models.CheckConstraint(condition=models.Q(gold_balance__gte=0), name="wallet_gold_non_negative"),
         ]
 
     def __str__(self):
@@ -84,6 +101,9 @@ class BankDeposit(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     reference_no = models.CharField(max_length=100)
     slip = models.ImageField(upload_to='bank_slips/')
+    # Written by the image pipeline (images.py)
+    slip_display = models.ImageField(upload_to='bank_slips/display/', blank=True, editable=False)
+    slip_thumb = models.ImageField(upload_to='bank_slips/thumbs/', blank=True, editable=False)
 
     STATUS_CHOICES = (
         ('pending', 'Pending Verification'),
@@ -94,6 +114,18 @@ class BankDeposit(models.Model):
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Review queue lease (claims.py); only meaningful while pending
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pages (pagination.py): my deposits, staff list, staff by status
+            models.Index(fields=["user", "-created_at", "-id"], name="deposit_user_recent_idx"),
+            models.Index(fields=["-created_at", "-id"], name="deposit_recent_idx"),
+            models.Index(fields=["status", "-created_at", "-id"], name="deposit_status_recent_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.amount} LKR"
 
@@ -136,22 +168,385 @@ class Transaction(models.Model):
         related_name="processed_transactions",
     )
 
+    # Review queue lease (claims.py); only meaningful while pending
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Newest-first per wallet: dashboard activity, history pages
+            models.Index(fields=["wallet", "-timestamp"], name="tx_wallet_recent_idx"),
+            # Keyset pages (pagination.py) filtered by type; my withdrawals
+            models.Index(
+                fields=["wallet", "transaction_type", "-timestamp", "-id"], name="tx_wallet_type_recent_idx"
+            ),
+            # Staff withdrawal list, all and by status
+            models.Index(
+                fields=["-timestamp", "-id"],
+                condition=models.Q(transaction_type="WITHDRAW"),
+                name="tx_withdraw_recent_idx",
+            ),
+            models.Index(
+                fields=["status", "-timestamp", "-id"],
+                condition=models.Q(transaction_type="WITHDRAW"),
+                name="tx_withdraw_status_idx",
+            ),
+        ]
+        constraints = [
+            # At most one withdrawal awaiting review per wallet
+            models.UniqueConstraint(
+                fields=["wallet"],
+                condition=models.Q(transaction_type="WITHDRAW", status="pending"),
+                name="uniq_pending_withdrawal",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.transaction_type} - {self.total_amount} ({self.status})"
 
 
+# ======================================================
+#  TRANSACTION ARCHIVE (cold storage manifest)
+# ======================================================
+class TransactionArchive(models.Model):
+    """
+    A gzip JSONL file of one month's settled transactions, moved out of
+    the live table by `manage.py archive_transactions` (archive.py).
+    """
+    month = models.DateField(help_text="First day of the month")
+    file = models.FileField(upload_to="archive/", max_length=255)
+    sha256 = models.CharField(max_length=64)
+    size = models.BigIntegerField(default=0)
+    rows = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.rows} transactions"
+
+
+class TransactionArchiveSpan(models.Model):
+    """
+    One wallet's rows in an archive file: a single gzip member at
+    [offset, offset + length), so reading them is one seek.
+    """
+    archive = models.ForeignKey(TransactionArchive, on_delete=models.CASCADE, related_name="spans")
+    wallet_id = models.BigIntegerField()  # no FK: archived rows outlive their wallet
+    offset = models.BigIntegerField()
+    length = models.PositiveIntegerField()
+    rows = models.PositiveIntegerField()
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["wallet_id", "-last_at"], name="archive_span_wallet_idx"),
+        ]
+
+    def __str__(self):
+        return f"wallet {self.wallet_id} in {self.archive}"
+
+
+# ======================================================
+#  LEDGER (append-only, double-entry)
+# ======================================================
+class LedgerEntry(models.Model):
+    """
+    One leg of a posting. Legs sharing a `journal` sum to zero per asset:
+    the customer leg carries the wallet, the other leg names the house
+    account it moved against (house, bank, demo, opening).
+    """
+    ASSET_CHOICES = [
+        ("CASH", "Cash (LKR)"),
+        ("GOLD", "Gold (g)"),
+    ]
+
+    journal = models.UUIDField(db_index=True)
+    wallet = models.ForeignKey(
+        Wallet, on_delete=models.CASCADE, null=True, blank=True, related_name="ledger_entries"
+    )
+    account = models.CharField(max_length=20, default="wallet")
+    asset = models.CharField(max_length=4, choices=ASSET_CHOICES)
+    amount = models.DecimalField(max_digits=16, decimal_places=4)
+    kind = models.CharField(max_length=20)
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name="ledger_entries"
+    )
+    # The transaction's timestamp: with it, PostgreSQL can check the link
+    # against the partitioned table's (id, timestamp) key (partitions.py)
+    transaction_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["wallet", "id"], name="ledger_wallet_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.asset} {self.amount} ({self.account})"
+
+
+class LedgerCheckpoint(models.Model):
+    """Wallet balances as of (and including) ledger entry `entry_id`."""
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="ledger_checkpoints")
+    entry_id = models.BigIntegerField()
+    cash_balance = models.DecimalField(max_digits=16, decimal_places=4)
+    gold_balance = models.DecimalField(max_digits=16, decimal_places=4)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["wallet", "entry_id"], name="uniq_checkpoint_entry")
+        ]
+
+    def __str__(self):
+        return f"{self.wallet} @ entry {self.entry_id}"
+
+
+# ======================================================
+#  POSITIONS (average cost, P&L)
+# ======================================================
+class Position(models.Model):
+    """
+    Average-cost position of a wallet's gold. Kept by portfolio.py on
+    every BUY/SELL; `cost_basis` is what the grams still held cost.
+    """
+    wallet = models.OneToOneField(Wallet, on_delete=models.CASCADE, related_name="position")
+    grams = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    cost_basis = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    realized_pnl = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    trades = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.wallet}: {self.grams} g, cost {self.cost_basis}"
+
+
+# ======================================================
+#  MONTHLY STATEMENTS (pre-generated PDFs)
+# ======================================================
+class MonthlyStatement(models.Model):
+    """
+    A wallet's PDF statement for one calendar month, built by
+    `manage.py build_statements`. The file is named by its SHA-256; the
+    `fingerprint` summarises the month's transactions and ledger, so a
+    rebuild skips wallets where it has not changed.
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="monthly_statements")
+    month = models.DateField(help_text="First day of the month")
+    file = models.FileField(upload_to="statements/", max_length=255)
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveIntegerField(default=0)
+    fingerprint = models.CharField(max_length=64)
+    transactions = models.PositiveIntegerField(default=0)
+    built_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # Also the index for "this wallet's statements, newest first"
+            models.UniqueConstraint(fields=["wallet", "month"], name="uniq_statement_wallet_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet} {self.month:%Y-%m}"
+
+
+# ======================================================
+#  DAILY STATS (staff reports rollup)
+# ======================================================
+class DailyStats(models.Model):
+    """
+    One row per local day of settled activity on real wallets, kept by
+    rollups.py as movements are booked. `cash_change` / `gold_change` are
+    the day's net change in customer holdings; their running sum is the
+    total held.
+    """
+    day = models.DateField(unique=True)
+    buys = models.PositiveIntegerField(default=0)
+    buy_grams = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    buy_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    sells = models.PositiveIntegerField(default=0)
+    sell_grams = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    sell_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    deposits = models.PositiveIntegerField(default=0)
+    deposit_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    withdrawals = models.PositiveIntegerField(default=0)
+    withdrawal_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    new_users = models.PositiveIntegerField(default=0)
+    cash_change = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    gold_change = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+
+    class Meta:
+        verbose_name_plural = "daily stats"
+
+    def __str__(self):
+        return f"{self.day}"
+
+
+# ======================================================
+#  QUEUE COUNTERS (staff review queue sizes)
+# ======================================================
+class QueueCounter(models.Model):
+    """
+    Number of pending items in one staff review queue (deposits,
+    withdrawals, kyc), moved by pending.py in the same transaction as the
+    status change and corrected by `manage.py reconcile_pending_counts`.
+    """
+    name = models.CharField(max_length=20, unique=True)
+    count = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.count}"
+
+
+# ======================================================
+#  IDEMPOTENCY KEYS (money-moving POSTs)
+# ======================================================
+class IdempotencyKey(models.Model):
+    """
+    One used idempotency key (idempotency.py). The unique INSERT of `key`
+    is the claim; `outcome` stays empty while the first request runs.
+    """
+    key = models.CharField(max_length=32, unique=True)  # hash of user, path and client key
+    outcome = models.JSONField(null=True, blank=True)
+    claimed_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+# ======================================================
+#  STAFF SEARCH
+# ======================================================
+class SearchDocument(models.Model):
+    """
+    Lowercased searchable text of one deposit, withdrawal or KYC
+    submission, kept by search.py and indexed for substring search
+    (trigram GIN on PostgreSQL, an FTS5 trigram table on SQLite).
+    """
+    KIND_CHOICES = [("deposit", "Deposit"), ("withdrawal", "Withdrawal"), ("kyc", "KYC")]
+
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    user_id = models.IntegerField(db_index=True)  # no FK: reindexing only needs the id
+    text = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="uniq_search_document"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+
+# ======================================================
+#  LIMIT ORDERS
+# ======================================================
+class LimitOrder(models.Model):
+    """
+    "Buy `grams` when the sell rate drops to `limit_price` or below" /
+    "sell `grams` when the buy rate reaches `limit_price` or above".
+    Filled by limit_orders.evaluate() when a GoldRate crosses it.
+    """
+    SIDE_CHOICES = [
+        ("BUY", "Buy"),
+        ("SELL", "Sell"),
+    ]
+    STATUS_CHOICES = [
+        ("open", "Open"),
+        ("filled", "Filled"),
+        ("cancelled", "Cancelled"),
+        ("failed", "Failed"),
+    ]
+
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="limit_orders")
+    side = models.CharField(max_length=4, choices=SIDE_CHOICES)
+    grams = models.DecimalField(max_digits=10, decimal_places=4)
+    limit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="open")
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name="limit_orders"
+    )
+    transaction_at = models.DateTimeField(null=True, blank=True, editable=False)  # as on LedgerEntry
+
+    class Meta:
+        indexes = [
+            # Range scan for the orders a rate crosses; open orders only
+            models.Index(
+                fields=["side", "limit_price"],
+                condition=models.Q(status="open"),
+                name="limit_open_price_idx",
+            ),
+            # Incremental OrderBook sync (recently placed open orders)
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(status="open"),
+                name="limit_open_created_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.side} {self.grams} g @ {self.limit_price} ({self.status})"
+
+
 # ======================================================
 #  GOLD RATE
 # ======================================================
 class GoldRate(models.Model):
     buy_rate = models.DecimalField(max_digits=10, decimal_places=2)
     sell_rate = models.DecimalField(max_digits=10, decimal_places=2)
-    last_updated = models.DateTimeField(auto_now=True)
+    # Rates are append-only; a default (not auto_now) lets bulk imports
+    # keep their source timestamps.
+    last_updated = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
         return f"Buy: {self.buy_rate} | Sell: {self.sell_rate}"
 
 
+# ======================================================
+#  GOLD RATE CANDLES (OHLC rollups of GoldRate)
+# ======================================================
+class GoldRateCandle(models.Model):
+    RESOLUTION_CHOICES = [
+        ("minute", "Minute"),
+        ("hour", "Hour"),
+        ("day", "Day"),
+    ]
+
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+
+    buy_open = models.DecimalField(max_digits=10, decimal_places=2)
+    buy_high = models.DecimalField(max_digits=10, decimal_places=2)
+    buy_low = models.DecimalField(max_digits=10, decimal_places=2)
+    buy_close = models.DecimalField(max_digits=10, decimal_places=2)
+
+    sell_open = models.DecimalField(max_digits=10, decimal_places=2)
+    sell_high = models.DecimalField(max_digits=10, decimal_places=2)
+    sell_low = models.DecimalField(max_digits=10, decimal_places=2)
+    sell_close = models.DecimalField(max_digits=10, decimal_places=2)
+
+    # timestamps of the samples behind open/close, so late or
+    # out-of-order rates land in the right place
+    opened_at = models.DateTimeField()
+    closed_at = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["resolution", "bucket_start"], name="uniq_candle_bucket"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.resolution} {self.bucket_start:%Y-%m-%d %H:%M} | Buy: {self.buy_close} | Sell: {self.sell_close}"
+
+
 # ======================================================
 #  KYC MODEL
 # ======================================================
@@ -168,6 +563,14 @@ class KYC(models.Model):
     nic_back = models.ImageField(upload_to='kyc/')
     selfie = models.ImageField(upload_to='kyc/')
 
+    # Written by the image pipeline (images.py)
+    nic_front_display = models.ImageField(upload_to='kyc/display/', blank=True, editable=False)
+    nic_back_display = models.ImageField(upload_to='kyc/display/', blank=True, editable=False)
+    selfie_display = models.ImageField(upload_to='kyc/display/', blank=True, editable=False)
+    nic_front_thumb = models.ImageField(upload_to='kyc/thumbs/', blank=True, editable=False)
+    nic_back_thumb = models.ImageField(upload_to='kyc/thumbs/', blank=True, editable=False)
+    selfie_thumb = models.ImageField(upload_to='kyc/thumbs/', blank=True, editable=False)
+
     status = models.CharField(
         max_length=20,
         choices=[
@@ -181,5 +584,15 @@ class KYC(models.Model):
 
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    # Review queue lease (claims.py); only meaningful while pending
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Staff review queue: newest submissions per status
+            models.Index(fields=["status", "-submitted_at"], name="kyc_status_recent_idx"),
+        ]
+
     def __str__(self):
         return f"KYC - {self.user.username}"
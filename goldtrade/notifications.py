@@ -0,0 +1,85 @@
+"""
+Customer email, sent off the request path.
+
+queue_email() hands a message to this process's sender thread once the
+surrounding transaction commits (nothing is sent for a rollback), so
+settling a batch of a few hundred reviews does not wait on SMTP. The
+thread drains whatever has queued up and sends it over one connection
+with send_messages().
+
+Delivery is best effort, as before: failures are logged and dropped. At
+interpreter exit the queue is flushed for up to FLUSH_TIMEOUT seconds,
+so short-lived processes (management commands) still send.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction as db_tx
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = 100        # messages per SMTP connection
+FLUSH_TIMEOUT = 10.0   # seconds allowed at exit
+
+
+class EmailQueue:
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def put(self, message):
+        self._idle.clear()
+        self._ensure_sender()
+        self._queue.put(message)
+
+    def _ensure_sender(self):
+        # Started lazily so it lives in the worker process, as in intake.py
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="email-queue", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with get_connection(fail_silently=True) as connection:
+                    connection.send_messages(batch)
+            except Exception:
+                logger.exception("Sending %d queued emails failed", len(batch))
+            if self._queue.empty():
+                self._idle.set()
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Waits until everything queued so far has been handed to the backend."""
+        deadline = time.monotonic() + timeout
+        while not self._idle.wait(0.05):
+            if time.monotonic() > deadline or self._thread is None or not self._thread.is_alive():
+                return False
+        return True
+
+
+email_queue = EmailQueue()
+atexit.register(email_queue.flush)
+
+
+def queue_email(to_email, subject, html_body):
+    """Multi-part (HTML + plain-text) email to `to_email`, sent after commit."""
+    message = EmailMultiAlternatives(subject, strip_tags(html_body), settings.DEFAULT_FROM_EMAIL, [to_email])
+    message.attach_alternative(html_body, "text/html")
+    db_tx.on_commit(lambda: email_queue.put(message))
@@ -0,0 +1,147 @@
+"""
+Keyset (cursor) pagination and filters for the history pages.
+
+Pages are walked with ?after=<cursor> (older) and ?before=<cursor>
+(newer); a cursor is the (timestamp, id) of the edge row of the page the
+link came from. Each page is one range query on an index that ends in
+(timestamp DESC, id DESC):
+
+    WHERE <filters> AND ts <= :t AND (ts < :t OR id < :id)
+    ORDER BY ts DESC, id DESC LIMIT page_size + 1
+
+The extra row says whether there is another page, so page N costs the
+same as page 1: no OFFSET scan and no COUNT(*).
+
+Pages can also take rows from the transaction archive
+(archive.ArchivedHistory); they are merged in under the same cursor.
+"""
+import base64
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+PAGE_SIZE = 25
+
+
+def encode_cursor(value, pk):
+    raw = f"{value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(datetime, pk) from a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        value, pk = raw.split("|")
+        value = datetime.fromisoformat(value)
+        return (value if timezone.is_aware(value) else timezone.make_aware(value)), int(pk)
+    except ValueError:
+        return None
+
+
+class KeysetPage:
+    """One page of rows plus the cursors for its Newer / Older links."""
+
+    def __init__(self, items, field, has_newer, has_older):
+        self.items = items
+        self.newer_cursor = self._cursor(items[0], field) if items and has_newer else None
+        self.older_cursor = self._cursor(items[-1], field) if items and has_older else None
+
+    @staticmethod
+    def _cursor(row, field):
+        return encode_cursor(getattr(row, field), row.pk)
+
+    @property
+    def has_other_pages(self):
+        return bool(self.newer_cursor or self.older_cursor)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _past(field, value, pk):
+    return Q(**{f"{field}__lte": value}) & (Q(**{f"{field}__lt": value}) | Q(pk__lt=pk))
+
+
+def _ahead(field, value, pk):
+    return Q(**{f"{field}__gte": value}) & (Q(**{f"{field}__gt": value}) | Q(pk__gt=pk))
+
+
+def paginate(queryset, request, field, page_size=PAGE_SIZE, archived=None):
+    """
+    Newest-first page of `queryset` ordered by (`field`, pk), positioned
+    by the request's ?after / ?before cursor, with the matching rows of
+    `archived` (an archive.ArchivedHistory) merged in.
+    """
+    before = decode_cursor(request.GET.get("before"))
+    after = decode_cursor(request.GET.get("after"))
+
+    def key(row):
+        return getattr(row, field), row.pk
+
+    if before:
+        # Walk forward from the cursor, then flip back to newest-first
+        rows = list(queryset.filter(_ahead(field, *before)).order_by(field, "pk")[: page_size + 1])
+        if archived is not None:
+            rows = sorted(rows + archived.newer(before, page_size + 1), key=key)[: page_size + 1]
+        has_newer = len(rows) > page_size
+        return KeysetPage(rows[:page_size][::-1], field, has_newer=has_newer, has_older=True)
+
+    if after:
+        queryset = queryset.filter(_past(field, *after))
+    rows = list(queryset.order_by(f"-{field}", "-pk")[: page_size + 1])
+    if archived is not None:
+        # A full live page only lets in archived rows newer than its extra row
+        floor = key(rows[page_size]) if len(rows) > page_size else None
+        rows = sorted(rows + archived.older(after, page_size + 1, floor), key=key, reverse=True)[: page_size + 1]
+    return KeysetPage(rows[:page_size], field, has_newer=after is not None, has_older=len(rows) > page_size)
+
+
+def _day(request, name):
+    """
+    ?name as a date, or None if it is missing or invalid. The calendar's
+    first and last days count as invalid: the day after (or the instant
+    before) them does not fit in a datetime.
+    """
+    try:
+        day = parse_date(request.GET.get(name, ""))
+    except ValueError:
+        return None
+    return day if day and date.min < day < date.max else None
+
+
+def filter_history(queryset, request, field, statuses=(), types=(), type_field="transaction_type"):
+    """
+    Applies the ?status, ?type, ?from and ?to (YYYY-MM-DD, local days,
+    inclusive) filters. Returns (queryset, the filters in effect).
+    """
+    filters = {}
+    status = request.GET.get("status", "")
+    if status in statuses:
+        queryset = queryset.filter(status=status)
+        filters["status"] = status
+    kind = request.GET.get("type", "")
+    if kind in types:
+        queryset = queryset.filter(**{type_field: kind})
+        filters["type"] = kind
+
+    # Day bounds as datetimes, so the range stays on the index (no __date cast)
+    start, end = _day(request, "from"), _day(request, "to")
+    if start:
+        queryset = queryset.filter(**{f"{field}__gte": timezone.make_aware(datetime.combine(start, time.min))})
+        filters["from"] = start.isoformat()
+    if end:
+        next_day = datetime.combine(end + timedelta(days=1), time.min)
+        queryset = queryset.filter(**{f"{field}__lt": timezone.make_aware(next_day)})
+        filters["to"] = end.isoformat()
+    return queryset, filters
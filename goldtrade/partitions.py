@@ -0,0 +1,329 @@
+"""
+Monthly range partitions for the append-only, time-ordered tables
+(PostgreSQL only).
+
+    goldtrade_transaction   PARTITION BY RANGE (timestamp)
+    goldtrade_goldrate      PARTITION BY RANGE (last_updated)
+
+One partition per UTC calendar month, named <table>_pYYYYMM. Queries that
+filter on the key (statements, date-filtered history, rate history and
+candles) are pruned to the months they cover; newest-first pages walk
+the per-partition indexes in a Merge Append and stop at their LIMIT.
+
+  convert()  one-off move of a plain table into partitions (migration 0024)
+  ensure()   creates the partitions for the coming months
+             (`manage.py ensure_partitions`, on deploy and daily)
+  ensure_range()  creates them for any span of months, e.g. before
+             `manage.py import_gold_rates` loads historical rates
+  detach()   takes old months out with DETACH PARTITION ... CONCURRENTLY,
+             which never blocks reads or writes of the other months
+
+`manage.py archive_transactions` (archive.py) drops the transaction
+months it has emptied.
+
+There is no DEFAULT partition: it would rule out CONCURRENTLY and have
+to be scanned whenever a month is added. ensure() keeps AHEAD months
+ready instead, run on every deploy (build.sh) and daily by the
+`hifas-partitions` cron job in render.yaml; anything writing rows outside
+that window (the rate importer) calls ensure_range() first.
+
+PostgreSQL needs the partition key in every primary key and unique
+constraint, so on a partitioned table:
+
+  - the primary key is (id, <key>); ids still come from one sequence,
+    and Django still treats `id` as the primary key;
+  - uniq_pending_withdrawal becomes a trigger (pending_withdrawal_guard)
+    that serializes per wallet on an advisory lock and raises
+    unique_violation, i.e. the same IntegrityError as before;
+  - foreign keys *to* goldtrade_transaction (LedgerEntry.transaction,
+    LimitOrder.transaction) must name the whole key, so those rows carry
+    the transaction's timestamp too (transaction_at) and the constraints
+    are on (transaction_id, transaction_at) -> (id, timestamp)
+    (reference_transactions(), migration 0031). Django still applies
+    their on_delete.
+
+Everything here is a no-op on SQLite, whose tables stay as they are.
+"""
+from datetime import date
+
+from django.utils import timezone
+
+AHEAD = 3  # future months kept ready by ensure()
+
+TABLES = {
+    "goldtrade_transaction": "timestamp",
+    "goldtrade_goldrate": "last_updated",
+}
+
+
+def supported(connection):
+    return connection.vendor == "postgresql"
+
+
+def month_of(day):
+    """First day of the month of `day` (a date or datetime)."""
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    """The month `count` months after `month` (a first-of-month date)."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month):
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def partitions(cursor, table):
+    """{month: partition name} of the partitions attached to `table`."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        [table],
+    )
+    attached = {}
+    prefix = f"{table}_p"
+    for (name,) in cursor.fetchall():
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            attached[date(int(suffix[:4]), int(suffix[4:]), 1)] = name
+    return attached
+
+
+def _create(cursor, quote, table, month):
+    """
+    Adds the month as an empty table, then ATTACH PARTITION: that takes
+    SHARE UPDATE EXCLUSIVE on the parent (CREATE TABLE ... PARTITION OF
+    would take ACCESS EXCLUSIVE), and the CHECK lets it skip validation.
+    """
+    name = partition_name(table, month)
+    low, high = _bound(month), _bound(add_months(month, 1))
+    column = quote(TABLES[table])
+    cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"ALTER TABLE {quote(name)} ADD CONSTRAINT {quote(name + '_range')} "
+        f"CHECK ({column} IS NOT NULL AND {column} >= {low} AND {column} < {high})"
+    )
+    cursor.execute(f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES FROM ({low}) TO ({high})")
+    # Redundant with the partition bound once attached
+    cursor.execute(f"ALTER TABLE {quote(name)} DROP CONSTRAINT {quote(name + '_range')}")
+    return name
+
+
+# =========================
+# One-off conversion (migration)
+# =========================
+def convert(connection, table, replaced=()):
+    """
+    Rebuilds `table` as a partitioned table with the same name, columns,
+    indexes and constraints, one partition per month from its oldest row
+    to AHEAD months from now, and copies every row across.
+
+    Unique indexes and constraints without the partition key cannot be
+    kept; pass their names in `replaced` once something else enforces
+    them, anything else raises. Runs in the migration's transaction.
+    """
+    column = TABLES[table]
+    quote = connection.ops.quote_name
+    old = f"{table}_unpartitioned"
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return
+
+        # Index and constraint names are schema-wide, so collect them now
+        # and recreate them once the old table is dropped
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+            [table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u', 'f', 'c')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        backed = {name for name, kind, _definition in constraints if kind in ("p", "u")}
+        for name, definition in indexes:
+            if definition.startswith("CREATE UNIQUE") and name not in backed and name not in replaced:
+                raise ValueError(f"{table}: unique index {name} cannot be kept on a partitioned table.")
+        for name, kind, _definition in constraints:
+            if kind == "u" and name not in replaced:
+                raise ValueError(f"{table}: unique constraint {name} cannot be kept on a partitioned table.")
+
+        cursor.execute(f"SELECT min({quote(column)}), max({quote(column)}), max(id) FROM {quote(table)}")
+        first, last, last_id = cursor.fetchone()
+        now = timezone.now()
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+        cursor.execute(f"CREATE TABLE {quote(table)} (LIKE {quote(old)}) PARTITION BY RANGE ({quote(column)})")
+        month = month_of(first or now)
+        final = add_months(month_of(max(last or now, now)), AHEAD)
+        while month <= final:
+            low, high = _bound(month), _bound(add_months(month, 1))
+            cursor.execute(
+                f"CREATE TABLE {quote(partition_name(table, month))} PARTITION OF {quote(table)} "
+                f"FOR VALUES FROM ({low}) TO ({high})"
+            )
+            month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+        # Also drops the foreign keys that referenced the old table;
+        # reference_transactions() puts them back on the full key
+        cursor.execute(f"DROP TABLE {quote(old)} CASCADE")
+
+        sequence = f"{table}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id")
+        cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        if last_id:
+            cursor.execute("SELECT setval(%s, %s)", [sequence, last_id])
+
+        for name, kind, definition in constraints:
+            if kind == "p":
+                cursor.execute(
+                    f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} PRIMARY KEY (id, {quote(column)})"
+                )
+            elif kind in ("f", "c"):
+                cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+        for name, definition in indexes:
+            if name not in backed and not definition.startswith("CREATE UNIQUE"):
+                cursor.execute(definition)
+
+
+def install_pending_withdrawal_guard(connection):
+    """uniq_pending_withdrawal for a partitioned goldtrade_transaction."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION goldtrade_pending_withdrawal_guard() RETURNS trigger AS $$
+            BEGIN
+                IF NEW.transaction_type = 'WITHDRAW' AND NEW.status = 'pending' THEN
+                    -- Writers for one wallet queue here; the check then sees the winner's row
+                    PERFORM pg_advisory_xact_lock(hashtext('uniq_pending_withdrawal'), NEW.wallet_id::integer);
+                    IF EXISTS (
+                        SELECT 1 FROM goldtrade_transaction
+                        WHERE wallet_id = NEW.wallet_id AND transaction_type = 'WITHDRAW'
+                          AND status = 'pending' AND id <> NEW.id
+                    ) THEN
+                        RAISE EXCEPTION 'wallet % already has a pending withdrawal', NEW.wallet_id
+                            USING ERRCODE = 'unique_violation', CONSTRAINT = 'uniq_pending_withdrawal';
+                    END IF;
+                END IF;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute("""
+            CREATE TRIGGER uniq_pending_withdrawal
+            BEFORE INSERT OR UPDATE OF wallet_id, transaction_type, status ON goldtrade_transaction
+            FOR EACH ROW EXECUTE FUNCTION goldtrade_pending_withdrawal_guard()
+        """)
+
+
+# Tables pointing at goldtrade_transaction: {table: constraint name}
+REFERENCING = {
+    "goldtrade_ledgerentry": "goldtrade_ledgerentry_transaction_fk",
+    "goldtrade_limitorder": "goldtrade_limitorder_transaction_fk",
+}
+
+
+def reference_transactions(connection):
+    """
+    Foreign keys from REFERENCING to a partitioned goldtrade_transaction
+    on (transaction_id, transaction_at). A row with either column NULL is
+    not checked (MATCH SIMPLE), so SET_NULL on transaction_id still works.
+    Links whose transaction no longer exists are cleared first.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor, "goldtrade_transaction"):
+            return
+        for table, name in REFERENCING.items():
+            cursor.execute(
+                f"UPDATE {quote(table)} r SET transaction_id = NULL, transaction_at = NULL "
+                f"WHERE transaction_id IS NOT NULL AND NOT EXISTS ("
+                f"SELECT 1 FROM goldtrade_transaction t "
+                f"WHERE t.id = r.transaction_id AND t.timestamp = r.transaction_at)"
+            )
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+                f"FOREIGN KEY (transaction_id, transaction_at) REFERENCES goldtrade_transaction (id, timestamp) "
+                f"ON UPDATE CASCADE DEFERRABLE INITIALLY DEFERRED"
+            )
+
+
+# =========================
+# Maintenance (manage.py ensure_partitions)
+# =========================
+def ensure(connection, ahead=AHEAD):
+    """
+    Creates any missing partition from the current month to `ahead`
+    months out. Returns the names created.
+    """
+    current = month_of(timezone.now())
+    return ensure_range(connection, current, add_months(current, ahead))
+
+
+def ensure_range(connection, first, last, tables=TABLES):
+    """
+    Creates any missing partition of `tables` for the months from `first`
+    to `last` (dates or datetimes, inclusive), e.g. before loading rows
+    older than the oldest month. Returns the names created.
+    """
+    if not supported(connection):
+        return []
+    quote = connection.ops.quote_name
+    final = month_of(last)
+    created = []
+    with connection.cursor() as cursor:
+        for table in tables:
+            if not is_partitioned(cursor, table):
+                continue
+            attached = partitions(cursor, table)
+            month = month_of(first)
+            while month <= final:
+                if month not in attached:
+                    created.append(_create(cursor, quote, table, month))
+                month = add_months(month, 1)
+    return created
+
+
+def detach(connection, before, tables=TABLES, empty=False):
+    """
+    Detaches every partition of `tables` for months before `before` (a
+    date; its month counts as kept), or only those without rows when
+    `empty`, and leaves each as a standalone table of the same name, to
+    archive or drop. Must run outside a transaction: DETACH PARTITION ...
+    CONCURRENTLY (PostgreSQL 14+) cannot run inside one. Returns the
+    names detached.
+    """
+    if not supported(connection):
+        return []
+    quote = connection.ops.quote_name
+    concurrently = " CONCURRENTLY" if connection.pg_version >= 140000 else ""
+    cutoff = month_of(before)
+    detached = []
+    with connection.cursor() as cursor:
+        for table in tables:
+            if not is_partitioned(cursor, table):
+                continue
+            for month, name in sorted(partitions(cursor, table).items()):
+                if month >= cutoff:
+                    continue
+                if empty:
+                    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {quote(name)})")
+                    if cursor.fetchone()[0]:
+                        continue
+                cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}{concurrently}")
+                detached.append(name)
+    return detached
@@ -0,0 +1,110 @@
+"""
+Staff review queue state (pending deposits / withdrawals / KYC).
+
+Each queue's size is a QueueCounter row, moved with
+
+    UPDATE goldtrade_queuecounter SET count = count + :delta WHERE name = :queue
+
+in the same transaction as the status change: the model signals
+(signals.py) compare an instance's status with the one it was loaded
+with, and queryset updates that claim a pending row call adjust()
+themselves. A rollback undoes both.
+
+The shared "pending-queue" version moves after every such commit, so
+pollers and streams can tell that the counts changed without counting.
+pending_counts() keeps the counts per version in process memory and in
+the shared cache, so a staff page render or a notification poll reads
+no table at all; after a change, the first worker to ask reads the
+three counter rows.
+
+`manage.py reconcile_pending_counts` (every 10 minutes, the
+`hifas-queue-counts` cron job in render.yaml) recounts the queues and
+corrects any drift, e.g. from two unlocked saves of the same row.
+"""
+from django.core.cache import caches
+from django.db import transaction as db_tx
+from django.db.models import F
+from django.utils import timezone
+
+from .models import KYC, BankDeposit, QueueCounter, Transaction
+from .versions import bump_version, get_version
+
+PENDING_VERSION = "pending-queue"
+QUEUES = ("deposits", "withdrawals", "kyc")
+
+# (version, counts) of this process; swapped as one object as in rates.py
+_entry = (None, None)
+
+
+def pending_version():
+    return get_version(PENDING_VERSION)
+
+
+def invalidate():
+    bump_version(PENDING_VERSION)
+
+
+def queue_of(instance):
+    """The queue `instance` belongs to, or None."""
+    if isinstance(instance, BankDeposit):
+        return "deposits"
+    if isinstance(instance, KYC):
+        return "kyc"
+    if isinstance(instance, Transaction) and instance.transaction_type == "WITHDRAW":
+        return "withdrawals"
+    return None
+
+
+def adjust(queue, delta):
+    """Moves the queue's counter inside the caller's transaction."""
+    if delta:
+        QueueCounter.objects.filter(name=queue).update(count=F("count") + delta)
+        db_tx.on_commit(invalidate)
+
+
+def pending_counts():
+    global _entry
+    # Version first, as in rates.py: a concurrent bump can only cause a reload
+    version = pending_version()
+    cached_version, counts = _entry
+    if cached_version != version:
+        key = f"pending-counts:{version}"
+        counts = caches["shared"].get(key)
+        if counts is None:
+            counts = dict.fromkeys(QUEUES, 0)
+            counts.update(QueueCounter.objects.filter(name__in=QUEUES).values_list("name", "count"))
+            caches["shared"].set(key, counts, 24 * 3600)
+        _entry = (version, counts)
+    return dict(counts)
+
+
+# =========================
+# Reconciliation (manage.py reconcile_pending_counts, migration)
+# =========================
+def _pending(deposit_model, transaction_model, kyc_model):
+    return {
+        "deposits": deposit_model.objects.filter(status="pending"),
+        "withdrawals": transaction_model.objects.filter(transaction_type="WITHDRAW", status="pending"),
+        "kyc": kyc_model.objects.filter(status="pending"),
+    }
+
+
+def reconcile(deposit_model=BankDeposit, transaction_model=Transaction, kyc_model=KYC, counter_model=QueueCounter):
+    """
+    Recounts every queue and stores it. Returns {queue: (stored, actual)}
+    for the counters that were wrong.
+    """
+    corrected = {}
+    for queue, pending in _pending(deposit_model, transaction_model, kyc_model).items():
+        with db_tx.atomic():
+            # Writers hold this row until they commit, so the count below
+            # sees every change that already moved the counter
+            counter, _created = counter_model.objects.select_for_update().get_or_create(name=queue)
+            actual = pending.count()
+            if counter.count != actual:
+                corrected[queue] = (counter.count, actual)
+            counter.count = actual
+            counter.reconciled_at = timezone.now()
+            counter.save(update_fields=["count", "reconciled_at"])
+    db_tx.on_commit(invalidate)
+    return corrected
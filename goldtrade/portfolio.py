@@ -0,0 +1,213 @@
+"""
+Average-cost positions and P&L per wallet.
+
+Every BUY/SELL updates the wallet's Position in the same transaction as
+the trade (record_trades), so reading P&L never replays history:
+
+  BUY   grams += g, cost_basis += amount paid
+  SELL  released = cost_basis * g / grams      (average cost of what left)
+        realized_pnl += proceeds - released
+        grams -= g, cost_basis -= released
+
+summary() values the position at the cached current rate in O(1).
+
+replay() recomputes every position from the full trade history with
+NumPy, for the backfill migration and `manage.py rebuild_positions`.
+Under average cost the cost basis follows the linear recurrence
+C[t] = a[t] * C[t-1] + b[t] (a = 1, b = amount on a buy; a = remaining
+fraction, b = 0 on a sell), which is solved for all wallets at once with
+a prefix scan over the (a, b) pairs; a = 0 restarts it at each wallet's
+first trade and wherever a wallet sold out.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.utils import timezone
+
+from . import archive
+from .models import Position, Transaction
+
+ZERO = Decimal("0")
+CENTS = Decimal("0.01")
+FOUR_PLACES = Decimal("0.0001")
+
+POSITION_FIELDS = ["grams", "cost_basis", "realized_pnl", "trades", "updated_at"]
+
+
+# =========================
+# Incremental (on trade)
+# =========================
+def _apply(position, side, grams, total):
+    if side == "BUY":
+        position.grams += grams
+        position.cost_basis += total
+    else:
+        released = ZERO
+        if position.grams > 0:
+            released = (position.cost_basis * grams / position.grams).quantize(FOUR_PLACES)
+        position.realized_pnl += total - released
+        position.grams -= grams
+        position.cost_basis -= released
+        if position.grams <= 0:
+            position.grams = ZERO
+            position.cost_basis = ZERO
+    position.trades += 1
+
+
+def record_trades(trades):
+    """
+    Folds trades into their wallets' positions. `trades` is a list of
+    (wallet, side, grams, total) already applied in this transaction under
+    the wallet row locks (ledger.move), in the order they were applied.
+    """
+    if not trades:
+        return
+    positions = {
+        position.wallet_id: position
+        for position in Position.objects.filter(wallet_id__in={wallet.pk for wallet, *_ in trades})
+    }
+    existing = set(positions)
+    for wallet, side, grams, total in trades:
+        position = positions.get(wallet.pk)
+        if position is None:
+            position = positions[wallet.pk] = Position(wallet_id=wallet.pk)
+        _apply(position, side, Decimal(grams), Decimal(total))
+
+    now = timezone.now()
+    for position in positions.values():
+        position.updated_at = now
+    Position.objects.bulk_create([p for pk, p in positions.items() if pk not in existing])
+    Position.objects.bulk_update([p for pk, p in positions.items() if pk in existing], POSITION_FIELDS)
+
+
+# =========================
+# Reads
+# =========================
+def summary(position, rates):
+    """
+    P&L of `position` (may be None) at the current rates. Holdings are
+    valued at the buy rate, i.e. what the customer would get selling now.
+    """
+    grams = position.grams if position else ZERO
+    cost_basis = position.cost_basis.quantize(CENTS) if position else ZERO
+    realized = position.realized_pnl.quantize(CENTS) if position else ZERO
+    market_value = (grams * rates["buy_rate"]).quantize(CENTS)
+    unrealized = market_value - cost_basis if grams else ZERO
+    return {
+        "grams": grams,
+        "avg_cost": (cost_basis / grams).quantize(CENTS) if grams else None,
+        "cost_basis": cost_basis,
+        "market_value": market_value,
+        "unrealized_pnl": unrealized,
+        "realized_pnl": realized,
+        "total_pnl": unrealized + realized,
+        "return_pct": (unrealized / cost_basis * 100).quantize(CENTS) if cost_basis else None,
+    }
+
+
+# =========================
+# Vectorized replay
+# =========================
+def _group_cumsum(values, first, group):
+    totals = np.cumsum(values)
+    return totals - (totals[first] - values[first])[group]
+
+
+def _linear_scan(a, b):
+    """
+    Solves x[t] = a[t] * x[t-1] + b[t] (x[-1] = 0) in log2(n) vectorized
+    passes, composing neighbouring steps as (a2 * a1, a2 * b1 + b2). All
+    factors are in [0, 1], so nothing overflows or cancels.
+    """
+    a, b = a.copy(), b.copy()
+    step = 1
+    while step < len(a) and a[step:].any():
+        b[step:] = a[step:] * b[:-step] + b[step:]
+        a[step:] = a[step:] * a[:-step]
+        step *= 2
+    return b
+
+
+def replay(wallet_ids=None, transaction_model=Transaction):
+    """
+    Recomputes positions from every BUY/SELL, in the order they were
+    written, archived ones included. Returns {wallet_id: {"grams",
+    "cost_basis", "realized_pnl", "trades"}} with Decimal values, for
+    wallets that have traded.
+    """
+    trades = transaction_model.objects.filter(transaction_type__in=["BUY", "SELL"])
+    if wallet_ids is not None:
+        trades = trades.filter(wallet_id__in=wallet_ids)
+    rows = list(
+        trades.order_by("wallet_id", "id")
+        .values_list("wallet_id", "id", "transaction_type", "gold_amount", "total_amount")
+        .iterator(chunk_size=20000)
+    )
+    if transaction_model is Transaction:
+        # The backfill migration's historical model predates the archive
+        archived = list(archive.trades(wallet_ids))
+        if archived:
+            rows = sorted(rows + archived, key=lambda r: (r[0], r[1]))
+    if not rows:
+        return {}
+
+    wallet = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    buy = np.fromiter((r[2] == "BUY" for r in rows), dtype=bool, count=len(rows))
+    grams = np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows))
+    total = np.fromiter((r[4] for r in rows), dtype=np.float64, count=len(rows))
+
+    starts = np.r_[True, wallet[1:] != wallet[:-1]]
+    first = np.flatnonzero(starts)
+    group = np.cumsum(starts) - 1
+
+    signed = np.where(buy, grams, -grams)
+    held = np.round(_group_cumsum(signed, first, group), 4)
+    held_before = np.round(held - signed, 4)
+
+    # C[t] = a[t] * C[t-1] + b[t]; a sell-out gives a = 0
+    ratio = np.zeros_like(held)
+    np.divide(held, held_before, out=ratio, where=held_before > 0)
+    scale = np.where(buy, 1.0, ratio)
+    scale[starts | (held_before <= 0)] = 0.0
+    cost = _linear_scan(scale, np.where(buy, total, 0.0))
+
+    cost_before = np.r_[0.0, cost[:-1]]
+    cost_before[starts] = 0.0
+    realized = np.where(buy, 0.0, total - (cost_before - cost))
+
+    last = np.r_[first[1:] - 1, len(rows) - 1]
+    realized_sum = np.add.reduceat(realized, first)
+    counts = np.diff(np.r_[first, len(rows)])
+
+    return {
+        int(wallet[end]): {
+            "grams": Decimal(f"{held[end]:.4f}"),
+            "cost_basis": Decimal(f"{cost[end]:.4f}"),
+            "realized_pnl": Decimal(f"{realized_sum[i]:.4f}"),
+            "trades": int(counts[i]),
+        }
+        for i, end in enumerate(last)
+    }
+
+
+def rebuild(wallet_ids=None, transaction_model=Transaction, position_model=Position):
+    """Overwrites positions with replay(). Returns the number written."""
+    replayed = replay(wallet_ids, transaction_model)
+    existing = position_model.objects.all()
+    if wallet_ids is not None:
+        existing = existing.filter(wallet_id__in=wallet_ids)
+    existing = {position.wallet_id: position for position in existing}
+
+    now = timezone.now()
+    updated, created = [], []
+    for wallet_id in set(existing) | set(replayed):
+        values = replayed.get(wallet_id, {"grams": ZERO, "cost_basis": ZERO, "realized_pnl": ZERO, "trades": 0})
+        position = existing.get(wallet_id) or position_model(wallet_id=wallet_id)
+        for field, value in values.items():
+            setattr(position, field, value)
+        position.updated_at = now
+        (updated if wallet_id in existing else created).append(position)
+
+    position_model.objects.bulk_create(created, batch_size=2000)
+    position_model.objects.bulk_update(updated, POSITION_FIELDS, batch_size=2000)
+    return len(created) + len(updated)
@@ -0,0 +1,74 @@
+"""
+Current gold rate provider.
+
+Keeps the latest GoldRate quote in process memory and reloads it only when
+the shared "gold-rate" version moves. GoldRate saves bump the version on
+commit (see signals.py), so every gunicorn worker serves a new rate as soon
+as update_gold_rate writes it, without a DB round-trip per request.
+"""
+import threading
+from decimal import Decimal
+
+from django.utils.timezone import localtime
+
+from .models import GoldRate
+from .versions import bump_version, get_version
+
+RATE_VERSION = "gold-rate"
+
+
+class CurrentRate:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (version token, quote dict) — swapped as one object so readers
+        # never see a quote paired with the wrong version.
+        self._entry = (None, None)
+
+    def version(self):
+        return get_version(RATE_VERSION)
+
+    def get(self):
+        """
+        Returns the latest buy/sell rates as Decimals.
+        If none available, returns zeros to protect arithmetic.
+        """
+        version = self.version()
+        cached_version, quote = self._entry
+        if cached_version != version or quote is None:
+            with self._lock:
+                cached_version, quote = self._entry
+                if cached_version != version or quote is None:
+                    # Version is read before the DB so a concurrent bump
+                    # can only make us reload again, never serve stale.
+                    quote = self._load()
+                    self._entry = (version, quote)
+        return dict(quote)
+
+    def invalidate(self):
+        bump_version(RATE_VERSION)
+
+    @staticmethod
+    def _load():
+        gold = GoldRate.objects.order_by("-last_updated").first()
+        if gold:
+            return {
+                "buy_rate": Decimal(gold.buy_rate),
+                "sell_rate": Decimal(gold.sell_rate),
+                "last_updated": gold.last_updated,
+            }
+        return {"buy_rate": Decimal("0"), "sell_rate": Decimal("0"), "last_updated": None}
+
+
+current_rate = CurrentRate()
+
+
+def rates_payload():
+    """JSON body for refresh_rates and the "rates" live event."""
+    rates = current_rate.get()
+    if not rates["last_updated"]:
+        return {"buy_rate": 0, "sell_rate": 0, "last_updated": None}
+    return {
+        "buy_rate": float(rates["buy_rate"]),
+        "sell_rate": float(rates["sell_rate"]),
+        "last_updated": localtime(rates["last_updated"]).strftime("%Y-%m-%d %H:%M"),
+    }
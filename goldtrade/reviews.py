@@ -0,0 +1,241 @@
+"""
+Settling staff reviews of bank deposits and withdrawals, one or many at
+once (the single-row views pass one id).
+
+Each call is one transaction that takes its locks in a fixed order:
+
+  1. the pending rows, SELECT ... FOR UPDATE SKIP LOCKED in id order;
+  2. the wallets, each by one guarded UPDATE (ledger.move) in
+     (wallet id, row id) order.
+
+Every other path that touches both (intake.py, limit_orders.py) also
+locks rows before wallets and wallets in id order, so overlapping
+batches cannot deadlock. Rows another
+reviewer is settling right now, or holds a claim on (claims.py), are
+left to them and reported as `held`, without waiting on their locks.
+Rows that are no longer pending are skipped; a withdrawal the wallet can
+no longer cover stays pending. A call looks at MAX_BATCH ids at most;
+the rest are reported as `truncated` for the caller to send again.
+
+Approved deposits credit the wallet with a DEPOSIT transaction plus its
+ledger legs, written with one bulk INSERT each; status changes are one
+bulk UPDATE. Queue counters
+move once per batch (pending.adjust) and customer emails are queued for
+after commit (notifications.py).
+"""
+from django.db import transaction as db_tx
+from django.template.loader import render_to_string
+from django.utils.timezone import localtime, now
+
+from . import claims, ledger, pending
+from .ledger import InsufficientFunds
+from .models import BankDeposit, Transaction, Wallet
+from .notifications import queue_email
+
+MAX_BATCH = 500  # ids per call
+SITE_URL = "https://hifas-jewellery.onrender.com"
+
+
+class Outcome:
+    """
+    What a review call did: `settled` rows, `refused` rows (insufficient
+    funds), `held` ids (another reviewer's), `skipped` ids (not pending)
+    and `truncated` ids (past MAX_BATCH, not looked at).
+    """
+
+    def __init__(self, queue, ids, settled, refused=(), truncated=()):
+        self.settled = list(settled)
+        self.refused = list(refused)
+        self.truncated = list(truncated)
+        done = {row.pk for row in self.settled} | {row.pk for row in self.refused}
+        rest = [pk for pk in ids if pk not in done]
+        # Unlocked read: what is still pending was locked or claimed by someone else
+        held = set(claims.pending(queue).filter(pk__in=rest).values_list("pk", flat=True)) if rest else set()
+        self.held = [pk for pk in rest if pk in held]
+        self.skipped = [pk for pk in rest if pk not in held]
+
+
+def _ids(ids):
+    """(the first MAX_BATCH distinct ids in order, the rest)."""
+    ids = sorted({int(pk) for pk in ids})
+    return ids[:MAX_BATCH], ids[MAX_BATCH:]
+
+
+def _locked(queryset, ids, staff):
+    # of=("self",): lock the rows themselves, not the joined users/wallets
+    return list(
+        queryset.select_for_update(skip_locked=True, of=("self",))
+        .filter(claims.open_to(staff), pk__in=ids, status="pending").order_by("pk")
+    )
+
+
+# =========================
+# Deposits
+# =========================
+def approve_deposits(ids, staff):
+    ids, truncated = _ids(ids)
+    with db_tx.atomic():
+        deposits = _locked(BankDeposit.objects.select_related("user"), ids, staff)
+        if not deposits:
+            return Outcome("deposits", ids, [], truncated=truncated)
+        wallets = {
+            wallet.user_id: wallet
+            for wallet in Wallet.objects.filter(user_id__in={d.user_id for d in deposits}, is_demo=False)
+        }
+        for deposit in deposits:
+            if deposit.user_id not in wallets:
+                wallets[deposit.user_id], _ = Wallet.objects.get_or_create(user_id=deposit.user_id, is_demo=False)
+
+        deposits.sort(key=lambda d: (wallets[d.user_id].pk, d.pk))
+        for deposit in deposits:
+            ledger.move(wallets[deposit.user_id], cash=deposit.amount)
+        txs = Transaction.objects.bulk_create([
+            Transaction(
+                wallet=wallets[deposit.user_id],
+                transaction_type="DEPOSIT",
+                total_amount=deposit.amount,
+                remarks=f"Bank deposit ref: {deposit.reference_no}",
+                status="approved",
+            )
+            for deposit in deposits
+        ])
+        ledger.record_many([
+            (wallets[deposit.user_id], "DEPOSIT", deposit.amount, 0, "bank", tx)
+            for deposit, tx in zip(deposits, txs)
+        ])
+        for deposit in deposits:
+            deposit.status = "approved"
+            deposit.claimed_by = deposit.claimed_until = None
+        BankDeposit.objects.bulk_update(deposits, ["status", *claims.CLEARED])
+        pending.adjust("deposits", -len(deposits))
+
+        for deposit in deposits:
+            _deposit_approved_email(deposit)
+    return Outcome("deposits", ids, deposits, truncated=truncated)
+
+
+def reject_deposits(ids, staff):
+    ids, truncated = _ids(ids)
+    with db_tx.atomic():
+        deposits = _locked(BankDeposit.objects.select_related("user"), ids, staff)
+        for deposit in deposits:
+            deposit.status = "rejected"
+            deposit.claimed_by = deposit.claimed_until = None
+        BankDeposit.objects.bulk_update(deposits, ["status", *claims.CLEARED])
+        pending.adjust("deposits", -len(deposits))
+        for deposit in deposits:
+            _deposit_rejected_email(deposit)
+    return Outcome("deposits", ids, deposits, truncated=truncated)
+
+
+# =========================
+# Withdrawals
+# =========================
+def _withdrawals(ids, staff):
+    return _locked(Transaction.objects.filter(transaction_type="WITHDRAW").select_related("wallet__user"), ids, staff)
+
+
+def approve_withdrawals(ids, staff):
+    ids, truncated = _ids(ids)
+    with db_tx.atomic():
+        withdrawals = sorted(_withdrawals(ids, staff), key=lambda tx: (tx.wallet_id, tx.pk))
+        approved, refused = [], []
+        for tx in withdrawals:
+            try:
+                ledger.move(tx.wallet, cash=-tx.total_amount)
+            except InsufficientFunds:
+                refused.append(tx)
+            else:
+                approved.append(tx)
+        for tx in approved:
+            tx.status = "approved"
+            tx.processed_by = staff
+            tx.claimed_by = tx.claimed_until = None
+        Transaction.objects.bulk_update(approved, ["status", "processed_by", *claims.CLEARED])
+        ledger.record_many([(tx.wallet, "WITHDRAW", -tx.total_amount, 0, "bank", tx) for tx in approved])
+        pending.adjust("withdrawals", -len(approved))
+        for tx in approved:
+            _withdrawal_approved_email(tx)
+    return Outcome("withdrawals", ids, approved, refused, truncated=truncated)
+
+
+def reject_withdrawals(ids, staff):
+    ids, truncated = _ids(ids)
+    with db_tx.atomic():
+        withdrawals = _withdrawals(ids, staff)
+        for tx in withdrawals:
+            tx.status = "rejected"
+            tx.processed_by = staff
+            tx.claimed_by = tx.claimed_until = None
+        Transaction.objects.bulk_update(withdrawals, ["status", "processed_by", *claims.CLEARED])
+        pending.adjust("withdrawals", -len(withdrawals))
+        for tx in withdrawals:
+            _withdrawal_rejected_email(tx)
+    return Outcome("withdrawals", ids, withdrawals, truncated=truncated)
+
+
+# =========================
+# Customer emails (queued for after commit)
+# =========================
+def _deposit_approved_email(deposit):
+    if not deposit.user.email:
+        return
+    html = render_to_string("emails/deposit_approved.html", {
+        "username": deposit.user.username,
+        "amount": f"{deposit.amount:,.2f}",
+        "reference_no": deposit.reference_no,
+        "date": localtime(deposit.created_at).strftime("%Y-%m-%d %H:%M"),
+        "site_url": SITE_URL,
+        "year": now().year,
+    })
+    queue_email(deposit.user.email, "Deposit Approved – Hifas Jewellery", html)
+
+
+def _deposit_rejected_email(deposit):
+    if not deposit.user.email:
+        return
+    queue_email(
+        deposit.user.email,
+        "Deposit Rejected – Hifas Jewellery",
+        f"""
+        <p>Hi {deposit.user.username},</p>
+        <p>Your bank deposit (Ref: {deposit.reference_no}) has been <b>rejected</b>.</p>
+        <p>Amount: Rs. {deposit.amount:,.2f}</p>
+        <p>If you believe this is an error, please contact support.</p>
+        <p>— Hifas Jewellery</p>
+        """,
+    )
+
+
+def _withdrawal_approved_email(tx):
+    user = tx.wallet.user
+    if not user.email:
+        return
+    html = render_to_string("emails/withdrawal_approved.html", {
+        "username": user.username,
+        "amount": tx.total_amount,
+        "bank_details": tx.remarks,
+        "date": localtime(tx.timestamp).strftime("%Y-%m-%d %H:%M"),
+        "site_url": SITE_URL,
+        "year": now().year,
+    })
+    queue_email(user.email, "Withdrawal Approved – Hifas Jewellery", html)
+
+
+def _withdrawal_rejected_email(tx):
+    user = tx.wallet.user
+    if not user.email:
+        return
+    queue_email(
+        user.email,
+        "Withdrawal Rejected – Hifas Jewellery",
+        f"""
+        <p>Hi {user.username},</p>
+        <p>Your withdrawal request has been <b>rejected</b>.</p>
+        <p><b>Amount:</b> Rs. {tx.total_amount:,.2f}<br>
+           <b>Requested on:</b> {tx.timestamp.strftime('%Y-%m-%d %H:%M')}<br>
+           <b>Bank Details:</b> {tx.remarks or '—'}</p>
+        <p>If you believe this is an error, please reply to this email.</p>
+        <p>— Hifas Jewellery</p>
+        """,
+    )
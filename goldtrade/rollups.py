@@ -0,0 +1,173 @@
+"""
+Daily staff statistics (DailyStats), maintained as activity settles.
+
+ledger.record() / record_many() pass every booked movement here and the
+User post_save signal reports sign-ups; only real wallets count. The
+day's row is bumped with one
+
+    UPDATE daily_stats SET buys = buys + 1, buy_value = buy_value + :v ...
+
+after the settling transaction commits, so the single hot row of the day
+is locked for one statement instead of for the length of every trade.
+A delta lost between commit and that update (process killed) is
+repaired by `manage.py rebuild_daily_stats`, which recomputes days from
+the ledger.
+
+report() reads one row per day — a few hundred for a year — and never
+aggregates the transaction table.
+"""
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.db import transaction as db_tx
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyStats, LedgerEntry
+
+ZERO = Decimal("0")
+
+STAT_FIELDS = [
+    "buys", "buy_grams", "buy_value", "sells", "sell_grams", "sell_value",
+    "deposits", "deposit_value", "withdrawals", "withdrawal_value",
+    "new_users", "cash_change", "gold_change",
+]
+COUNT_FIELDS = ["buys", "sells", "deposits", "withdrawals", "new_users"]
+
+
+def _deltas(kind, cash, gold, count=1):
+    """Field -> increment for `count` postings of `kind` moving `cash` / `gold` (wallet side)."""
+    deltas = {"cash_change": cash, "gold_change": gold}
+    if kind == "BUY":
+        deltas.update(buys=count, buy_grams=gold, buy_value=-cash)
+    elif kind == "SELL":
+        deltas.update(sells=count, sell_grams=-gold, sell_value=cash)
+    elif kind == "DEPOSIT":
+        deltas.update(deposits=count, deposit_value=cash)
+    elif kind == "WITHDRAW":
+        deltas.update(withdrawals=count, withdrawal_value=-cash)
+    return deltas
+
+
+def _add(day, deltas):
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if DailyStats.objects.filter(day=day).update(**changes):
+        return
+    try:
+        with db_tx.atomic():
+            DailyStats.objects.create(day=day, **deltas)
+    except IntegrityError:
+        # Another process created the day's row first
+        DailyStats.objects.filter(day=day).update(**changes)
+
+
+# =========================
+# Incremental (on settle)
+# =========================
+def record(postings):
+    """
+    Counts movements just booked by the ledger: `postings` is a list of
+    (wallet, kind, cash, gold). Applied once the transaction commits;
+    nothing is counted if it rolls back.
+    """
+    totals = {}
+    for wallet, kind, cash, gold in postings:
+        if wallet.is_demo:
+            continue
+        for field, value in _deltas(kind, Decimal(cash), Decimal(gold)).items():
+            totals[field] = totals.get(field, 0) + value
+    if totals:
+        db_tx.on_commit(partial(_add, timezone.localdate(), totals))
+
+
+def user_joined():
+    db_tx.on_commit(partial(_add, timezone.localdate(), {"new_users": 1}))
+
+
+# =========================
+# Rebuild (manage.py rebuild_daily_stats, backfill migration)
+# =========================
+def recompute(since=None, entry_model=LedgerEntry, user_model=User):
+    """
+    {day: {field: value}} from `since` (a date; default: all time),
+    computed from the wallet legs of the ledger and User.date_joined.
+    """
+    zone = timezone.get_current_timezone()
+    legs = entry_model.objects.filter(account="wallet", wallet__is_demo=False)
+    users = user_model.objects.all()
+    if since is not None:
+        start = timezone.make_aware(datetime.combine(since, time.min))
+        legs = legs.filter(created_at__gte=start)
+        users = users.filter(date_joined__gte=start)
+
+    # (day, kind) -> [postings, cash, gold]; both legs of a trade share a journal
+    moved = defaultdict(lambda: [0, ZERO, ZERO])
+    rows = (
+        legs.annotate(day=TruncDate("created_at", tzinfo=zone))
+        .values("day", "kind", "asset")
+        .annotate(total=Sum("amount"), postings=Count("journal", distinct=True))
+    )
+    for row in rows:
+        entry = moved[row["day"], row["kind"]]
+        entry[0] = max(entry[0], row["postings"])
+        entry[1 if row["asset"] == "CASH" else 2] += row["total"]
+
+    days = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+    for (day, kind), (count, cash, gold) in moved.items():
+        for field, value in _deltas(kind, cash, gold, count).items():
+            days[day][field] += value
+    joined = users.annotate(day=TruncDate("date_joined", tzinfo=zone)).values("day").annotate(count=Count("id"))
+    for row in joined:
+        days[row["day"]]["new_users"] += row["count"]
+    return days
+
+
+def rebuild(since=None, entry_model=LedgerEntry, user_model=User, stats_model=DailyStats):
+    """Overwrites the rows from `since` with recompute(). Returns the number of days written."""
+    days = recompute(since, entry_model, user_model)
+    with db_tx.atomic():
+        stale = stats_model.objects.all()
+        if since is not None:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        stats_model.objects.bulk_create(
+            [stats_model(day=day, **values) for day, values in sorted(days.items())], batch_size=1000
+        )
+    return len(days)
+
+
+# =========================
+# Reports
+# =========================
+PERIODS = {"day": "D", "week": "W-MON", "month": "MS"}
+
+
+def report(start, end, period="day"):
+    """
+    pandas DataFrame of the rollup for [start, end], one row per `period`
+    (day / week / month, labelled by its first day), with every day
+    present, plus the customers' total cash and gold at its close.
+    """
+    import pandas as pd
+
+    rows = DailyStats.objects.filter(day__gte=start, day__lte=end).order_by("day").values("day", *STAT_FIELDS)
+    before = DailyStats.objects.filter(day__lt=start).aggregate(cash=Sum("cash_change"), gold=Sum("gold_change"))
+
+    frame = pd.DataFrame.from_records(list(rows), columns=["day", *STAT_FIELDS])
+    frame["day"] = pd.to_datetime(frame["day"])
+    frame = frame.set_index("day").reindex(pd.date_range(start, end, freq="D"), fill_value=0).astype(float)
+    frame["customer_cash"] = frame["cash_change"].cumsum() + float(before["cash"] or 0)
+    frame["customer_gold"] = frame["gold_change"].cumsum() + float(before["gold"] or 0)
+
+    if period != "day":
+        frame = frame.resample(PERIODS[period], label="left", closed="left").agg(
+            {**{field: "sum" for field in STAT_FIELDS}, "customer_cash": "last", "customer_gold": "last"}
+        )
+    frame.index.name = "day"
+    frame[COUNT_FIELDS] = frame[COUNT_FIELDS].astype(int)
+    return frame.round({"customer_gold": 4, "buy_grams": 4, "sell_grams": 4, "gold_change": 4})
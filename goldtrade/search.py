@@ -0,0 +1,270 @@
+"""
+Staff search across bank deposits, withdrawals and KYC submissions.
+
+Every searchable item has one SearchDocument: its reference number,
+username, email, NIC number, name, phone, bank details and amount
+(as 1500.00 and 1,500.00), lowercased into one text column. The model
+signals (signals.py) write it in the same transaction as the item, and
+rewrite a user's documents when the username or email changes. Status
+is not indexed; results are loaded fresh, so a queryset update of the
+status needs no reindex.
+
+Each search term matches as a substring, like icontains, but from an index:
+
+  PostgreSQL  GIN (text gin_trgm_ops) serves LIKE '%term%'; results are
+              ranked by trigram word similarity to the query
+  SQLite      goldtrade_searchdocument_fts, an FTS5 table with the
+              trigram tokenizer over the documents (kept in step by
+              triggers); results are ranked by bm25
+
+Terms shorter than three characters cannot use a trigram index and fall
+back to a scan of the documents, as does PostgreSQL without pg_trgm
+(ordered newest first). Ties go to the newest item.
+`manage.py rebuild_search_index` rewrites every document.
+"""
+from django.db import DatabaseError, connection
+from django.db import transaction as db_tx
+from django.db.models import Q
+
+from .models import KYC, BankDeposit, SearchDocument, Transaction
+
+LIMIT = 50                 # results per search
+FILTER_LIMIT = 1000        # ids handed to a list page's ?q filter
+FTS_TABLE = "goldtrade_searchdocument_fts"
+
+KINDS = {"deposit": BankDeposit, "withdrawal": Transaction, "kyc": KYC}
+CREATED_FIELDS = {"deposit": "created_at", "withdrawal": "timestamp", "kyc": "submitted_at"}
+# Fields that feed the text: saving only others (e.g. status) needs no reindex
+TEXT_FIELDS = {
+    "deposit": {"reference_no", "amount", "user"},
+    "withdrawal": {"total_amount", "remarks", "wallet"},
+    "kyc": {"full_name", "nic_number", "phone", "user"},
+}
+
+
+def kind_of(instance):
+    if isinstance(instance, BankDeposit):
+        return "deposit"
+    if isinstance(instance, KYC):
+        return "kyc"
+    if isinstance(instance, Transaction) and instance.transaction_type == "WITHDRAW":
+        return "withdrawal"
+    return None
+
+
+def _amount(value):
+    return f"{value:.2f} {value:,.2f}" if value is not None else ""
+
+
+def _text(kind, instance, user):
+    if kind == "deposit":
+        parts = [instance.reference_no, _amount(instance.amount)]
+    elif kind == "withdrawal":
+        parts = [_amount(instance.total_amount), instance.remarks]
+    else:
+        parts = [instance.full_name, instance.nic_number, instance.phone]
+    parts += [user.username, user.email]
+    return " ".join(part for part in parts if part).lower()
+
+
+def _user(kind, instance):
+    return instance.wallet.user if kind == "withdrawal" else instance.user
+
+
+# =========================
+# Indexing (signals, rebuild)
+# =========================
+def index(instance, update_fields=None):
+    """Writes the instance's document inside the caller's transaction."""
+    kind = kind_of(instance)
+    if kind is None or update_fields is not None and not TEXT_FIELDS[kind] & set(update_fields):
+        return
+    user = _user(kind, instance)
+    SearchDocument.objects.update_or_create(
+        kind=kind, object_id=instance.pk,
+        defaults={
+            "user_id": user.pk,
+            "text": _text(kind, instance, user),
+            "created_at": getattr(instance, CREATED_FIELDS[kind]),
+        },
+    )
+
+
+def unindex(instance):
+    kind = kind_of(instance)
+    if kind is not None:
+        SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild(user_ids=None, deposit_model=BankDeposit, transaction_model=Transaction, kyc_model=KYC,
+            document_model=SearchDocument):
+    """Rewrites the documents (of `user_ids`, default all). Returns how many."""
+    sources = [
+        ("deposit", deposit_model.objects.select_related("user"), "user_id"),
+        ("withdrawal", transaction_model.objects.filter(transaction_type="WITHDRAW").select_related("wallet__user"),
+         "wallet__user_id"),
+        ("kyc", kyc_model.objects.select_related("user"), "user_id"),
+    ]
+    written = 0
+    with db_tx.atomic():
+        stale = document_model.objects.all()
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+        for kind, queryset, user_field in sources:
+            if user_ids is not None:
+                queryset = queryset.filter(**{f"{user_field}__in": user_ids})
+            batch = []
+            for instance in queryset.iterator(chunk_size=2000):
+                user = _user(kind, instance)
+                batch.append(document_model(
+                    kind=kind, object_id=instance.pk, user_id=user.pk,
+                    text=_text(kind, instance, user), created_at=getattr(instance, CREATED_FIELDS[kind]),
+                ))
+                if len(batch) == 2000:
+                    written += len(document_model.objects.bulk_create(batch))
+                    batch = []
+            written += len(document_model.objects.bulk_create(batch))
+    return written
+
+
+# =========================
+# Backend indexes (migration 0027)
+# =========================
+def install(schema_editor):
+    """Creates the vendor's text index on goldtrade_searchdocument."""
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        try:
+            with db_tx.atomic(using=schema_editor.connection.alias):
+                schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError:
+            # Server without the contrib modules: search scans instead
+            return
+        schema_editor.execute(
+            "CREATE INDEX search_text_trgm_idx ON goldtrade_searchdocument USING gin (text gin_trgm_ops)"
+        )
+    elif vendor == "sqlite":
+        # External content: the FTS table stores only the index, the
+        # triggers copy each document change into it. SQLite migrations
+        # that alter goldtrade_searchdocument remake the table and lose
+        # the triggers, so such a migration must call uninstall/install.
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"text, content='goldtrade_searchdocument', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(f"""
+            CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON goldtrade_searchdocument BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+            END""")
+        schema_editor.execute(f"""
+            CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON goldtrade_searchdocument BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+            END""")
+        schema_editor.execute(f"""
+            CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON goldtrade_searchdocument BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+                INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+            END""")
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS search_text_trgm_idx")
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+# =========================
+# Searching
+# =========================
+_trigram = {}  # connection alias -> pg_trgm installed
+
+
+def _has_trigram():
+    if connection.alias not in _trigram:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+            _trigram[connection.alias] = cursor.fetchone()[0]
+    return _trigram[connection.alias]
+
+
+def _terms(query):
+    return [term for term in query.lower().split() if term][:8]
+
+
+def _fts_query(terms):
+    # Each term as a quoted string: a substring under the trigram tokenizer
+    return " AND ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def matching_ids(query, kinds=None, limit=LIMIT):
+    """[(kind, object id)] of the best matches for `query`, best first."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    kinds = list(kinds or KINDS)
+    indexed = all(len(term) >= 3 for term in terms)
+
+    if connection.vendor == "sqlite" and indexed:
+        placeholders = ", ".join(["%s"] * len(kinds))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.kind, d.object_id FROM {FTS_TABLE} f "
+                f"JOIN goldtrade_searchdocument d ON d.id = f.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND d.kind IN ({placeholders}) "
+                f"ORDER BY f.rank, d.created_at DESC LIMIT %s",
+                [_fts_query(terms), *kinds, limit],
+            )
+            return cursor.fetchall()
+
+    documents = SearchDocument.objects.filter(*[Q(text__contains=term) for term in terms], kind__in=kinds)
+    if connection.vendor == "postgresql" and _has_trigram():
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        documents = documents.annotate(rank=TrigramWordSimilarity(" ".join(terms), "text"))
+        documents = documents.order_by("-rank", "-created_at")
+    else:
+        documents = documents.order_by("-created_at")
+    return list(documents.values_list("kind", "object_id")[:limit])
+
+
+def ids(kind, query, limit=FILTER_LIMIT):
+    """Ids of the `kind` items matching `query`, for a list page's filter."""
+    return [object_id for _kind, object_id in matching_ids(query, [kind], limit)]
+
+
+class Hit:
+    """One search result: the live item plus what the results page shows."""
+
+    def __init__(self, kind, item):
+        self.kind = kind
+        self.item = item
+        self.user = _user(kind, item)
+        self.status = item.status
+        self.created_at = getattr(item, CREATED_FIELDS[kind])
+        self.amount = None
+        if kind == "deposit":
+            self.amount, self.detail = item.amount, f"Ref {item.reference_no}"
+        elif kind == "withdrawal":
+            self.amount, self.detail = item.total_amount, item.remarks or ""
+        else:
+            self.detail = f"{item.full_name} · NIC {item.nic_number}"
+
+
+def search(query, kinds=None, limit=LIMIT):
+    """Ranked Hits for `query` across the staff queues; one query per kind found."""
+    found = matching_ids(query, kinds, limit)
+    wanted = {}
+    for kind, object_id in found:
+        wanted.setdefault(kind, []).append(object_id)
+    loaded = {}
+    for kind, object_ids in wanted.items():
+        queryset = KINDS[kind].objects.select_related("wallet__user" if kind == "withdrawal" else "user")
+        loaded[kind] = queryset.in_bulk(object_ids)
+    # Skip documents whose item went without a signal (queryset delete)
+    return [Hit(kind, loaded[kind][object_id]) for kind, object_id in found if object_id in loaded[kind]]
@@ -1,27 +1,119 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
+from django.db import transaction as db_tx
 from decimal import Decimal
+from functools import partial
 from django.contrib.auth.models import User
 
-from .models import BankDeposit, Wallet
+from .models import BankDeposit, GoldRate, KYC, Transaction, Wallet
 from .models import UserProfile
+from .rates import current_rate
+from .candles import record_rate
+from . import pending
+from . import account
+from . import images
+from . import ledger
+from . import limit_orders
+from . import rollups
+from . import search
+
+@receiver(post_save, sender=Wallet)
+def book_opening_balance(sender, instance, created, raw=False, **kwargs):
+    # Wallets created with a balance (e.g. the demo grant) get OPENING
+    # entries so the ledger always sums to the materialized balance
+    if created and not raw and (instance.cash_balance or instance.gold_balance):
+        ledger.record_opening(instance)
+
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+@receiver(post_save, sender=KYC)
+@receiver(post_delete, sender=KYC)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def publish_account_state(sender, instance, **kwargs):
+    # request.account copies are keyed by the user's account version
+    account.invalidate_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=GoldRate)
+def publish_gold_rate(sender, instance, created, **kwargs):
+    if created:
+        record_rate(instance)
+        # Queue the rate for the limit-order settler once it is committed
+        db_tx.on_commit(partial(limit_orders.on_new_rate, instance))
+    # Invalidate every worker's cached quote once the new rate is visible
+    db_tx.on_commit(current_rate.invalidate)
+
+
+@receiver(post_init, sender=BankDeposit)
+@receiver(post_init, sender=KYC)
+@receiver(post_init, sender=Transaction)
+def remember_pending(sender, instance, **kwargs):
+    # None when status was deferred (.only() / .defer()): left to reconciliation
+    instance._was_pending = instance.status == "pending" if "status" in instance.__dict__ else None
+
 
 @receiver(post_save, sender=BankDeposit)
-def credit_wallet_on_approval(sender, instance, created, **kwargs):
-    # Only credit when status changes to approved
-    if instance.status == "approved" and not created:
+@receiver(post_save, sender=KYC)
+@receiver(post_save, sender=Transaction)
+def count_pending_queue(sender, instance, created, **kwargs):
+    # Deposits, withdrawals and KYC submissions feed the staff review queue
+    queue = pending.queue_of(instance)
+    if queue is None:
+        return
+    now = instance.status == "pending"
+    was = False if created else instance._was_pending
+    pending.adjust(queue, 0 if was is None else int(now) - int(was))
+    instance._was_pending = now
 
-        wallet, _ = Wallet.objects.get_or_create(user=instance.user, is_demo=False)
 
-        # Prevent double credit
-        if getattr(instance, "_credited", False):
-            return
+@receiver(post_delete, sender=BankDeposit)
+@receiver(post_delete, sender=KYC)
+@receiver(post_delete, sender=Transaction)
+def uncount_pending_queue(sender, instance, **kwargs):
+    queue = pending.queue_of(instance)
+    if queue is not None:
+        pending.adjust(queue, -1 if instance._was_pending else 0)
 
-        wallet.cash_balance += Decimal(instance.amount)
-        wallet.save()
 
-        # Mark so we don't re-credit
-        instance._credited = True
+@receiver(post_save, sender=BankDeposit)
+@receiver(post_save, sender=KYC)
+@receiver(post_save, sender=Transaction)
+def index_for_search(sender, instance, update_fields=None, raw=False, **kwargs):
+    if not raw:
+        search.index(instance, update_fields)
+
+
+@receiver(post_delete, sender=BankDeposit)
+@receiver(post_delete, sender=KYC)
+@receiver(post_delete, sender=Transaction)
+def unindex_for_search(sender, instance, **kwargs):
+    search.unindex(instance)
+
+
+@receiver(post_save, sender=BankDeposit)
+@receiver(post_save, sender=KYC)
+@receiver(post_save, sender=UserProfile)
+def process_uploaded_images(sender, instance, raw=False, **kwargs):
+    # New uploads are cleaned and get display copies and thumbnails off the request, once committed
+    fields = [] if raw else images.stale(instance)
+    if fields:
+        db_tx.on_commit(partial(images.pipeline.submit, sender, instance.pk, fields))
+
+
+@receiver(post_save, sender=User)
+def reindex_user_for_search(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # Username and email are in every document of the user; logins only touch last_login
+    if created or raw or update_fields is not None and not {"username", "email"} & set(update_fields):
+        return
+    search.rebuild(user_ids=[instance.pk])
+
+
+@receiver(post_save, sender=User)
+def count_new_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.user_joined()
 
 
 @receiver(post_save, sender=User)
@@ -43,7 +135,8 @@ def create_demo_wallet(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
-        UserProfile.objects.create(user=instance)
+        # models.create_or_update_profile may have made it already
+        UserProfile.objects.get_or_create(user=instance)
 
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
@@ -0,0 +1,461 @@
+"""
+Per-wallet account statements for a date range: CSV, XLSX and PDF.
+
+Memory stays flat however many transactions the period holds:
+
+  - rows come from one `.iterator(chunk_size=CHUNK_SIZE)` query, so only
+    a chunk of them is in Python at a time;
+  - CSV is encoded and sent a chunk at a time;
+  - XLSX is written with XlsxWriter's constant_memory mode (each row is
+    flushed to disk as it is written) into a temporary file;
+  - PDF is written and sent a page at a time (_PdfWriter).
+
+The XLSX temporary file is then streamed in blocks and deleted on close.
+
+Under ASGI, Django buffers a sync streaming iterator into a list before
+sending it, so stream() hands it an async iterator that pulls one chunk
+at a time from the sync side instead.
+
+Archived transactions (archive.py) are merged in with the live ones.
+Opening and closing balances come from the ledger (ledger.balance_at);
+each row also shows its own cash and gold movement.
+
+build_monthly() pre-generates month-end PDFs into MEDIA_ROOT for
+`manage.py build_statements`; see MonthlyStatement.
+"""
+import csv
+import hashlib
+import heapq
+import io
+import os
+import tempfile
+import zlib
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from . import archive, ledger
+from .models import MonthlyStatement, Transaction, Wallet
+
+CHUNK_SIZE = 2000          # rows per DB fetch and per CSV write
+FILE_BLOCK = 64 * 1024     # bytes per streamed block of an XLSX/PDF file
+ZERO = Decimal("0")
+LAYOUT_VERSION = 1         # bump when the PDF layout changes to rebuild stored statements
+
+COLUMNS = [
+    "Date", "Type", "Status", "Gold (g)", "Rate (LKR/g)", "Amount (LKR)",
+    "Cash change (LKR)", "Gold change (g)", "Remarks",
+]
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+
+def _movement(kind, status, gold, total):
+    """(cash, gold) the transaction moved; pending/rejected withdrawals move nothing."""
+    if kind == "BUY":
+        return -total, gold
+    if kind == "SELL":
+        return total, -gold
+    if kind == "DEPOSIT":
+        return total, ZERO
+    if kind == "WITHDRAW" and status == "approved":
+        return -total, ZERO
+    return ZERO, ZERO
+
+
+class Statement:
+    """
+    A wallet's transactions between two local dates (inclusive). Neither
+    may be the calendar's first or last day: the instant before and the
+    day after must still fit in a datetime.
+    """
+
+    def __init__(self, wallet, start, end):
+        self.wallet = wallet
+        self.start, self.end = start, end
+        self.since = timezone.make_aware(datetime.combine(start, time.min))
+        self.until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        # balance_at is inclusive, so step back past the boundary
+        self.opening = ledger.balance_at(wallet, self.since - timedelta(microseconds=1))
+        self.closing = ledger.balance_at(wallet, self.until - timedelta(microseconds=1))
+
+    @property
+    def title(self):
+        kind = "Demo" if self.wallet.is_demo else "Real"
+        return f"{self.wallet.user.username} – {kind} wallet"
+
+    @property
+    def filename_stem(self):
+        kind = "demo" if self.wallet.is_demo else "real"
+        return f"statement-{self.wallet.user.username}-{kind}-{self.start}-{self.end}"
+
+    def rows(self):
+        """(local datetime, type, status, gold, rate, amount, cash change, gold change, remarks)."""
+        queryset = (
+            Transaction.objects.filter(wallet=self.wallet, timestamp__gte=self.since, timestamp__lt=self.until)
+            .order_by("timestamp", "id")
+            .values_list(
+                "timestamp", "id", "transaction_type", "status", "gold_amount",
+                "price_per_gram", "total_amount", "remarks",
+            )
+        )
+        archived = (
+            (tx.timestamp, tx.id, tx.transaction_type, tx.status, tx.gold_amount,
+             tx.price_per_gram, tx.total_amount, tx.remarks)
+            for tx in archive.transactions(self.wallet.id, self.since, self.until)
+        )
+        zone = timezone.get_current_timezone()
+        merged = heapq.merge(archived, queryset.iterator(chunk_size=CHUNK_SIZE), key=lambda row: row[:2])
+        for stamp, _id, kind, status, gold, rate, total, remarks in merged:
+            cash_change, gold_change = _movement(kind, status, gold, total)
+            yield (
+                stamp.astimezone(zone).replace(tzinfo=None), kind, status, gold, rate, total,
+                cash_change, gold_change, remarks or "",
+            )
+
+    def fingerprint(self):
+        """
+        (digest, transaction count) of everything the statement shows: the
+        opening and closing balances and the period's transactions, so an
+        unchanged digest means an unchanged file.
+        """
+        totals = Transaction.objects.filter(
+            wallet=self.wallet, timestamp__gte=self.since, timestamp__lt=self.until
+        ).aggregate(
+            count=Count("id"), last=Max("id"), cash=Sum("total_amount"), gold=Sum("gold_amount"),
+            pending=Count("id", filter=Q(status="pending")),
+            rejected=Count("id", filter=Q(status="rejected")),
+        )
+        # Archived rows never change, so the spans stand in for them
+        spans = list(
+            archive.spans([self.wallet.id], self.since, self.until, newest_first=False).values_list("id", "rows")
+        )
+        parts = [LAYOUT_VERSION, self.title, self.opening, self.closing, sorted(totals.items()), spans]
+        return hashlib.sha256(repr(parts).encode()).hexdigest(), totals["count"] + sum(rows for _id, rows in spans)
+
+    def summary(self):
+        return [
+            ("Statement", self.title),
+            ("Period", f"{self.start} to {self.end}"),
+            ("Opening cash (LKR)", self.opening["cash"]),
+            ("Opening gold (g)", self.opening["gold"]),
+        ]
+
+    def closing_summary(self):
+        return [
+            ("Closing cash (LKR)", self.closing["cash"]),
+            ("Closing gold (g)", self.closing["gold"]),
+        ]
+
+
+# =========================
+# Renderers (sync generators of bytes)
+# =========================
+def csv_chunks(statement):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    buffer.write("\ufeff")  # so Excel opens it as UTF-8
+    writer.writerows(statement.summary())
+    writer.writerow([])
+    writer.writerow(COLUMNS)
+    yield flush()
+
+    for count, row in enumerate(statement.rows(), 1):
+        writer.writerow([row[0].strftime("%Y-%m-%d %H:%M:%S"), *row[1:]])
+        if count % CHUNK_SIZE == 0:
+            yield flush()
+
+    writer.writerow([])
+    writer.writerows(statement.closing_summary())
+    yield flush()
+
+
+def _file_blocks(handle):
+    try:
+        handle.seek(0)
+        while block := handle.read(FILE_BLOCK):
+            yield block
+    finally:
+        handle.close()
+
+
+def xlsx_chunks(statement):
+    import xlsxwriter
+
+    handle = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(handle, {"constant_memory": True})
+    sheet = workbook.add_worksheet("Statement")
+    bold = workbook.add_format({"bold": True})
+    money = workbook.add_format({"num_format": "#,##0.00"})
+    grams = workbook.add_format({"num_format": "0.0000"})
+    stamp = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm"})
+    formats = [stamp, None, None, grams, money, money, money, grams, None]
+    sheet.set_column(0, 0, 17)
+    sheet.set_column(1, 7, 14)
+    sheet.set_column(8, 8, 40)
+
+    # constant_memory writes rows strictly top to bottom
+    row_no = 0
+    for label, value in statement.summary():
+        sheet.write(row_no, 0, label, bold)
+        sheet.write(row_no, 1, value)
+        row_no += 1
+    row_no += 1
+    sheet.write_row(row_no, 0, COLUMNS, bold)
+    for row in statement.rows():
+        row_no += 1
+        for col, (value, fmt) in enumerate(zip(row, formats)):
+            sheet.write(row_no, col, value, fmt)
+    row_no += 1
+    for label, value in statement.closing_summary():
+        row_no += 1
+        sheet.write(row_no, 0, label, bold)
+        sheet.write(row_no, 1, value)
+    workbook.close()
+    yield from _file_blocks(handle)
+
+
+class _PdfWriter:
+    """
+    Minimal PDF writer that hands out each page's bytes as soon as the page
+    is finished, so nothing of earlier pages stays in memory but their
+    object offsets. (reportlab's canvas keeps every page until save().)
+
+    Only what a statement needs: A4 pages of text in the standard
+    Helvetica fonts. reportlab supplies the font metrics for
+    right-aligned columns.
+    """
+    WIDTH, HEIGHT = 595.27, 841.89  # A4 in points
+    FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+
+    def __init__(self):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        self._string_width = stringWidth
+        self._out = bytearray()
+        self._written = 0
+        self._offsets = {}
+        self._next = 1
+        self._kids = []
+        self._page = []
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._catalog, self._tree = self._reserve(), self._reserve()
+        self._fonts = {
+            name: self._object(
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>".encode()
+            )
+            for name, base in self.FONTS.items()
+        }
+
+    def _write(self, data):
+        self._out += data
+        self._written += len(data)
+
+    def _reserve(self):
+        number, self._next = self._next, self._next + 1
+        return number
+
+    def _object(self, body, number=None):
+        number = number or self._reserve()
+        self._offsets[number] = self._written
+        self._write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        return number
+
+    def text(self, x, y, value, size=8, bold=False, right=False):
+        font = "F2" if bold else "F1"
+        if right:
+            x -= self._string_width(value, self.FONTS[font], size)
+        raw = value.encode("cp1252", "replace")
+        raw = raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+        self._page.append(b"BT /%s %d Tf %.2f %.2f Td (%s) Tj ET" % (font.encode(), size, x, y, raw))
+
+    def end_page(self):
+        """Writes out the current page; returns the bytes ready to send."""
+        content = zlib.compress(b"\n".join(self._page))
+        self._page = []
+        stream = self._object(
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content) + content + b"\nendstream"
+        )
+        fonts = b" ".join(b"/%s %d 0 R" % (name.encode(), num) for name, num in self._fonts.items())
+        self._kids.append(self._object(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Resources << /Font << %s >> >> "
+            b"/Contents %d 0 R >>" % (self._tree, self.WIDTH, self.HEIGHT, fonts, stream)
+        ))
+        return self.drain()
+
+    def close(self):
+        """Page tree, catalog, cross-reference table and trailer."""
+        kids = b" ".join(b"%d 0 R" % kid for kid in self._kids)
+        self._object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._kids)), self._tree)
+        self._object(b"<< /Type /Catalog /Pages %d 0 R >>" % self._tree, self._catalog)
+        xref = self._written
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % self._next)
+        for number in range(1, self._next):
+            self._write(b"%010d 00000 n \n" % self._offsets[number])
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            self._next, self._catalog, xref
+        ))
+        return self.drain()
+
+    def drain(self):
+        data, self._out = bytes(self._out), bytearray()
+        return data
+
+
+PDF_ROWS_PER_PAGE = 50
+PDF_COLUMNS = [  # (x position in points, header, right-aligned)
+    (36, "Date", False), (118, "Type", False), (168, "Status", False),
+    (262, "Gold (g)", True), (332, "Rate", True), (408, "Amount", True),
+    (484, "Cash change", True), (559, "Gold change", True),
+]
+
+
+def pdf_chunks(statement):
+    pdf = _PdfWriter()
+    top = pdf.HEIGHT - 40
+    page = 0
+
+    def start_page():
+        nonlocal page
+        page += 1
+        pdf.text(36, top, statement.title, size=12, bold=True)
+        pdf.text(36, top - 14, f"Period {statement.start} to {statement.end}", size=9)
+        pdf.text(pdf.WIDTH - 36, top - 14, f"Page {page}", size=9, right=True)
+        y = top - 32
+        if page == 1:
+            opening = statement.opening
+            pdf.text(36, y, f"Opening balance: Rs. {opening['cash']:,}  |  {opening['gold']} g", size=9)
+            y -= 16
+        for x, header, right in PDF_COLUMNS:
+            pdf.text(x, y, header, bold=True, right=right)
+        return y - 14
+
+    y = start_page()
+    on_page = 0
+    for row in statement.rows():
+        if on_page == PDF_ROWS_PER_PAGE:
+            yield pdf.end_page()
+            y, on_page = start_page(), 0
+        cells = [
+            row[0].strftime("%Y-%m-%d %H:%M"), row[1], row[2], f"{row[3]:.4f}", f"{row[4]:,.2f}",
+            f"{row[5]:,.2f}", f"{row[6]:,.2f}", f"{row[7]:.4f}",
+        ]
+        for (x, _header, right), value in zip(PDF_COLUMNS, cells):
+            pdf.text(x, y, value, right=right)
+        y -= 14
+        on_page += 1
+
+    closing = statement.closing
+    pdf.text(
+        36, max(y - 10, 40), f"Closing balance: Rs. {closing['cash']:,}  |  {closing['gold']} g",
+        size=9, bold=True,
+    )
+    yield pdf.end_page()
+    yield pdf.close()
+
+
+RENDERERS = {"csv": csv_chunks, "xlsx": xlsx_chunks, "pdf": pdf_chunks}
+
+
+# =========================
+# Streaming
+# =========================
+async def _pull(chunks):
+    # Thread-sensitive: every step runs on the thread that owns the DB connection
+    step = sync_to_async(lambda: next(chunks, None))
+    while (chunk := await step()) is not None:
+        yield chunk
+
+
+def stream(request, chunks):
+    """The iterator to give StreamingHttpResponse for this server type."""
+    return _pull(chunks) if isinstance(request, ASGIRequest) else chunks
+
+
+# =========================
+# Pre-generated monthly statements (manage.py build_statements)
+# =========================
+def month_range(day):
+    """(first, last) day of the month `day` falls in."""
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def _write_pdf(statement):
+    """
+    Renders the statement to MEDIA_ROOT/statements/<YYYY-MM>/<sha256>.pdf.
+    Written under a temporary name and renamed, so a stopped run never
+    leaves a partial file behind the final name. Returns (name, sha256, size).
+    """
+    folder = f"statements/{statement.start:%Y-%m}"
+    directory = os.path.join(settings.MEDIA_ROOT, folder)
+    os.makedirs(directory, exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False) as handle:
+        try:
+            for chunk in pdf_chunks(statement):
+                handle.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        except BaseException:
+            os.unlink(handle.name)
+            raise
+    name = f"{folder}/{digest.hexdigest()}.pdf"
+    os.replace(handle.name, os.path.join(settings.MEDIA_ROOT, name))
+    return name, digest.hexdigest(), size
+
+
+def build_monthly(wallet_ids, month, force=False):
+    """
+    Builds `month`'s statement for each wallet, skipping those whose
+    fingerprint matches the stored statement. Each wallet is saved as soon
+    as it is done, so an interrupted run resumes where it stopped.
+    Returns (built, skipped).
+    """
+    start, end = month_range(month)
+    stored = {
+        record.wallet_id: record
+        for record in MonthlyStatement.objects.filter(wallet_id__in=wallet_ids, month=start)
+    }
+    built = skipped = 0
+    for wallet in Wallet.objects.filter(pk__in=wallet_ids).select_related("user").order_by("pk"):
+        statement = Statement(wallet, start, end)
+        fingerprint, count = statement.fingerprint()
+        record = stored.get(wallet.pk)
+        if (
+            record and not force and record.fingerprint == fingerprint
+            and record.file.storage.exists(record.file.name)
+        ):
+            skipped += 1
+            continue
+
+        name, sha256, size = _write_pdf(statement)
+        values = {
+            "file": name, "sha256": sha256, "size": size, "fingerprint": fingerprint,
+            "transactions": count, "built_at": timezone.now(),
+        }
+        # One autocommit write per wallet; a wallet belongs to exactly one shard
+        if record:
+            MonthlyStatement.objects.filter(pk=record.pk).update(**values)
+            if record.file.name != name:
+                record.file.storage.delete(record.file.name)
+        else:
+            MonthlyStatement.objects.create(wallet=wallet, month=start, **values)
+        built += 1
+    return built, skipped
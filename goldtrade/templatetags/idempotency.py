@@ -0,0 +1,12 @@
+from django import template
+from django.utils.html import format_html
+
+from goldtrade.idempotency import FIELD, new_key
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_field():
+    """Hidden one-time key for a money-moving form (see idempotency.py)."""
+    return format_html('<input type="hidden" name="{}" value="{}">', FIELD, new_key())
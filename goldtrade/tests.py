@@ -1,3 +1,386 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.db import IntegrityError
+from django.db import transaction as db_tx
+from django.db.models import F
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import archive, claims, idempotency, images, ledger, partitions, pending, reviews, rollups
+from .account import Account
+from .archive import ArchivedHistory
+from .ledger import InsufficientFunds
+from .models import BankDeposit, DailyStats, GoldRate, IdempotencyKey, LedgerEntry, Transaction, Wallet
+from .pagination import paginate
+from .rates import current_rate
+
+
+def _customer(username, cash=None):
+    user = User.objects.create(username=username, email=f"{username}@example.com")
+    wallet = Wallet.objects.get(user=user, is_demo=False)
+    if cash is not None:
+        ledger.post(wallet, "DEPOSIT", cash=Decimal(cash), counter="bank")
+    return user, wallet
+
+
+def _messages(response):
+    return [str(message) for message in get_messages(response.wsgi_request)]
+
+
+class DepositReviewTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff", is_staff=True)
+        self.client.force_login(self.staff)
+        self.user, self.wallet = _customer("alice")
+
+    def _deposit(self, amount="1000.00", reference="REF-1", user=None):
+        return BankDeposit.objects.create(
+            user=user or self.user, amount=Decimal(amount), reference_no=reference, slip="bank_slips/slip.png",
+        )
+
+    def test_approving_twice_credits_once(self):
+        deposit = self._deposit()
+        self.client.post(reverse("approve_deposit", args=[deposit.pk]))
+        response = self.client.post(reverse("approve_deposit", args=[deposit.pk]))
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.cash_balance, Decimal("1000.00"))
+        self.assertEqual(Transaction.objects.filter(wallet=self.wallet, transaction_type="DEPOSIT").count(), 1)
+        self.assertIn("⚠️ This deposit is already processed.", _messages(response))
+        self.assertEqual(list(ledger.verify(Wallet.objects.filter(pk=self.wallet.pk))), [])
+
+    def test_saving_an_approved_deposit_does_not_credit(self):
+        deposit = self._deposit()
+        reviews.approve_deposits([deposit.pk], self.staff)
+        deposit.refresh_from_db()
+        deposit.save()
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.cash_balance, Decimal("1000.00"))
+
+    def test_bulk_approve(self):
+        other, other_wallet = _customer("bob")
+        first, second = self._deposit("100.00", "A"), self._deposit("250.50", "B", user=other)
+        done = self._deposit("75.00", "C")
+        done.status = "rejected"
+        done.save()
+
+        response = self.client.post(
+            reverse("bulk_review_deposits"),
+            {"ids": [first.pk, second.pk, done.pk], "action": "approve"},
+        )
+
+        self.assertRedirects(response, reverse("staff_deposits"), fetch_redirect_response=False)
+        self.wallet.refresh_from_db()
+        other_wallet.refresh_from_db()
+        self.assertEqual(self.wallet.cash_balance, Decimal("100.00"))
+        self.assertEqual(other_wallet.cash_balance, Decimal("250.50"))
+        self.assertEqual(
+            set(BankDeposit.objects.filter(pk__in=[first.pk, second.pk]).values_list("status", flat=True)),
+            {"approved"},
+        )
+        self.assertEqual(LedgerEntry.objects.filter(kind="DEPOSIT", account="bank").count(), 2)
+        self.assertIn("⚠️ 1 already processed.", _messages(response))
+
+    def test_bulk_rejects_invalid_ids(self):
+        deposit = self._deposit()
+        response = self.client.post(reverse("bulk_review_deposits"), {"ids": ["abc"], "action": "approve"})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("Invalid selection of deposits.", _messages(response))
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.status, "pending")
+
+    def test_bulk_reports_ids_past_the_batch_limit(self):
+        deposits = [self._deposit("10.00", f"R{i}") for i in range(3)]
+        with mock.patch.object(reviews, "MAX_BATCH", 2):
+            outcome = reviews.approve_deposits([d.pk for d in deposits], self.staff)
+
+        self.assertEqual(len(outcome.settled), 2)
+        self.assertEqual(outcome.truncated, [deposits[2].pk])
+        deposits[2].refresh_from_db()
+        self.assertEqual(deposits[2].status, "pending")
+
+
+class WithdrawalReviewTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff", is_staff=True)
+        self.client.force_login(self.staff)
+
+    def _withdrawal(self, wallet, amount):
+        return Transaction.objects.create(
+            wallet=wallet, transaction_type="WITHDRAW", total_amount=Decimal(amount), status="pending",
+        )
+
+    def test_bulk_approve_leaves_uncovered_withdrawals_pending(self):
+        _, rich = _customer("carol", cash="500.00")
+        _, poor = _customer("dave", cash="20.00")
+        covered, uncovered = self._withdrawal(rich, "200.00"), self._withdrawal(poor, "50.00")
+
+        response = self.client.post(
+            reverse("bulk_review_withdrawals"), {"ids": [covered.pk, uncovered.pk], "action": "approve"},
+        )
+
+        covered.refresh_from_db()
+        uncovered.refresh_from_db()
+        rich.refresh_from_db()
+        poor.refresh_from_db()
+        self.assertEqual((covered.status, covered.processed_by), ("approved", self.staff))
+        self.assertEqual(uncovered.status, "pending")
+        self.assertEqual(rich.cash_balance, Decimal("300.00"))
+        self.assertEqual(poor.cash_balance, Decimal("20.00"))
+        self.assertEqual(list(ledger.verify(Wallet.objects.filter(pk__in=[rich.pk, poor.pk]))), [])
+        self.assertIn("1 left pending: insufficient wallet balance.", _messages(response))
+
+    def test_bulk_reject(self):
+        _, wallet = _customer("erin", cash="100.00")
+        withdrawal = self._withdrawal(wallet, "40.00")
+
+        self.client.post(reverse("bulk_review_withdrawals"), {"ids": [withdrawal.pk], "action": "reject"})
+
+        withdrawal.refresh_from_db()
+        wallet.refresh_from_db()
+        self.assertEqual(withdrawal.status, "rejected")
+        self.assertEqual(wallet.cash_balance, Decimal("100.00"))
+
+
+class ClaimRenewalTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff", is_staff=True)
+        self.client.force_login(self.staff)
+        user, _ = _customer("frank")
+        self.deposit = BankDeposit.objects.create(
+            user=user, amount=Decimal("10.00"), reference_no="R", slip="bank_slips/slip.png",
+        )
+        claims.claim_next("deposits", self.staff)
+        self.deposit.refresh_from_db()
+
+    def test_listing_my_claims_does_not_renew(self):
+        BankDeposit.objects.filter(pk=self.deposit.pk).update(claimed_until=F("claimed_until") - timedelta(minutes=5))
+        before = BankDeposit.objects.get(pk=self.deposit.pk).claimed_until
+
+        self.client.get(reverse("staff_deposits"), {"claimed": "mine"})
+
+        self.assertEqual(BankDeposit.objects.get(pk=self.deposit.pk).claimed_until, before)
+
+    def test_renew_extends_the_lease(self):
+        BankDeposit.objects.filter(pk=self.deposit.pk).update(claimed_until=F("claimed_until") - timedelta(minutes=5))
+        before = BankDeposit.objects.get(pk=self.deposit.pk).claimed_until
+
+        response = self.client.post(reverse("renew_claims", args=["deposits"]))
+
+        self.assertRedirects(response, reverse("staff_deposits") + "?claimed=mine", fetch_redirect_response=False)
+        self.assertGreater(BankDeposit.objects.get(pk=self.deposit.pk).claimed_until, before)
+        self.assertEqual(self.client.get(reverse("renew_claims", args=["deposits"])).status_code, 405)
+
+
+class HistoryFilterTests(TestCase):
+    def setUp(self):
+        self.user, self.wallet = _customer("grace")
+        self.client.force_login(self.user)
+        Transaction.objects.create(wallet=self.wallet, transaction_type="DEPOSIT", total_amount=Decimal("100.00"))
+
+    def test_dates_at_the_calendar_ends_are_ignored(self):
+        for query in ({"to": "9999-12-31"}, {"from": "0001-01-01"}):
+            response = self.client.get(reverse("transactions"), query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["filters"], {})
+            self.assertEqual(len(response.context["transactions"]), 1)
+
+    def test_statement_rejects_dates_at_the_calendar_ends(self):
+        for query in ({"to": "9999-12-31"}, {"from": "0001-01-01"}):
+            response = self.client.get(reverse("statements"), {**query, "format": "csv"})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("The dates must be between 0001-01-02 and 9999-12-30.", _messages(response))
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        _, self.wallet = _customer("henry")
+
+    def test_guarded_move_refuses_an_overdraft(self):
+        ledger.post(self.wallet, "DEPOSIT", cash=Decimal("100.00"), counter="bank")
+        with self.assertRaises(InsufficientFunds), db_tx.atomic():
+            ledger.post(self.wallet, "WITHDRAW", cash=Decimal("-100.01"), counter="bank")
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.cash_balance, Decimal("100.00"))
+        self.assertEqual(LedgerEntry.objects.filter(wallet=self.wallet).count(), 1)
+
+    def test_balance_at_reads_from_the_nearest_checkpoint(self):
+        with mock.patch.object(ledger, "CHECKPOINT_EVERY", 3):
+            for _ in range(4):
+                ledger.post(self.wallet, "DEPOSIT", cash=Decimal("10.00"), counter="bank")
+            middle = timezone.now()
+            for _ in range(3):
+                ledger.post(self.wallet, "BUY", cash=Decimal("-5.00"), gold=Decimal("0.0500"))
+
+        self.assertEqual(self.wallet.ledger_checkpoints.count(), 3)
+        self.assertEqual(ledger.balance_at(self.wallet, middle), {"cash": Decimal("40.00"), "gold": Decimal("0.0000")})
+        self.assertEqual(ledger.balance_at(self.wallet), {"cash": Decimal("25.00"), "gold": Decimal("0.1500")})
+        self.assertEqual(list(ledger.verify(Wallet.objects.filter(pk=self.wallet.pk))), [])
+
+
+class WalletConstraintTests(TestCase):
+    def test_balances_cannot_go_negative(self):
+        _, wallet = _customer("ivan")
+        for field in ("cash_balance", "gold_balance"):
+            with self.assertRaises(IntegrityError), db_tx.atomic():
+                Wallet.objects.filter(pk=wallet.pk).update(**{field: Decimal("-1")})
+
+    def test_one_pending_withdrawal_per_wallet(self):
+        _, wallet = _customer("judy", cash="100.00")
+        Transaction.objects.create(wallet=wallet, transaction_type="WITHDRAW", total_amount=Decimal("10.00"))
+        with self.assertRaises(IntegrityError), db_tx.atomic():
+            Transaction.objects.create(wallet=wallet, transaction_type="WITHDRAW", total_amount=Decimal("20.00"))
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user, self.wallet = _customer("kate", cash="1000.00")
+        self.client.force_login(self.user)
+        GoldRate.objects.create(buy_rate=Decimal("90.00"), sell_rate=Decimal("100.00"))
+        current_rate.invalidate()
+        patcher = mock.patch.object(Account, "kyc_approved", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_a_repeated_key_replays_the_first_outcome(self):
+        data = {"amount": "100.00", idempotency.FIELD: "key-1"}
+        first = self.client.post(reverse("buy_gold"), data)
+        second = self.client.post(reverse("buy_gold"), data)
+
+        self.assertEqual((second.status_code, second["Location"]), (302, reverse("buy_gold")))
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertIn("Bought 1.0000 g of gold.", _messages(second))
+        self.assertEqual(Transaction.objects.filter(wallet=self.wallet, transaction_type="BUY").count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.cash_balance, Decimal("900.00"))
+
+    def test_a_key_still_in_flight_gets_409(self):
+        path = reverse("buy_gold")
+        request = RequestFactory().post(path)
+        request.user = self.user
+        IdempotencyKey.objects.create(key=idempotency._hashed(request, "key-2"), claimed_at=timezone.now())
+
+        response = self.client.post(path, {"amount": "100.00"}, HTTP_IDEMPOTENCY_KEY="key-2")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Transaction.objects.filter(wallet=self.wallet, transaction_type="BUY").exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        _, self.wallet = _customer("liam")
+        start = timezone.now() - timedelta(days=1)
+        # Two rows share a timestamp, so the id has to break the tie
+        for minutes in (0, 1, 1, 2, 3):
+            tx = Transaction.objects.create(wallet=self.wallet, transaction_type="DEPOSIT", status="approved")
+            Transaction.objects.filter(pk=tx.pk).update(timestamp=start + timedelta(minutes=minutes))
+        self.newest_first = list(
+            Transaction.objects.filter(wallet=self.wallet).order_by("-timestamp", "-pk").values_list("pk", flat=True)
+        )
+
+    def _page(self, **params):
+        request = RequestFactory().get("/", params)
+        return paginate(Transaction.objects.filter(wallet=self.wallet), request, "timestamp", page_size=2)
+
+    def test_cursors_visit_every_row_once_each_way(self):
+        page = self._page()
+        self.assertIsNone(page.newer_cursor)
+        older = [tx.pk for tx in page]
+        while page.older_cursor:
+            page = self._page(after=page.older_cursor)
+            older += [tx.pk for tx in page]
+        self.assertEqual(older, self.newest_first)
+
+        newer = [tx.pk for tx in page]
+        while page.newer_cursor:
+            page = self._page(before=page.newer_cursor)
+            newer = [tx.pk for tx in page] + newer
+        self.assertEqual(newer, self.newest_first)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = self.settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        _, self.wallet = _customer("mia")
+
+    def _transaction(self, kind, amount, at=None):
+        tx = Transaction.objects.create(
+            wallet=self.wallet, transaction_type=kind, total_amount=Decimal(amount), status="approved",
+        )
+        if at:
+            Transaction.objects.filter(pk=tx.pk).update(timestamp=at)
+        return tx
+
+    def test_archived_rows_come_back_through_history_pages(self):
+        month = partitions.add_months(archive.cutoff(), -1)
+        old = archive.month_start(month) + timedelta(days=2)
+        archived = [self._transaction("DEPOSIT", amount, old + timedelta(hours=hour))
+                    for hour, amount in enumerate(("10.00", "20.00", "30.00"))]
+        recent = self._transaction("BUY", "5.00")
+
+        stored = archive.archive_month(month)
+
+        self.assertEqual(stored.rows, 3)
+        self.assertEqual(list(Transaction.objects.filter(wallet=self.wallet)), [recent])
+        request = RequestFactory().get("/")
+        page = paginate(
+            Transaction.objects.filter(wallet=self.wallet), request, "timestamp",
+            archived=ArchivedHistory([self.wallet.pk], {}),
+        )
+        self.assertEqual([tx.pk for tx in page], [recent.pk] + [tx.pk for tx in reversed(archived)])
+        self.assertEqual([tx.total_amount for tx in page.items[1:]], [Decimal("30.00"), Decimal("20.00"), Decimal("10.00")])
+        self.assertEqual(ArchivedHistory([self.wallet.pk], {"type": "BUY"}).older(None, 10), [])
+
+
+class DailyStatsTests(TestCase):
+    def test_incremental_counts_match_a_recompute(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            _, wallet = _customer("noah", cash="300.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.post(wallet, "BUY", cash=Decimal("-100.00"), gold=Decimal("1.0000"))
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.post(wallet, "SELL", cash=Decimal("40.00"), gold=Decimal("-0.4000"))
+
+        stored = {
+            row["day"]: {field: row[field] for field in rollups.STAT_FIELDS}
+            for row in DailyStats.objects.values("day", *rollups.STAT_FIELDS)
+        }
+        self.assertEqual(stored, dict(rollups.recompute()))
+
+
+class PendingCountTests(TestCase):
+    def setUp(self):
+        # The slip is not a real file; keep the image pipeline out of it
+        patcher = mock.patch.object(images.pipeline, "submit")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counters_follow_the_review_queue(self):
+        user, _ = _customer("olivia")
+        staff = User.objects.create(username="staff", is_staff=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            deposit = BankDeposit.objects.create(
+                user=user, amount=Decimal("10.00"), reference_no="R", slip="bank_slips/slip.png",
+            )
+        self.assertEqual(pending.pending_counts()["deposits"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reviews.approve_deposits([deposit.pk], staff)
+
+        self.assertEqual(pending.pending_counts()["deposits"], 0)
+        self.assertEqual(pending.reconcile(), {})
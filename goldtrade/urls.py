@@ -10,6 +10,7 @@ from . import views, views_auth
 urlpatterns = [
     # Live notifications
     path("live-notifications/", views.live_notifications, name="live_notifications"),  # ✅ Now works
+    path("live-events/", views.live_events, name="live_events"),
 
     # KYC
     path("kyc/", views.kyc_form, name="kyc_form"),
@@ -41,7 +42,11 @@ urlpatterns = [
     # Gold Trading
     path('buy-gold/', views.buy_gold, name='buy_gold'),
     path('sell-gold/', views.sell_gold, name='sell_gold'),
+    path('limit-orders/', views.my_limit_orders, name='limit_orders'),
+    path('limit-orders/<int:pk>/cancel/', views.cancel_limit_order, name='cancel_limit_order'),
     path('transactions/', views.transactions, name='transactions'),
+    path('statements/', views.account_statement, name='statements'),
+    path('statements/<int:pk>/download/', views.monthly_statement, name='monthly_statement'),
 
     # Rates
     path('update-rate/', views.update_gold_rate, name='update_rate'),
@@ -59,13 +64,22 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     
     # Staff
+    path('staff/search/', views.staff_search, name='staff_search'),
     path('staff/deposits/', views.staff_deposits, name='staff_deposits'),
     path('staff/deposits/<int:pk>/approve/', views.approve_deposit, name='approve_deposit'),
     path('staff/deposits/<int:pk>/reject/', views.reject_deposit, name='reject_deposit'),
+    path('staff/deposits/review/', views.bulk_review_deposits, name='bulk_review_deposits'),
 
     path('staff/withdrawals/', views.staff_withdrawals, name='staff_withdrawals'),
     path('staff/withdrawals/<int:pk>/approve/', views.approve_withdrawal, name='approve_withdrawal'),
     path('staff/withdrawals/<int:pk>/reject/', views.reject_withdrawal, name='reject_withdrawal'),
+    path('staff/withdrawals/review/', views.bulk_review_withdrawals, name='bulk_review_withdrawals'),
+
+    path('staff/queue/<str:queue>/claim/', views.claim_next, name='claim_next'),
+    path('staff/queue/<str:queue>/renew/', views.renew_claims, name='renew_claims'),
+    path('staff/queue/<str:queue>/release/', views.release_claims, name='release_claims'),
+
+    path('staff/reports/', views.staff_reports, name='staff_reports'),
 
     # Admin KYC approval
     path("staff/kyc/", views.kyc_admin_list, name="kyc_admin_list"),
@@ -0,0 +1,39 @@
+"""
+Shared version tokens.
+
+A token names a piece of state that workers keep in process memory
+(the current gold rate, staff queue counts, ...). Writers bump the token
+after commit; readers compare it with the token their copy was built from
+and reload when it moved.
+
+Tokens are random rather than counters, so a token that is lost from the
+shared cache (restart, eviction) can never collide with an old local copy.
+"""
+import uuid
+
+from django.core.cache import caches
+
+
+def _key(name):
+    return f"version:{name}"
+
+
+def get_version(name):
+    """
+    Returns the current token for `name`, creating one if none exists yet.
+    """
+    cache = caches["shared"]
+    token = cache.get(_key(name))
+    if token is None:
+        cache.add(_key(name), uuid.uuid4().hex, None)
+        token = cache.get(_key(name))
+    return token
+
+
+def bump_version(name):
+    """
+    Publishes a new token for `name`; every worker reloads on its next read.
+    """
+    token = uuid.uuid4().hex
+    caches["shared"].set(_key(name), token, None)
+    return token
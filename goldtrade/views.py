@@ -1,4 +1,6 @@
 # goldtrade/views.py
+import io
+from datetime import date
 from decimal import Decimal, ROUND_DOWN
 
 from django.conf import settings
@@ -6,38 +8,49 @@ from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.core.mail import EmailMultiAlternatives, send_mail
-from django.http import JsonResponse
+from django.core.mail import send_mail
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.utils.timezone import localtime, now, timedelta
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.dateparse import parse_date
+from django.utils.timezone import timedelta
 from django.utils import timezone
-from django.views.decorators.cache import cache_page
-from django.db import transaction as db_tx  # alias for clarity
-
-from .models import BankDeposit, GoldRate, Transaction, Wallet, KYC, UserProfile
-
-from .forms import ProfilePictureForm, KYCForm, ProfileUpdateForm
+from django.db.models import Q
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from asgiref.sync import sync_to_async
+
+from .models import BankDeposit, GoldRate, LimitOrder, MonthlyStatement, Transaction, Wallet, KYC, UserProfile
+
+from .forms import BulkReviewForm, ProfilePictureForm, KYCForm, ProfileUpdateForm
+from .rates import current_rate, rates_payload
+from . import claims, intake, limit_orders, portfolio, reviews, rollups, search, statements, wallet_ops
+from .wallet_ops import InsufficientFunds, WithdrawalPending
+from .idempotency import idempotent
+from .notifications import queue_email
+from .archive import ArchivedHistory
+from .pagination import filter_history, paginate
+from . import candles
+from .events import broadcaster, snapshot
+from .pending import pending_counts, pending_version
+
+TX_TYPES = [choice for choice, _label in Transaction.TRANSACTION_TYPES]
+TX_STATUSES = [choice for choice, _label in Transaction._meta.get_field("status").choices]
+DEPOSIT_STATUSES = [choice for choice, _label in BankDeposit.STATUS_CHOICES]
+HELD_MESSAGE = "Claimed by another reviewer; their lease has not run out yet."
 
 # =========================
 # Email Helper
 # =========================
 def notify_user_email(to_email: str, subject: str, html_body: str) -> None:
     """
-    Sends multi-part (HTML + plain-text) email.
-    Fail-safe: never raises to the user path (fail_silently).
+    Sends multi-part (HTML + plain-text) email after the current
+    transaction commits, off the request path (see notifications.py).
+    Fail-safe: never raises to the user path.
     """
-    try:
-        text_body = strip_tags(html_body)
-        msg = EmailMultiAlternatives(
-            subject, text_body, settings.DEFAULT_FROM_EMAIL, [to_email]
-        )
-        msg.attach_alternative(html_body, "text/html")
-        msg.send(fail_silently=True)
-    except Exception:
-        # Intentionally silent: do not break user flows if SMTP has issues.
-        pass
+    queue_email(to_email, subject, html_body)
 
 # =========================
 # Gold Price Helper
@@ -46,15 +59,9 @@ def get_gold_price():
     """
     Returns the latest buy/sell rates as Decimals.
     If none available, returns zeros to protect arithmetic.
+    Served from the per-process cache in rates.py (no DB hit when warm).
     """
-    gold = GoldRate.objects.order_by("-last_updated").first()
-    if gold:
-        return {
-            "buy_rate": Decimal(gold.buy_rate),
-            "sell_rate": Decimal(gold.sell_rate),
-            "last_updated": gold.last_updated,
-        }
-    return {"buy_rate": Decimal("0"), "sell_rate": Decimal("0"), "last_updated": None}
+    return current_rate.get()
 
 # =========================
 # Wallet Helpers (Session)
@@ -67,24 +74,43 @@ def _get_current_mode(request) -> bool:
     return request.session.get("wallet_mode", "real") == "demo"
 
 
-def _ensure_both_wallets(request) -> None:
+def _get_selected_wallet(request):
     """
-    Ensure both demo and real wallets exist for the authenticated user.
-    Idempotent: uses get_or_create.
+    Returns (wallet, is_demo) for the currently selected mode.
+    Served by request.account (see account.py), which also guarantees
+    both wallets exist.
     """
-    Wallet.objects.get_or_create(user=request.user, is_demo=False)
-    Wallet.objects.get_or_create(user=request.user, is_demo=True)
+    return request.account.selected_wallet, request.account.is_demo
 
 
-def _get_selected_wallet(request):
+def _recent_transactions(wallets, per_wallet=5):
     """
-    Returns (wallet, is_demo) for the currently selected mode.
-    Also guarantees both wallets exist.
+    Latest `per_wallet` transactions of each wallet in one query:
+
+        WHERE id IN (SELECT id ... WHERE wallet_id = 1 ORDER BY timestamp DESC LIMIT 5)
+           OR id IN (SELECT id ... WHERE wallet_id = 2 ORDER BY timestamp DESC LIMIT 5)
+
+    Each subquery is a short walk down tx_wallet_recent_idx, so the cost
+    does not grow with a wallet's history (a ROW_NUMBER() window would
+    have to number every row of the partition first).
+    Returns {wallet_id: [Transaction, ...]} newest first.
     """
-    is_demo = _get_current_mode(request)
-    wallet, _ = Wallet.objects.get_or_create(user=request.user, is_demo=is_demo)
-    _ensure_both_wallets(request)
-    return wallet, is_demo
+    newest = Q()
+    for wallet in wallets:
+        newest |= Q(
+            pk__in=Transaction.objects.filter(wallet=wallet)
+            .order_by("-timestamp")
+            .values("pk")[:per_wallet]
+        )
+    recent = {wallet.pk: [] for wallet in wallets}
+    for tx in Transaction.objects.filter(newest).order_by("wallet_id", "-timestamp"):
+        recent[tx.wallet_id].append(tx)
+    return recent
+
+
+def _trade_ops():
+    """Group-commit intake when TRADE_INTAKE is on, else one transaction per trade."""
+    return intake if settings.TRADE_INTAKE else wallet_ops
 
 # =========================
 # Mode Switch
@@ -100,24 +126,23 @@ def switch_wallet(request, mode):
 # =========================
 @login_required
 def dashboard(request):
-    _ensure_both_wallets(request)
-    demo_wallet = Wallet.objects.get(user=request.user, is_demo=True)
-    real_wallet = Wallet.objects.get(user=request.user, is_demo=False)
+    demo_wallet = request.account.demo_wallet
+    real_wallet = request.account.real_wallet
     selected_wallet, is_demo = _get_selected_wallet(request)
-    gold_rate = GoldRate.objects.order_by("-last_updated").first()
+    rates = get_gold_price()
+    recent = _recent_transactions([demo_wallet, real_wallet])
 
     context = {
         "selected_wallet": selected_wallet,
         "is_demo": is_demo,
         "demo_wallet": demo_wallet,
         "real_wallet": real_wallet,
-        "demo_transactions": Transaction.objects.filter(wallet=demo_wallet)
-        .order_by("-timestamp")[:5],
-        "real_transactions": Transaction.objects.filter(wallet=real_wallet)
-        .order_by("-timestamp")[:5],
-        "buy_rate": gold_rate.buy_rate if gold_rate else 0,
-        "sell_rate": gold_rate.sell_rate if gold_rate else 0,
-        "last_updated": gold_rate.last_updated if gold_rate else None,
+        "demo_transactions": recent[demo_wallet.pk],
+        "real_transactions": recent[real_wallet.pk],
+        "buy_rate": rates["buy_rate"],
+        "sell_rate": rates["sell_rate"],
+        "last_updated": rates["last_updated"],
+        "pnl": portfolio.summary(request.account.position(is_demo), rates),
     }
     return render(request, "goldtrade/dashboard.html", context)
 
@@ -125,8 +150,9 @@ def dashboard(request):
 # BUY GOLD
 # =========================
 @login_required
+@idempotent
 def buy_gold(request):
-    if not kyc_required(request.user):
+    if not request.account.kyc_approved:
         messages.error(request, "KYC approval is required to buy gold.")
         return redirect("kyc_form")
     rates = get_gold_price()
@@ -142,6 +168,11 @@ def buy_gold(request):
         if amount <= 0:
             messages.error(request, "Amount must be greater than zero.")
             return redirect("buy_gold")
+
+        if rates["sell_rate"] <= 0:
+            messages.error(request, "Gold rates are not available yet.")
+            return redirect("buy_gold")
+
         # Calculate grams at the current sell rate
         grams = (amount / rates["sell_rate"]).quantize(
             Decimal("0.0001"), rounding=ROUND_DOWN
@@ -152,32 +183,12 @@ def buy_gold(request):
 
         try:
             # --- RACE CONDITION PROTECTION ---
-            with db_tx.atomic():
-                wallet = (
-                    Wallet.objects.select_for_update()
-                    # Use the cached mode to select the wallet under lock
-                    .get(user=request.user, is_demo=is_demo_mode) # <<< USE FIXED VARIABLE
-                )
-
-                if wallet.cash_balance < amount:
-                    messages.error(request, "Insufficient balance!")
-                    return redirect("buy_gold")
-
-                # Perform the state change while the row is locked
-                wallet.cash_balance -= amount
-                wallet.gold_balance += grams
-                wallet.save(update_fields=["cash_balance", "gold_balance"])
-
-                # Persist transaction record within the same atomic block
-                Transaction.objects.create(
-                    wallet=wallet,
-                    transaction_type="BUY",
-                    gold_amount=grams,
-                    price_per_gram=rates["sell_rate"],
-                    total_amount=amount,
-                )
-
+            # The balance check and the debit are one guarded UPDATE
+            wallet = request.account.wallet(is_demo_mode) # <<< USE FIXED VARIABLE
+            _trade_ops().buy(wallet, grams=grams, price=rates["sell_rate"], amount=amount)
             messages.success(request, f"Bought {grams} g of gold.")
+        except InsufficientFunds:
+            messages.error(request, "Insufficient balance!")
         except Exception:
             messages.error(
                 request, "A database error occurred."
@@ -196,12 +207,31 @@ def buy_gold(request):
 # SELL GOLD
 # =========================
 @login_required
+@idempotent
 def sell_gold(request):
-    # ... (omitted boilerplate) ...
+    if not request.account.kyc_approved:
+        messages.error(request, "KYC approval is required to sell gold.")
+        return redirect("kyc_form")
+    rates = get_gold_price()
 
     if request.method == "POST":
-        # ... (validation code) ...
-        
+        # VALIDATE GRAMS
+        try:
+            grams = Decimal(request.POST.get("grams", "0")).quantize(
+                Decimal("0.0001"), rounding=ROUND_DOWN
+            )
+        except Exception:
+            messages.error(request, "Invalid amount.")
+            return redirect("sell_gold")
+
+        if grams <= 0:
+            messages.error(request, "Amount must be greater than zero.")
+            return redirect("sell_gold")
+
+        if rates["buy_rate"] <= 0:
+            messages.error(request, "Gold rates are not available yet.")
+            return redirect("sell_gold")
+
         total = (grams * rates["buy_rate"]).quantize(
             Decimal("0.01"), rounding=ROUND_DOWN
         )
@@ -211,30 +241,12 @@ def sell_gold(request):
 
         try:
             # --- RACE CONDITION PROTECTION ---
-            with db_tx.atomic():
-                wallet = (
-                    Wallet.objects.select_for_update()
-                    # Use the cached mode to select the wallet under lock
-                    .get(user=request.user, is_demo=is_demo_mode) # <<< USE FIXED VARIABLE
-                )
-
-                if wallet.gold_balance < grams:
-                    messages.error(request, "Not enough gold to sell.")
-                    return redirect("sell_gold")
-
-                wallet.gold_balance -= grams
-                wallet.cash_balance += total
-                wallet.save(update_fields=["cash_balance", "gold_balance"])
-
-                Transaction.objects.create(
-                    wallet=wallet,
-                    transaction_type="SELL",
-                    gold_amount=grams,
-                    price_per_gram=rates["buy_rate"],
-                    total_amount=total,
-                )
-
+            # The balance check and the debit are one guarded UPDATE
+            wallet = request.account.wallet(is_demo_mode) # <<< USE FIXED VARIABLE
+            _trade_ops().sell(wallet, grams=grams, price=rates["buy_rate"], total=total)
             messages.success(request, f"Sold {grams} g for {total}")
+        except InsufficientFunds:
+            messages.error(request, "Not enough gold to sell.")
         except Exception:
             messages.error(
                 request, "A database error occurred during the transaction."
@@ -249,12 +261,75 @@ def sell_gold(request):
         {"wallet": wallet, "buy_rate": rates["buy_rate"], "sell_rate": rates["sell_rate"]},
     )
 
+# =========================
+# LIMIT ORDERS
+# =========================
+@login_required
+@idempotent
+def my_limit_orders(request):
+    if not request.account.kyc_approved:
+        messages.error(request, "KYC approval is required to place orders.")
+        return redirect("kyc_form")
+    rates = get_gold_price()
+    wallet, _ = _get_selected_wallet(request)
+
+    if request.method == "POST":
+        side = request.POST.get("side")
+        try:
+            grams = Decimal(request.POST.get("grams", "0")).quantize(
+                Decimal("0.0001"), rounding=ROUND_DOWN
+            )
+            limit_price = Decimal(request.POST.get("limit_price", "0")).quantize(Decimal("0.01"))
+        except Exception:
+            messages.error(request, "Invalid amount.")
+            return redirect("limit_orders")
+
+        if side not in {"BUY", "SELL"} or grams <= 0 or limit_price <= 0:
+            messages.error(request, "Please fill in all fields with valid values.")
+            return redirect("limit_orders")
+
+        # An order the current rate already crosses is a market trade
+        if side == "BUY" and limit_price >= rates["sell_rate"] > 0:
+            messages.error(request, "Limit is at or above the current buy price — use Buy Gold instead.")
+            return redirect("limit_orders")
+        if side == "SELL" and limit_price <= rates["buy_rate"]:
+            messages.error(request, "Limit is at or below the current sell price — use Sell Gold instead.")
+            return redirect("limit_orders")
+
+        limit_orders.place(wallet, side, grams, limit_price)
+        messages.success(request, f"{side.title()} order for {grams} g at Rs. {limit_price:,.2f} placed.")
+        return redirect("limit_orders")
+
+    orders = wallet.limit_orders.select_related("transaction").order_by("-created_at")[:100]
+    return render(
+        request,
+        "goldtrade/limit_orders.html",
+        {
+            "wallet": wallet,
+            "orders": orders,
+            "buy_rate": rates["buy_rate"],
+            "sell_rate": rates["sell_rate"],
+        },
+    )
+
+
+@login_required
+def cancel_limit_order(request, pk):
+    order = get_object_or_404(LimitOrder, pk=pk, wallet__user=request.user)
+    if request.method == "POST":
+        if limit_orders.cancel(order):
+            messages.info(request, "Order cancelled.")
+        else:
+            messages.warning(request, "This order is no longer open.")
+    return redirect("limit_orders")
+
 # =========================
 # ADD MONEY (submit deposit slip)
 # =========================
 @login_required
+@idempotent
 def add_money(request):
-    wallet = Wallet.objects.get(user=request.user, is_demo=False)
+    wallet = request.account.real_wallet
 
     if request.method == "POST":
         raw_amount = request.POST.get("amount")
@@ -294,18 +369,14 @@ def add_money(request):
 # WITHDRAW MONEY (user request)
 # =========================
 @login_required
+@idempotent
 def withdraw_money(request):
     # Require KYC approval
-    if not kyc_required(request.user):
+    if not request.account.kyc_approved:
         messages.error(request, "KYC approval is required before withdrawing money.")
         return redirect("kyc_form")
 
-    # Retrieve wallet safely
-    try:
-        wallet = Wallet.objects.get(user=request.user, is_demo=False)
-    except Wallet.DoesNotExist:
-        messages.error(request, "Wallet not found.")
-        return redirect("dashboard")
+    wallet = request.account.real_wallet
 
     if request.method == "POST":
         # Basic validation
@@ -324,38 +395,21 @@ def withdraw_money(request):
             messages.error(request, "Please fill in all fields with valid values.")
             return redirect("withdraw_money")
 
-        # -------------------------------
-        # ATOMIC BLOCK + LOCKING
-        # -------------------------------
-        try:
-            with db_tx.atomic():
-
-                # 1. LOCK the wallet row
-                locked_wallet = Wallet.objects.select_for_update().get(pk=wallet.pk)
-
-                # 2. Check sufficient balance
-                if amount > locked_wallet.cash_balance:
-                    messages.error(request, "Insufficient wallet balance.")
-                    return redirect("withdraw_money")
-
-                # 3. Pending withdrawal guard
-                if Transaction.objects.filter(
-                    wallet=locked_wallet,
-                    transaction_type="WITHDRAW",
-                    status="pending"
-                ).exists():
-                    messages.warning(request, "You already have a pending withdrawal request.")
-                    return redirect("transactions")
-
-                # 4. Create pending withdrawal (DEDUCTION happens on admin approval)
-                tx = Transaction.objects.create(
-                    wallet=locked_wallet,
-                    transaction_type="WITHDRAW",
-                    total_amount=amount,
-                    remarks=f"{bank_name} - {branch} | {account_name} ({account_number})",
-                    status="pending",
-                )
+        # Early feedback only; the debit itself is guarded on approval
+        if amount > wallet.cash_balance:
+            messages.error(request, "Insufficient wallet balance.")
+            return redirect("withdraw_money")
 
+        # Create pending withdrawal (DEDUCTION happens on admin approval)
+        try:
+            tx = wallet_ops.request_withdrawal(
+                wallet,
+                amount,
+                remarks=f"{bank_name} - {branch} | {account_name} ({account_number})",
+            )
+        except WithdrawalPending:
+            messages.warning(request, "You already have a pending withdrawal request.")
+            return redirect("transactions")
         except Exception:
             messages.error(request, "A temporary error occurred. Please try again.")
             return redirect("withdraw_money")
@@ -398,43 +452,178 @@ def withdraw_confirm(request, tx_id):
 @login_required
 def transactions(request):
     wallet, _is_demo = _get_selected_wallet(request)
-    tx = Transaction.objects.filter(wallet=wallet).order_by("-timestamp")
-    return render(request, "goldtrade/transactions.html", {"transactions": tx})
+    tx, filters = filter_history(
+        Transaction.objects.filter(wallet=wallet), request, "timestamp",
+        statuses=TX_STATUSES, types=TX_TYPES,
+    )
+    archived = ArchivedHistory([wallet.id], filters)
+    return render(request, "goldtrade/transactions.html", {
+        "transactions": paginate(tx, request, "timestamp", archived=archived),
+        "filters": filters,
+        "types": TX_TYPES,
+        "statuses": TX_STATUSES,
+    })
+
+# =========================
+# Statements (CSV / XLSX / PDF)
+# =========================
+def _statement_day(request, name, default):
+    try:
+        return parse_date(request.GET.get(name, "")) or default
+    except ValueError:
+        return default
+
+
+@login_required
+def account_statement(request):
+    """Statement form; with ?format=csv|xlsx|pdf streams the statement file."""
+    today = timezone.localdate()
+    start = _statement_day(request, "from", today.replace(day=1))
+    end = _statement_day(request, "to", today)
+    is_demo = request.GET.get("wallet", "demo" if _get_current_mode(request) else "real") == "demo"
+    fmt = request.GET.get("format")
+
+    if fmt in statements.RENDERERS and start > end:
+        messages.error(request, "The start date must be on or before the end date.")
+    elif fmt in statements.RENDERERS and not (date.min < start and end < date.max):
+        messages.error(request, "The dates must be between 0001-01-02 and 9999-12-30.")
+    elif fmt in statements.RENDERERS:
+        statement = statements.Statement(request.account.wallet(is_demo), start, end)
+        response = StreamingHttpResponse(
+            statements.stream(request, statements.RENDERERS[fmt](statement)),
+            content_type=statements.CONTENT_TYPES[fmt],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{statement.filename_stem}.{fmt}"'
+        return response
+
+    monthly = MonthlyStatement.objects.filter(wallet=request.account.real_wallet).order_by("-month")[:24]
+    return render(request, "goldtrade/reports.html", {
+        "start": start, "end": end, "is_demo": is_demo, "monthly": monthly,
+    })
+
+
+@login_required
+def monthly_statement(request, pk):
+    """A pre-generated month-end PDF (manage.py build_statements) of the user's own wallet."""
+    record = get_object_or_404(MonthlyStatement, pk=pk, wallet__user=request.user)
+    return FileResponse(
+        record.file.open("rb"),
+        as_attachment=True,
+        filename=f"statement-{request.user.username}-{record.month:%Y-%m}.pdf",
+        content_type="application/pdf",
+    )
+
+# =========================
+# Staff: Reports (daily rollup)
+# =========================
+REPORT_RANGES = {"30d": 30, "90d": 90, "1y": 365, "3y": 3 * 365}
+
+
+@staff_member_required
+def staff_reports(request):
+    """Charts and CSV/XLSX export of the DailyStats rollup; never touches the transaction table."""
+    range_key = request.GET.get("range", "90d")
+    if range_key not in REPORT_RANGES:
+        range_key = "90d"
+    period = request.GET.get("period", "day")
+    if period not in rollups.PERIODS:
+        period = "day"
+    end = timezone.localdate()
+    start = end - timedelta(days=REPORT_RANGES[range_key] - 1)
+    frame = rollups.report(start, end, period)
+
+    export = request.GET.get("export")
+    if export in ("csv", "xlsx"):
+        stem = f"gold-trade-{period}-{start}-{end}"
+        if export == "csv":
+            response = HttpResponse(frame.to_csv(date_format="%Y-%m-%d"), content_type="text/csv; charset=utf-8")
+        else:
+            buffer = io.BytesIO()
+            frame.to_excel(buffer, sheet_name="Report", engine="xlsxwriter")
+            response = HttpResponse(buffer.getvalue(), content_type=statements.CONTENT_TYPES["xlsx"])
+        response["Content-Disposition"] = f'attachment; filename="{stem}.{export}"'
+        return response
+
+    totals = frame[[f for f in rollups.STAT_FIELDS if f not in ("cash_change", "gold_change")]].sum()
+    chart = {
+        "labels": [day.strftime("%Y-%m-%d") for day in frame.index],
+        **{column: frame[column].tolist() for column in (
+            "buy_value", "sell_value", "deposit_value", "withdrawal_value",
+            "buy_grams", "sell_grams", "new_users", "customer_cash", "customer_gold",
+        )},
+    }
+    return render(request, "goldtrade/staff_reports.html", {
+        "range_key": range_key,
+        "ranges": REPORT_RANGES,
+        "period": period,
+        "periods": rollups.PERIODS,
+        "totals": totals.to_dict(),
+        "holdings": frame[["customer_cash", "customer_gold"]].iloc[-1].to_dict(),
+        "rows": frame.iloc[::-1].reset_index().to_dict("records"),
+        "chart": chart,
+    })
 
 # =========================
 # Rates: Refresh + History
 # =========================
-@cache_page(60)
+# Polling endpoints answer If-None-Match / If-Modified-Since from the
+# shared version tokens alone, so an unchanged poll is a 304 with no ORM
+# work or serialization. no-cache makes browsers revalidate every time.
+
+def _rate_etag(request):
+    return current_rate.version()
+
+
+def _rate_last_modified(request):
+    return get_gold_price()["last_updated"]
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=_rate_etag, last_modified_func=_rate_last_modified)
 def refresh_rates(request):
+    return JsonResponse(rates_payload())
+
+
+def _history_params(request):
+    range_key = request.GET.get("range", "30d")
+    if range_key not in candles.HISTORY_RANGES:
+        range_key = "30d"
+
+    resolution = request.GET.get("resolution", "auto")
+
     try:
-        gold = GoldRate.objects.latest("last_updated")
-        data = {
-            "buy_rate": float(gold.buy_rate),
-            "sell_rate": float(gold.sell_rate),
-            "last_updated": localtime(gold.last_updated).strftime("%Y-%m-%d %H:%M"),
-        }
-    except GoldRate.DoesNotExist:
-        data = {"buy_rate": 0, "sell_rate": 0, "last_updated": None}
-    return JsonResponse(data)
+        max_points = int(request.GET.get("max_points", candles.DEFAULT_MAX_POINTS))
+    except ValueError:
+        max_points = candles.DEFAULT_MAX_POINTS
+    max_points = max(3, min(max_points, candles.MAX_POINTS_LIMIT))
+
+    return range_key, resolution, max_points
+
 
+def _history_etag(request):
+    range_key, resolution, max_points = _history_params(request)
+    # The window start is part of the tag: the series also changes when
+    # old buckets slide out of the range, not only on new rates.
+    resolution, since = candles.window(range_key, resolution)
+    start = int(since.timestamp()) if since else 0
+    return f"{current_rate.version()}-{range_key}-{resolution}-{max_points}-{start}"
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=_history_etag, last_modified_func=_rate_last_modified)
 def gold_price_history(request):
-    last_30_days = now() - timedelta(days=30)
-    history = GoldRate.objects.filter(
-        last_updated__gte=last_30_days
-    ).order_by("last_updated")
-    data = {
-        "timestamps": [g.last_updated.isoformat() for g in history],
-        "buy_rates": [float(g.buy_rate) for g in history],
-        "sell_rates": [float(g.sell_rate) for g in history],
-    }
-    return JsonResponse(data)
+    """
+    Chart series from the OHLC candles.
+    ?range=1d|7d|30d|90d|1y|all  ?resolution=auto|minute|hour|day  ?max_points=N
+    """
+    return JsonResponse(candles.history(*_history_params(request)))
 
 # =========================
 # Staff: Update Gold Rate
 # =========================
 @user_passes_test(lambda u: u.is_staff)
 def update_gold_rate(request):
-    latest = GoldRate.objects.order_by("-last_updated").first()
+    latest = get_gold_price()
 
     if request.method == "POST":
         try:
@@ -456,9 +645,9 @@ def update_gold_rate(request):
         request,
         "goldtrade/update_rate.html",
         {
-            "buy_rate": latest.buy_rate if latest else 0,
-            "sell_rate": latest.sell_rate if latest else 0,
-            "last_updated": latest.last_updated if latest else None,
+            "buy_rate": latest["buy_rate"],
+            "sell_rate": latest["sell_rate"],
+            "last_updated": latest["last_updated"],
         },
     )
 
@@ -467,11 +656,16 @@ def update_gold_rate(request):
 # =========================
 @login_required
 def my_deposits(request):
-    deposits = BankDeposit.objects.filter(user=request.user).order_by("-created_at")
-    wallet, _is_demo = _get_selected_wallet(request)
-    return render(
-        request, "goldtrade/my_deposits.html", {"deposits": deposits, "wallet": wallet}
+    deposits, filters = filter_history(
+        BankDeposit.objects.filter(user=request.user), request, "created_at", statuses=DEPOSIT_STATUSES
     )
+    wallet, _is_demo = _get_selected_wallet(request)
+    return render(request, "goldtrade/my_deposits.html", {
+        "deposits": paginate(deposits, request, "created_at"),
+        "wallet": wallet,
+        "filters": filters,
+        "statuses": DEPOSIT_STATUSES,
+    })
 
 # =========================
 # Staff: Deposits list
@@ -479,28 +673,50 @@ def my_deposits(request):
 @staff_member_required
 def staff_deposits(request):
     q = request.GET.get("q", "").strip()
-    qs = BankDeposit.objects.select_related("user").order_by("-created_at")
+    qs = BankDeposit.objects.select_related("user", "claimed_by")
     if q:
-        qs = qs.filter(reference_no__icontains=q)
-    status = request.GET.get("status")
-    if status in {"pending", "approved", "rejected"}:
-        qs = qs.filter(status=status)
-    return render(
-        request, "goldtrade/staff_deposits.html", {"deposits": qs, "q": q, "status": status}
-    )
+        qs = qs.filter(pk__in=search.ids("deposit", q))
+    qs, claimed = _claim_filter(qs, request, "deposits")
+    qs, filters = filter_history(qs, request, "created_at", statuses=DEPOSIT_STATUSES)
+    return render(request, "goldtrade/staff_deposits.html", {
+        "deposits": paginate(qs, request, "created_at"),
+        "q": q,
+        "status": filters.get("status"),
+        "filters": filters,
+        "claimed": claimed,
+        "now": timezone.now(),
+    })
+
+# =========================
+# Staff: Search (deposits, withdrawals, KYC)
+# =========================
+@staff_member_required
+def staff_search(request):
+    q = request.GET.get("q", "").strip()
+    kind = request.GET.get("kind", "")
+    kinds = [kind] if kind in search.KINDS else None
+    return render(request, "goldtrade/staff_search.html", {
+        "q": q,
+        "kind": kind,
+        "kinds": search.KINDS,
+        "hits": search.search(q, kinds) if q else [],
+    })
 
 # =========================
 # My Withdrawals (user)
 # =========================
 @login_required
 def my_withdrawals(request):
-    withdrawals = Transaction.objects.filter(
-        wallet__user=request.user,
-        transaction_type="WITHDRAW"
-    ).order_by("-timestamp")
-
+    withdrawals, filters = filter_history(
+        Transaction.objects.filter(wallet__user=request.user, transaction_type="WITHDRAW"),
+        request, "timestamp", statuses=TX_STATUSES,
+    )
+    wallet_ids = Wallet.objects.filter(user=request.user).values_list("id", flat=True)
+    archived = ArchivedHistory(wallet_ids, filters, transaction_type="WITHDRAW")
     return render(request, "goldtrade/my_withdrawals.html", {
-        "withdrawals": withdrawals
+        "withdrawals": paginate(withdrawals, request, "timestamp", archived=archived),
+        "filters": filters,
+        "statuses": TX_STATUSES,
     })
 
 # =========================
@@ -509,206 +725,240 @@ def my_withdrawals(request):
 @staff_member_required
 def staff_withdrawals(request):
     q = request.GET.get("q", "").strip()
-    qs = (
-        Transaction.objects.filter(transaction_type="WITHDRAW")
-        .select_related("wallet__user")
-        .order_by("-timestamp")
-    )
+    qs = Transaction.objects.filter(transaction_type="WITHDRAW").select_related("wallet__user", "claimed_by")
     if q:
-        qs = qs.filter(wallet__user__username__icontains=q)
-    status = request.GET.get("status")
-    if status in {"pending", "approved", "rejected"}:
-        qs = qs.filter(status=status)
-    return render(
-        request,
-        "goldtrade/staff_withdrawals.html",
-        {"withdrawals": qs, "q": q, "status": status},
-    )
+        qs = qs.filter(pk__in=search.ids("withdrawal", q))
+    qs, claimed = _claim_filter(qs, request, "withdrawals")
+    qs, filters = filter_history(qs, request, "timestamp", statuses=TX_STATUSES)
+    return render(request, "goldtrade/staff_withdrawals.html", {
+        "withdrawals": paginate(qs, request, "timestamp"),
+        "q": q,
+        "status": filters.get("status"),
+        "filters": filters,
+        "claimed": claimed,
+        "now": timezone.now(),
+    })
 
 # =========================
-# Staff: Approve Withdrawal
+# Staff: Bulk review helpers
 # =========================
-@staff_member_required
-@db_tx.atomic
-def approve_withdrawal(request, pk):
-    # --- RACE CONDITION PROTECTION ---
-    # Lock order: (1) withdrawal transaction row, (2) wallet row.
-    # Consistent lock order prevents deadlocks if multiple admins process in parallel.
+TRUNCATED_MESSAGE = f"{{}} not processed: at most {reviews.MAX_BATCH} per batch, submit them again."
 
-    # 1) Lock the transaction row for update.
-    tx = get_object_or_404(
-        Transaction.objects.select_for_update(), id=pk, transaction_type="WITHDRAW"
-    )
 
-    if tx.status != "pending":
-        messages.warning(request, "Already processed.")
-        return redirect("staff_withdrawals")
+def _bulk_review_error(form, rows):
+    if form.has_error("ids", "invalid"):
+        return f"Invalid selection of {rows}."
+    return f"Select {rows} and an action."
 
-    # 2) Lock the associated wallet row for update.
-    wallet = Wallet.objects.select_for_update().get(pk=tx.wallet.pk)
-
-    # Ensure sufficient funds at the exact approval moment.
-    if wallet.cash_balance < tx.total_amount:
+# =========================
+# Staff: Approve / Reject Withdrawal
+# =========================
+# Lock order for every review (see reviews.py): (1) the pending rows in
+# id order, (2) the wallet rows in id order.
+@staff_member_required
+def approve_withdrawal(request, pk):
+    get_object_or_404(Transaction, id=pk, transaction_type="WITHDRAW")
+    outcome = reviews.approve_withdrawals([pk], request.user)
+    if outcome.refused:
         messages.error(request, "User wallet has insufficient balance.")
-        return redirect("staff_withdrawals")
-
-    # Deduct and finalize while both rows are locked inside the same transaction.
-    wallet.cash_balance -= tx.total_amount
-    wallet.save(update_fields=["cash_balance"])
-
-    tx.status = "approved"
-    tx.processed_by = request.user
-    tx.save(update_fields=["status", "processed_by"])
-
-    # Email notify user
-    user = wallet.user
-    if user.email:
-        html = render_to_string(
-            "emails/withdrawal_approved.html",
-            {
-                "username": user.username,
-                "amount": tx.total_amount,
-                "bank_details": tx.remarks,
-                "date": localtime(tx.timestamp).strftime("%Y-%m-%d %H:%M"),
-                "site_url": "https://hifas-jewellery.onrender.com",
-                "year": now().year,
-            },
+    elif outcome.held:
+        messages.warning(request, HELD_MESSAGE)
+    elif not outcome.settled:
+        messages.warning(request, "Already processed.")
+    else:
+        tx = outcome.settled[0]
+        messages.success(
+            request, f"Withdrawal of Rs. {tx.total_amount:,.2f} approved ✅"
         )
-        notify_user_email(user.email, "Withdrawal Approved – Hifas Jewellery", html)
-
-    messages.success(
-        request, f"Withdrawal of Rs. {tx.total_amount:,.2f} approved ✅"
-    )
     return redirect("staff_withdrawals")
 
-# =========================
-# Staff: Reject Withdrawal
-# =========================
+
 @staff_member_required
 def reject_withdrawal(request, pk):
-    tx = get_object_or_404(Transaction, id=pk, transaction_type="WITHDRAW")
-    if tx.status != "pending":
-        messages.warning(request, "Already processed.")
+    get_object_or_404(Transaction, id=pk, transaction_type="WITHDRAW")
+    outcome = reviews.reject_withdrawals([pk], request.user)
+    if not outcome.settled:
+        messages.warning(request, HELD_MESSAGE if outcome.held else "Already processed.")
         return redirect("staff_withdrawals")
 
-    tx.status = "rejected"
-    tx.processed_by = request.user
-    tx.save(update_fields=["status", "processed_by"])
+    messages.info(request, "Withdrawal rejected ❌")
+    return redirect("staff_withdrawals")
 
-    user = tx.wallet.user
-    if user.email:
-        subject = "Withdrawal Rejected – Hifas Jewellery"
-        html = f"""
-        <p>Hi {user.username},</p>
-        <p>Your withdrawal request has been <b>rejected</b>.</p>
-        <p><b>Amount:</b> Rs. {tx.total_amount:,.2f}<br>
-           <b>Requested on:</b> {tx.timestamp.strftime('%Y-%m-%d %H:%M')}<br>
-           <b>Bank Details:</b> {tx.remarks or '—'}</p>
-        <p>If you believe this is an error, please reply to this email.</p>
-        <p>— Hifas Jewellery</p>
-        """
-        notify_user_email(user.email, subject, html)
 
-    messages.info(request, "Withdrawal rejected ❌")
+@staff_member_required
+@require_POST
+def bulk_review_withdrawals(request):
+    form = BulkReviewForm(request.POST)
+    if not form.is_valid():
+        messages.warning(request, _bulk_review_error(form, "withdrawals"))
+        return redirect("staff_withdrawals")
+
+    action = form.cleaned_data["action"]
+    review = reviews.approve_withdrawals if action == "approve" else reviews.reject_withdrawals
+    outcome = review(form.cleaned_data["ids"], request.user)
+    if outcome.settled:
+        verb = "approved ✅" if action == "approve" else "rejected ❌"
+        messages.success(request, f"{len(outcome.settled)} withdrawal(s) {verb}")
+    if outcome.refused:
+        messages.error(request, f"{len(outcome.refused)} left pending: insufficient wallet balance.")
+    if outcome.held:
+        messages.warning(request, f"{len(outcome.held)} held by another reviewer.")
+    if outcome.skipped:
+        messages.warning(request, f"{len(outcome.skipped)} already processed.")
+    if outcome.truncated:
+        messages.warning(request, TRUNCATED_MESSAGE.format(len(outcome.truncated)))
     return redirect("staff_withdrawals")
 
 # =========================
-# Staff: Approve Deposit
+# Staff: Approve / Reject Deposit
 # =========================
 @staff_member_required
-@db_tx.atomic
 def approve_deposit(request, pk):
-    # --- RACE CONDITION PROTECTION ---
-    # Lock order: (1) deposit row, (2) wallet row.
-    deposit = get_object_or_404(BankDeposit.objects.select_for_update(), id=pk)
-
-    if deposit.status != "pending":
-        messages.warning(request, "⚠️ This deposit is already processed.")
+    get_object_or_404(BankDeposit, id=pk)
+    outcome = reviews.approve_deposits([pk], request.user)
+    if not outcome.settled:
+        messages.warning(request, HELD_MESSAGE if outcome.held else "⚠️ This deposit is already processed.")
         return redirect("staff_deposits")
 
-    wallet = Wallet.objects.select_for_update().get(user=deposit.user, is_demo=False)
+    deposit = outcome.settled[0]
+    messages.success(
+        request, f"✅ Deposit approved. Rs. {deposit.amount:,.2f} credited to {deposit.user.username}."
+    )
+    return redirect("staff_deposits")
 
-    # Credit funds while locked and within the same transaction
-    wallet.cash_balance += Decimal(deposit.amount)
-    wallet.save(update_fields=["cash_balance"])
 
-    # Record the accounting transaction
-    Transaction.objects.create(
-        wallet=wallet,
-        transaction_type="DEPOSIT",
-        total_amount=deposit.amount,
-        remarks=f"Bank deposit ref: {deposit.reference_no}",
-        status="approved",
-    )
+@staff_member_required
+def reject_deposit(request, pk):
+    get_object_or_404(BankDeposit, id=pk)
+    outcome = reviews.reject_deposits([pk], request.user)
+    if not outcome.settled:
+        messages.warning(request, HELD_MESSAGE if outcome.held else "⚠️ This deposit has already been processed.")
+        return redirect("staff_deposits")
 
-    # Mark deposit approved
-    deposit.status = "approved"
-    deposit.save(update_fields=["status"])
+    messages.info(request, "❌ Deposit rejected.")
+    return redirect("staff_deposits")
 
-    # Email notify user
-    if deposit.user.email:
-        html = render_to_string(
-            "emails/deposit_approved.html",
-            {
-                "username": deposit.user.username,
-                "amount": f"{deposit.amount:,.2f}",
-                "reference_no": deposit.reference_no,
-                "date": localtime(deposit.created_at).strftime("%Y-%m-%d %H:%M"),
-                "site_url": "https://hifas-jewellery.onrender.com",
-                "year": now().year,
-            },
-        )
-        notify_user_email(deposit.user.email, "Deposit Approved – Hifas Jewellery", html)
 
-    messages.success(
-        request, f"✅ Deposit approved. Rs. {deposit.amount:,.2f} credited to {deposit.user.username}."
-    )
+@staff_member_required
+@require_POST
+def bulk_review_deposits(request):
+    form = BulkReviewForm(request.POST)
+    if not form.is_valid():
+        messages.warning(request, _bulk_review_error(form, "deposits"))
+        return redirect("staff_deposits")
+
+    action = form.cleaned_data["action"]
+    review = reviews.approve_deposits if action == "approve" else reviews.reject_deposits
+    outcome = review(form.cleaned_data["ids"], request.user)
+    if outcome.settled:
+        if action == "approve":
+            total = sum(deposit.amount for deposit in outcome.settled)
+            messages.success(
+                request, f"✅ {len(outcome.settled)} deposit(s) approved, Rs. {total:,.2f} credited."
+            )
+        else:
+            messages.info(request, f"❌ {len(outcome.settled)} deposit(s) rejected.")
+    if outcome.held:
+        messages.warning(request, f"⚠️ {len(outcome.held)} held by another reviewer.")
+    if outcome.skipped:
+        messages.warning(request, f"⚠️ {len(outcome.skipped)} already processed.")
+    if outcome.truncated:
+        messages.warning(request, "⚠️ " + TRUNCATED_MESSAGE.format(len(outcome.truncated)))
     return redirect("staff_deposits")
 
 # =========================
-# Staff: Reject Deposit
+# Staff: Review queue claims (see claims.py)
 # =========================
+QUEUE_PAGES = {"deposits": "staff_deposits", "withdrawals": "staff_withdrawals", "kyc": "kyc_admin_list"}
+
+
+def _claim_filter(queryset, request, queue):
+    """Applies ?claimed=mine or ?claimed=free."""
+    claimed = request.GET.get("claimed", "")
+    if claimed == "mine":
+        queryset = queryset.filter(claims.held_by(request.user), status="pending")
+    elif claimed == "free":
+        queryset = queryset.filter(claims.free(), status="pending")
+    else:
+        claimed = ""
+    return queryset, claimed
+
+
 @staff_member_required
-def reject_deposit(request, pk):
-    deposit = get_object_or_404(BankDeposit, id=pk)
+@require_POST
+def claim_next(request, queue):
+    if queue not in claims.QUEUES:
+        raise Http404
+    if queue == "kyc":
+        ids = claims.claim_next(queue, request.user, count=1)
+        if ids:
+            return redirect("kyc_admin_review", pk=ids[0])
+    else:
+        ids = claims.claim_next(queue, request.user)
+        if ids:
+            minutes = int(claims.LEASE.total_seconds() // 60)
+            messages.success(request, f"Claimed {len(ids)} item(s) for {minutes} minutes.")
+            return redirect(f"{reverse(QUEUE_PAGES[queue])}?claimed=mine")
+    messages.info(request, "Nothing left to claim.")
+    return redirect(QUEUE_PAGES[queue])
 
-    if deposit.status != "pending":
-        messages.warning(request, "⚠️ This deposit has already been processed.")
-        return redirect("staff_deposits")
 
-    deposit.status = "rejected"
-    deposit.save(update_fields=["status"])
+@staff_member_required
+@require_POST
+def renew_claims(request, queue):
+    if queue not in claims.QUEUES:
+        raise Http404
+    renewed = claims.renew(queue, request.user)
+    minutes = int(claims.LEASE.total_seconds() // 60)
+    messages.info(request, f"Renewed {renewed} claim(s) for {minutes} minutes.")
+    nxt = request.POST.get("next", "")
+    if url_has_allowed_host_and_scheme(nxt, allowed_hosts={request.get_host()}):
+        return redirect(nxt)
+    return redirect(f"{reverse(QUEUE_PAGES[queue])}?claimed=mine")
 
-    if deposit.user.email:
-        notify_user_email(
-            deposit.user.email,
-            "Deposit Rejected – Hifas Jewellery",
-            f"""
-            <p>Hi {deposit.user.username},</p>
-            <p>Your bank deposit (Ref: {deposit.reference_no}) has been <b>rejected</b>.</p>
-            <p>Amount: Rs. {deposit.amount:,.2f}</p>
-            <p>If you believe this is an error, please contact support.</p>
-            <p>— Hifas Jewellery</p>
-            """,
-        )
 
-    messages.info(request, "❌ Deposit rejected.")
-    return redirect("staff_deposits")
+@staff_member_required
+@require_POST
+def release_claims(request, queue):
+    if queue not in claims.QUEUES:
+        raise Http404
+    released = claims.release(queue, request.user)
+    messages.info(request, f"Released {released} claim(s).")
+    return redirect(QUEUE_PAGES[queue])
 
 # =========================
 # Staff: Notifications alert
 # =========================
+def _pending_etag(request):
+    return pending_version()
+
+
 @staff_member_required
+@cache_control(no_cache=True)
+@condition(etag_func=_pending_etag)
 def live_notifications(request):
-    deposit_count = BankDeposit.objects.filter(status="pending").count()
-    withdraw_count = Transaction.objects.filter(
-        transaction_type="WITHDRAW", status="pending"
-    ).count()
-
-    return JsonResponse({
-        "deposits": deposit_count,
-        "withdrawals": withdraw_count
-    })
+    return JsonResponse(pending_counts())
+
+# =========================
+# Live events (SSE push)
+# =========================
+async def live_events(request):
+    """
+    text/event-stream of "rates" events (everyone) and "pending" events
+    (staff). Held open under ASGI; a one-shot snapshot under WSGI.
+    """
+    user = await request.auser()
+    include_pending = user.is_authenticated and user.is_staff
+
+    if isinstance(request, ASGIRequest):
+        stream = broadcaster.stream(include_pending)
+    else:
+        stream = await sync_to_async(snapshot)(include_pending)
+
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 # =========================
 # My KYC
@@ -800,14 +1050,6 @@ def kyc_form(request):
 # =========================
 # KYC Helper
 # =========================
-def kyc_required(user):
-    from .models import KYC
-    try:
-        kyc = KYC.objects.get(user=user)
-        return kyc.status == "approved"
-    except KYC.DoesNotExist:
-        return False
-        
 # =========================
 # My KYC Status
 # =========================
@@ -830,13 +1072,16 @@ def kyc_admin_list(request):
     status = request.GET.get("status", "pending")
 
     if status == "all":
-        kycs = KYC.objects.select_related("user").order_by("-created_at")
+        kycs = KYC.objects.select_related("user", "claimed_by").order_by("-submitted_at")
     else:
-        kycs = KYC.objects.filter(status=status).select_related("user").order_by("-created_at")
+        kycs = KYC.objects.filter(status=status).select_related("user", "claimed_by").order_by("-submitted_at")
+    kycs, claimed = _claim_filter(kycs, request, "kyc")
 
     return render(request, "goldtrade/kyc_admin_list.html", {
         "kycs": kycs,
         "status": status,
+        "claimed": claimed,
+        "now": timezone.now(),
     })
 
 
@@ -844,7 +1089,9 @@ def kyc_admin_list(request):
 @staff_member_required
 def kyc_admin_review(request, pk):
     kyc = get_object_or_404(KYC, id=pk)
-    return render(request, "goldtrade/kyc_admin_review.html", {"kyc": kyc})
+    holder = claims.holder(kyc, request.user)
+    mine = kyc.status == "pending" and kyc.claimed_by_id == request.user.pk and kyc.claimed_until > timezone.now()
+    return render(request, "goldtrade/kyc_admin_review.html", {"kyc": kyc, "holder": holder, "mine": mine})
 
 
 # ---- Approve KYC ----
@@ -855,9 +1102,13 @@ def kyc_admin_approve(request, pk):
     if kyc.status == "approved":
         messages.info(request, "KYC already approved.")
         return redirect("kyc_admin_review", pk=pk)
+    if claims.holder(kyc, request.user):
+        messages.warning(request, HELD_MESSAGE)
+        return redirect("kyc_admin_review", pk=pk)
 
     kyc.status = "approved"
-    kyc.save(update_fields=["status"])
+    kyc.claimed_by = kyc.claimed_until = None
+    kyc.save(update_fields=["status", *claims.CLEARED])
 
     # Email user after approval
     if kyc.user.email:
@@ -880,6 +1131,9 @@ def kyc_admin_reject(request, pk):
 
     if request.method != "POST":
         return redirect("kyc_reject_form", pk=pk)
+    if claims.holder(kyc, request.user):
+        messages.warning(request, HELD_MESSAGE)
+        return redirect("kyc_admin_review", pk=pk)
 
     reason = request.POST.get("reason", "").strip()
     if not reason:
@@ -887,7 +1141,8 @@ def kyc_admin_reject(request, pk):
 
     kyc.status = "rejected"
     kyc.rejection_reason = reason
-    kyc.save(update_fields=["status", "rejection_reason"])
+    kyc.claimed_by = kyc.claimed_until = None
+    kyc.save(update_fields=["status", "rejection_reason", *claims.CLEARED])
 
     # Email notify user
     if kyc.user.email:
@@ -920,7 +1175,7 @@ def kyc_reject_form(request, pk):
 def profile_view(request):
     profile, created = UserProfile.objects.get_or_create(user=request.user)
     kyc = KYC.objects.filter(user=request.user).first()
-    wallet = Wallet.objects.get(user=request.user, is_demo=False)
+    wallet = request.account.real_wallet
 
     return render(request, "goldtrade/profile.html", {
         "profile": profile,
@@ -954,6 +1209,8 @@ def profile_picture_upload(request):
 def profile_picture_remove(request):
     profile = UserProfile.objects.get(user=request.user)
     if profile.profile_picture:
+        profile.picture_display.delete(save=False)
+        profile.picture_thumb.delete(save=False)
         profile.profile_picture.delete(save=True)
         messages.success(request, "Profile picture removed.")
     return redirect("profile")
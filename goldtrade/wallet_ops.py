@@ -0,0 +1,77 @@
+"""
+Wallet operations for the trade and withdrawal-request paths (staff
+reviews settle in reviews.py).
+
+Each operation is one short transaction: a guarded UPDATE that checks and
+moves the balance in the same statement (ledger.move), then the
+Transaction row and its ledger legs inserted right behind it. The wallet
+row is locked by that UPDATE, so the lock is held for the two inserts and
+the commit only — no SELECT ... FOR UPDATE, no balance check in Python.
+This also holds on SQLite, where select_for_update is a no-op.
+"""
+from django.db import IntegrityError
+from django.db import transaction as db_tx
+
+from . import ledger, portfolio
+from .ledger import InsufficientFunds  # noqa: F401  (raised by every debit here)
+from .models import Transaction
+
+
+class WithdrawalPending(Exception):
+    """The wallet already has a withdrawal waiting for review."""
+
+
+def buy(wallet, grams, price, amount):
+    """Spends `amount` cash on `grams` of gold at `price` per gram."""
+    with db_tx.atomic():
+        ledger.move(wallet, cash=-amount, gold=grams)
+        tx = Transaction.objects.create(
+            wallet=wallet,
+            transaction_type="BUY",
+            gold_amount=grams,
+            price_per_gram=price,
+            total_amount=amount,
+        )
+        ledger.record(wallet, "BUY", cash=-amount, gold=grams, transaction=tx)
+        portfolio.record_trades([(wallet, "BUY", grams, amount)])
+    return tx
+
+
+def sell(wallet, grams, price, total):
+    """Sells `grams` of gold at `price` per gram for `total` cash."""
+    with db_tx.atomic():
+        ledger.move(wallet, cash=total, gold=-grams)
+        tx = Transaction.objects.create(
+            wallet=wallet,
+            transaction_type="SELL",
+            gold_amount=grams,
+            price_per_gram=price,
+            total_amount=total,
+        )
+        ledger.record(wallet, "SELL", cash=total, gold=-grams, transaction=tx)
+        portfolio.record_trades([(wallet, "SELL", grams, total)])
+    return tx
+
+
+def request_withdrawal(wallet, amount, remarks=""):
+    """
+    Files a pending withdrawal; nothing is deducted until approval.
+    One pending request per wallet is enforced by a partial unique index,
+    so two racing submits cannot both get in.
+    """
+    try:
+        with db_tx.atomic():
+            return Transaction.objects.create(
+                wallet=wallet,
+                transaction_type="WITHDRAW",
+                total_amount=amount,
+                remarks=remarks,
+                status="pending",
+            )
+    except IntegrityError:
+        if Transaction.objects.filter(
+            wallet=wallet, transaction_type="WITHDRAW", status="pending"
+        ).exists():
+            raise WithdrawalPending(wallet.pk)
+        raise
+
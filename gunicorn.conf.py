@@ -1,5 +1,11 @@
+import os
+
 bind = "0.0.0.0:8000"
 workers = 3
-threads = 2
 timeout = 120
 preload_app = True
+
+# The app is served as ASGI (gold_trade.asgi) so /live-events/ streams stay
+# open on the same port as everything else. Sync views still run
+# concurrently: Django gives every request its own thread.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "uvicorn_worker.UvicornWorker")
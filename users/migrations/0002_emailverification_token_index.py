@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailverification',
+            name='token',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]